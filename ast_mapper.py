@@ -1,6 +1,18 @@
 from log_config import logger
 import ast
-import difflib
+import os
+import fingerprint
+
+
+# Sequences with at least this many top-level nodes are matched with NumPy (if it is installed), 0 turns it off.
+# Off by default: even at 50k statements the match takes as long as on lists (benchmark.py scaling),
+# the NumPy import alone takes about 100 ms
+NUMPY_MIN_NODES = int(os.environ.get("AST_MERGE_NUMPY_MIN_NODES", 0))
+
+# Gaps between anchors up to this size are left to difflib right away
+PATIENCE_MIN_GAP = 4
+
+_numpy = False
 
 
 def map_top_level_nodes(ast):
@@ -26,46 +38,208 @@ def map_top_level_nodes_without_imports(tree):
     return ordered_nodes
 
 
-class NodeWrapper:
-    def __init__(self, node):
-        self.node = node
-        self._content = ast.dump(node, include_attributes=False)
-
-    def __eq__(self, other):
-        return self._content == other._content
-
-    def __hash__(self):
-        return hash(self._content)
-
-    def __repr__(self):
-        name = getattr(self.node, 'name', getattr(
-            self.node, 'id', type(self.node).__name__))
-        return f"<{name}>"
-
-
-def get_lcs_with_difflib(nodes_left, nodes_right):
-
-    if nodes_left is None:
-        nodes_left = []
-        logger.warning("nodes_left in get_lcs_with_difflib is NONE!!")
-    if nodes_right is None:
-        nodes_right = []
-        logger.warning("nodes_right in get_lcs_with_difflib is NONE!!")
-
-    left_wrapped = [NodeWrapper(n) for n in nodes_left]
-    right_wrapped = [NodeWrapper(n) for n in nodes_right]
-
-    matcher = difflib.SequenceMatcher(None, left_wrapped, right_wrapped)
-
-    lcs = []
+def _load_numpy():
+    # imported on first use, the import alone takes longer than a small merge
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+
+class FingerprintSequence:
+    """
+    The top-level nodes of one side and their fingerprints shortened to 64-bit integers,
+    as a NumPy array for large sequences (see NUMPY_MIN_NODES) and as a list otherwise.
+    """
+
+    def __init__(self, nodes, numpy=None):
+        self.nodes = nodes
+        self.numpy = numpy
+        prefixes = [fingerprint.node_fingerprint(
+            node)[:8] for node in nodes]
+        if numpy is not None:
+            self.keys = numpy.frombuffer(b"".join(prefixes), dtype="<u8")
+        else:
+            self.keys = [int.from_bytes(prefix, "little")
+                         for prefix in prefixes]
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+def _common_prefix(keys_left, keys_right, numpy):
+    size = min(len(keys_left), len(keys_right))
+    if numpy is not None and size:
+        different = numpy.flatnonzero(keys_left[:size] != keys_right[:size])
+        return int(different[0]) if len(different) else size
+    prefix = 0
+    while prefix < size and keys_left[prefix] == keys_right[prefix]:
+        prefix += 1
+    return prefix
+
+
+def _common_suffix(keys_left, keys_right, numpy):
+    size = min(len(keys_left), len(keys_right))
+    if numpy is not None and size:
+        different = numpy.flatnonzero(
+            keys_left[len(keys_left) - size:][::-1] != keys_right[len(keys_right) - size:][::-1])
+        return int(different[0]) if len(different) else size
+    suffix = 0
+    while suffix < size and keys_left[-1 - suffix] == keys_right[-1 - suffix]:
+        suffix += 1
+    return suffix
+
+
+def _unique_pairs(keys_left, keys_right, numpy):
+    """(left, right) positions of the keys that occur exactly once on each side, ordered by left position."""
+    if numpy is not None:
+        unique_left, index_left, count_left = numpy.unique(
+            keys_left, return_index=True, return_counts=True)
+        unique_right, index_right, count_right = numpy.unique(
+            keys_right, return_index=True, return_counts=True)
+        once_left = count_left == 1
+        once_right = count_right == 1
+        _, in_left, in_right = numpy.intersect1d(
+            unique_left[once_left], unique_right[once_right], assume_unique=True, return_indices=True)
+        positions_left = index_left[once_left][in_left]
+        positions_right = index_right[once_right][in_right]
+        order = numpy.argsort(positions_left, kind="stable")
+        return positions_left[order].tolist(), positions_right[order].tolist()
+
+    positions_right = {}
+    for position, key in enumerate(keys_right):
+        positions_right[key] = None if key in positions_right else position
+    seen_left = {}
+    for position, key in enumerate(keys_left):
+        seen_left[key] = None if key in seen_left else position
+    # first occurrences are inserted in order, so the pairs are ordered by left position
+    pairs = [(position, positions_right[key]) for key, position in seen_left.items()
+             if position is not None and positions_right.get(key) is not None]
+    return [left for left, _ in pairs], [right for _, right in pairs]
+
+
+def _increasing_pairs(positions_left, positions_right):
+    """Longest subsequence of the pairs whose right positions increase as well (patience sorting)."""
+    if all(a < b for a, b in zip(positions_right, positions_right[1:])):
+        return list(zip(positions_left, positions_right))
+
+    import bisect
+
+    tails = []
+    tail_indices = []
+    previous = [-1] * len(positions_right)
+    for index, right in enumerate(positions_right):
+        slot = bisect.bisect_left(tails, right)
+        if slot == len(tails):
+            tails.append(right)
+            tail_indices.append(index)
+        else:
+            tails[slot] = right
+            tail_indices[slot] = index
+        previous[index] = tail_indices[slot - 1] if slot else -1
+
+    pairs = []
+    index = tail_indices[-1] if tail_indices else -1
+    while index != -1:
+        pairs.append((positions_left[index], positions_right[index]))
+        index = previous[index]
+    pairs.reverse()
+    return pairs
+
+
+def _difflib_matches(keys_left, keys_right):
+    import difflib
+
+    matcher = difflib.SequenceMatcher(
+        None, list(keys_left), list(keys_right))
+    return [(match.a + k, match.b + k) for match in matcher.get_matching_blocks() for k in range(match.size)]
+
+
+def match_sequences(sequence_left, sequence_right):
+    """
+    Matched (left, right) positions of two FingerprintSequences, in order.
+    Patience matching: common prefixes and suffixes are matched first, then the keys that occur once
+    on each side are used as anchors and the gaps between them are matched the same way.
+    Gaps without such anchors are matched with difflib.
+    """
+    numpy = sequence_left.numpy
+    matches = []
+    # gaps (left start, left end, right start, right end) and lists of finished matches, the next one on top
+    stack = [(0, len(sequence_left), 0, len(sequence_right))]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            matches.extend(item)
+            continue
+        start_left, end_left, start_right, end_right = item
+        if start_left == end_left or start_right == end_right:
+            continue
 
-    try:
+        keys_left = sequence_left.keys[start_left:end_left]
+        keys_right = sequence_right.keys[start_right:end_right]
+        # NumPy only pays off for long gaps, short ones are matched on lists
+        gap_numpy = numpy if min(len(keys_left), len(
+            keys_right)) >= NUMPY_MIN_NODES else None
+        if numpy is not None and gap_numpy is None:
+            keys_left, keys_right = keys_left.tolist(), keys_right.tolist()
+
+        prefix = _common_prefix(keys_left, keys_right, gap_numpy)
+        matches.extend((start_left + k, start_right + k)
+                       for k in range(prefix))
+        suffix = _common_suffix(
+            keys_left[prefix:], keys_right[prefix:], gap_numpy)
+        tail = [(end_left - suffix + k, end_right - suffix + k)
+                for k in range(suffix)]
+
+        keys_left = keys_left[prefix:len(keys_left) - suffix]
+        keys_right = keys_right[prefix:len(keys_right) - suffix]
+        start_left += prefix
+        start_right += prefix
+
+        anchors = []
+        if min(len(keys_left), len(keys_right)) > PATIENCE_MIN_GAP:
+            anchors = _increasing_pairs(
+                *_unique_pairs(keys_left, keys_right, gap_numpy))
+
+        if not anchors:
+            if len(keys_left) and len(keys_right):
+                matches.extend((start_left + a, start_right + b)
+                               for a, b in _difflib_matches(keys_left, keys_right))
+            matches.extend(tail)
+            continue
 
-        for match in matcher.get_matching_blocks():
-            if match.size > 0:
-                for k in range(match.size):
-                    lcs.append(left_wrapped[match.a + k].node)
-        return lcs
-    except Exception as e:
-        logger.error("Error in get_lcs_with_difflib", e)
-        return lcs
+        # runs of adjacent anchors become one list, only real gaps are pushed
+        items = []
+        run = None
+        previous_left = previous_right = 0
+        for left, right in anchors:
+            if run is None or left != previous_left or right != previous_right:
+                items.append((start_left + previous_left, start_left + left,
+                              start_right + previous_right, start_right + right))
+                run = []
+                items.append(run)
+            run.append((start_left + left, start_right + right))
+            previous_left, previous_right = left + 1, right + 1
+        items.append((start_left + previous_left, start_left + len(keys_left),
+                      start_right + previous_right, start_right + len(keys_right)))
+        items.append(tail)
+        stack.extend(reversed(items))
+
+    return matches
+
+
+def get_lcs(nodes_left, nodes_right):
+    """
+    The left nodes of the matched top-level nodes of both sides (see match_sequences),
+    with NumPy fingerprint arrays for large sequences if NumPy is installed.
+    """
+    numpy = None
+    if NUMPY_MIN_NODES and min(len(nodes_left), len(nodes_right)) >= NUMPY_MIN_NODES:
+        numpy = _load_numpy()
+    sequence_left = FingerprintSequence(nodes_left, numpy)
+    sequence_right = FingerprintSequence(nodes_right, numpy)
+    return [nodes_left[left] for left, _ in match_sequences(sequence_left, sequence_right)]
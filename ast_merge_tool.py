@@ -1,121 +1,612 @@
 #!/usr/bin/env python3
 
+import os
 import sys
 import parser
 import ast
-from merger import Merger
 import check_syntax
+import log_config
 from log_config import logger, multiline_debug_log
-import ast_mapper
-import autopep8
-import utilitys
+import merge_budget
+import conflict_report
+import phases
 
+# The merge modules, difflib and autopep8 (which pulls in pycodestyle) are imported
+# inside the phase that needs them, to keep the start of every invocation cheap.
+
+
+def run_ast_merge(ast_base, ast_local, ast_remote, budget=None, report=None):
+    """
+    Runs the AST based merge on three parsed files.
+    Returns the formatted merged code, or None if the tool can't merge automatically,
+    the reasons are collected in the conflict report.
+    Raises merge_budget.BudgetExceeded if the merge runs over the given budget.
+    """
+    import ast_mapper
+    from merger import Merger
+
+    locoal_top_nodes = ast_mapper.map_top_level_nodes(ast_local)
+
+    logger.debug("LCS TEST:")
+    logger.debug("local_top_nodes:")
+    logger.debug(locoal_top_nodes)
+    logger.debug("localt_top_nodes without imports:")
+    logger.debug(ast_mapper.map_top_level_nodes_without_imports(ast_local))
+
+    logger.debug("BASE FILE:")
+    multiline_debug_log(parser.ast_tree_to_String(ast_base))
+    logger.debug("-------------------------------------")
+    logger.debug("LOCAL FILE:")
+    multiline_debug_log(parser.ast_tree_to_String(ast_local))
+    logger.debug("REMOTE FILE:")
+    logger.debug("-------------------------------------")
+    multiline_debug_log(parser.ast_tree_to_String(ast_remote))
+    logger.debug("-------------------------------------")
+
+    # ------------------------------------ MERGING --------------------------------------------------
+    merger = Merger(ast_base, ast_local, ast_remote,
+                    budget=budget, report=report)
+
+    merged_sequence, mapping_changes_left, mapping_changes_right = merger.create_changesets()
+
+    logger.debug("changeset from merging:")
+    logger.debug(merged_sequence)
+    logger.debug(mapping_changes_left)
+    logger.debug(mapping_changes_right)
+
+    merged_tree = merger.merging(
+        merged_sequence,
+        mapping_changes_left,
+        mapping_changes_right
+    )
+
+    # ----------------------------------------------------------------------------------------------
+
+    if not merged_tree:
+        logger.merge(
+            "Merge process terminated due to conflicts that cannot be resolved automatically by the tool.")
+        return None
+
+    import autopep8
+    import literal_merge
+
+    raw_code = literal_merge.unparse(merged_tree)
+    formatted_code = autopep8.fix_code(raw_code)
+
+    phases.mark("format")
+    if budget:
+        budget.check("format")
+
+    return formatted_code
+
+
+def check_ast_merge(ast_base, ast_local, ast_remote, budget=None, report=None):
+    """
+    The analysis of run_ast_merge without its output: True if the three files can be merged automatically.
+    Stops at the first conflict (Merger fail_fast), nothing is unparsed or formatted.
+    Raises merge_budget.BudgetExceeded if the merge runs over the given budget.
+    """
+    from merger import Merger
+
+    merger = Merger(ast_base, ast_local, ast_remote,
+                    budget=budget, report=report, fail_fast=True)
+    merged_sequence, mapping_changes_left, mapping_changes_right = merger.create_changesets()
+    return bool(merger.merging(merged_sequence, mapping_changes_left, mapping_changes_right))
+
+
+def line_based_merge_content(base_buffer, local_buffer, remote_buffer):
+    """
+    Standard line-based three-way merge, used whenever the AST merge can't be used.
+    Returns (merged bytes with conflict markers, exit code).
+    The merged bytes are None for binary content, LOCAL is kept as it is.
+    """
+    import prescan
+    import text_merge
+
+    if prescan.is_binary(base_buffer) or prescan.is_binary(local_buffer) or prescan.is_binary(remote_buffer):
+        logger.merge("Binary content can't be merged line-based, keeping LOCAL")
+        return None, 1
+
+    merged_data, conflict_count = text_merge.merge_lines(
+        base_buffer.to_bytes(), local_buffer.to_bytes(), remote_buffer.to_bytes())
+
+    if conflict_count:
+        logger.merge(f"Line-based merge left {conflict_count} conflict(s)")
+        return merged_data, 1
+
+    logger.merge("[OK] Line-based merge successful")
+    return merged_data, 0
+
+
+# how merge_buffers got its result
+METHOD_TRIVIAL = "trivial"
+METHOD_CACHED = "cached"
+METHOD_AST = "ast"
+METHOD_LINE = "line"
+
+# exit code of --check for inputs that can't be merged automatically, 1 stays the code for failures of the tool
+EXIT_NOT_MERGEABLE = 3
 
-def main():
 
+def merge_buffers(buffers, path_name=None, parallel=None, report=None, use_cache=True, budget=None):
+    """
+    The merge behind the merge driver, on InputBuffers (base, local, remote) without any file access.
+    path_name is the path in the repository, if known.
+    budget is a fresh merge_budget.MergeBudget for this merge, by default the configured limits with the timer.
+    Returns (merged content, exit code, method), the content is None if LOCAL stays as it is.
+    Every reason for a failed merge is added to the report, if one is given.
+
+    Large, non-Python, binary or unparseable inputs skip the AST path and go straight
+    to the line-based diff3 merge. The same fallback is used when the AST merge fails.
+    """
+    base_buffer, local_buffer, remote_buffer = buffers
+
+    # trivial merges, one side didn't change anything
+    if local_buffer == remote_buffer or base_buffer == remote_buffer:
+        logger.merge("[OK] Remote has no changes, keeping LOCAL")
+        return None, 0, METHOD_TRIVIAL
+    if base_buffer == local_buffer:
+        logger.merge("[OK] Local has no changes, taking REMOTE")
+        return remote_buffer.to_bytes(), 0, METHOD_TRIVIAL
+
+    import prescan
+    import merge_cache
+
+    if report is None:
+        report = conflict_report.ConflictReport()
+
+    reason = prescan.prescan_inputs(buffers, path_name)
+    phases.mark("read")
+
+    cache = merge_cache.open_cache() if reason is None and use_cache else None
+    if cache:
+        cache_key = merge_cache.cache_key(
+            *(buffer.digest() for buffer in buffers))
+        cached = cache.get(cache_key)
+        if cached is not None and cached.status == merge_cache.STATUS_MERGED:
+            logger.merge("[OK] MERGE SUCCESSFUL (cached result)")
+            return cached.merged, 0, METHOD_CACHED
+        if cached is not None:
+            reason = "AST merge not possible (cached result)"
+            cache = None
+
+    if reason is None:
+        if budget is None:
+            budget = merge_budget.MergeBudget()
+        try:
+            with budget.armed():
+                trees = parse_inputs(buffers, parallel)
+                if None in trees:
+                    reason = "syntax error in input"
+                else:
+                    merged_code = run_ast_merge(
+                        *trees, budget=budget, report=report)
+        except merge_budget.BudgetExceeded as e:
+            reason = str(e)
+        except Exception:
+            logger.error("AST merge failed unexpectedly: ", exc_info=True)
+            reason = "AST merge failed unexpectedly"
+
+    if reason is None:
+        if merged_code is not None and check_syntax.check_code_syntax(merged_code, path_name or "<merged>"):
+            if cache:
+                cache.put(cache_key, merge_cache.STATUS_MERGED, merged_code)
+            logger.merge("[OK] MERGE SUCCESSFUL")
+            return merged_code, 0, METHOD_AST
+
+        if cache:
+            cache.put(cache_key, merge_cache.STATUS_CONFLICT,
+                      report=report.to_json())
+        reason = "AST merge not possible"
+
+    logger.merge(f"Falling back to line-based merge: {reason}")
+    merged_data, exit_code = line_based_merge_content(*buffers)
+    phases.mark("line_merge")
+    if exit_code:
+        report.add(conflict_report.Conflict(
+            conflict_report.TEXT_CONFLICT, path_name, f"{reason}, the line-based merge left conflicts"))
+    return merged_data, exit_code, METHOD_LINE
+
+
+def driver_main(argv, label=None):
+    """
+    Entry point for git's merge driver contract: driver %O %A %B [%P]
+    The result is written in place to %A.
+    Returns 0 for a clean merge and 1 if conflict markers were left in %A.
+    label: the ContentLabel of an instrumented run, it takes the digests of the mapped inputs.
+    """
+    if len(argv) < 3:
+        logger.error("Usage: ast_merge_tool.py driver %O %A %B [%P]")
+        return 1
+
+    BASE_FILE, LOCAL_FILE, REMOTE_FILE = argv[:3]
+    PATH_NAME = argv[3] if len(argv) > 3 else None
+
+    logger.merge(f"Merge driver: BASE={BASE_FILE}, LOCAL={LOCAL_FILE}, REMOTE={REMOTE_FILE}, PATH={PATH_NAME}")
+
+    buffers = read_inputs([BASE_FILE, LOCAL_FILE, REMOTE_FILE], label)
     try:
-        logger.merge("+------------------------------------+")
-        logger.merge("|          STARTING MERGING          |")
-        logger.merge("+------------------------------------+")
-
-        BASE_FILE = sys.argv[1]
-        LOCAL_FILE = sys.argv[2]
-        REMOTE_FILE = sys.argv[3]
-        MERGED_FILE = sys.argv[4]
-
-        logger.merge(f"Starting merge: BASE={BASE_FILE}, LOCAL={
-            LOCAL_FILE}, REMOTE={REMOTE_FILE}")
-
-        for file_path in [BASE_FILE, LOCAL_FILE, REMOTE_FILE]:
-            if not check_syntax.check_file_syntax(file_path):
-                sys.exit(1)
-
-        ast_base = parser.parse_file_to_ast(BASE_FILE)
-        ast_local = parser.parse_file_to_ast(LOCAL_FILE)
-        ast_remote = parser.parse_file_to_ast(REMOTE_FILE)
-
-        locoal_top_nodes = ast_mapper.map_top_level_nodes(ast_local)
-        remote_top_nodes = ast_mapper.map_top_level_nodes(ast_remote)
-
-        logger.debug("LCS TEST:")
-        logger.debug("local_top_nodes:")
-        logger.debug(locoal_top_nodes)
-        logger.debug("localt_top_nodes without imports:")
-        logger.debug(ast_mapper.map_top_level_nodes_without_imports(ast_local))
-
-        logger.debug("BASE FILE:")
-        multiline_debug_log(parser.ast_tree_to_String(ast_base))
-        logger.debug("-------------------------------------")
-        logger.debug("LOCAL FILE:")
-        multiline_debug_log(parser.ast_tree_to_String(ast_local))
-        logger.debug("REMOTE FILE:")
-        logger.debug("-------------------------------------")
-        multiline_debug_log(parser.ast_tree_to_String(ast_remote))
-        logger.debug("-------------------------------------")
-       
-        # ------------------------------------ MERGING --------------------------------------------------
-        merger = Merger(ast_base, ast_local, ast_remote)
-
-        merged_sequence, mapping_changes_left, mapping_changes_right = merger.create_changesets()
-
-        logger.debug("changeset from merging:")
-        logger.debug(merged_sequence)
-        logger.debug(mapping_changes_left)
-        logger.debug(mapping_changes_right)
-
-        merged_tree = merger.merging(
-            merged_sequence,
-            mapping_changes_left,
-            mapping_changes_right
-        )
-
-        # ----------------------------------------------------------------------------------------------
-
-        if not merged_tree:
+        merged_content, exit_code, _ = merge_buffers(buffers, PATH_NAME)
+    finally:
+        # %A is replaced, its mapping must be gone before that
+        close_inputs(buffers)
+    if merged_content is not None:
+        write_output(LOCAL_FILE, merged_content)
+    return exit_code
+
+
+def parse_inputs(buffers, parallel=None):
+    """
+    Parses base, local and remote.
+    Large inputs (or parallel=True) are parsed and fingerprinted in worker processes,
+    their trees are only rebuilt where the merge needs them (see fingerprint.parse_lazily).
+    Otherwise large inputs only get their changed statements parsed (see incremental_parse).
+    Equal subtrees of the three trees are shared afterwards (see fingerprint.SubtreeInterner).
+    """
+    import fingerprint
+    import incremental_parse
+
+    total_bytes = sum(buffer.size for buffer in buffers)
+    if parallel is None:
+        parallel = fingerprint.use_parallel(total_bytes)
+    if parallel:
+        trees = fingerprint.parse_lazily([buffer.source for buffer in buffers])
+    elif incremental_parse.use_incremental(total_bytes):
+        trees = incremental_parse.parse_incrementally(
+            [buffer.source for buffer in buffers])
+    else:
+        trees = [parser.parse_python_code(buffer.text) for buffer in buffers]
+    trees = list(fingerprint.intern_trees(*trees))
+    phases.mark("parse")
+    return trees
+
+
+def read_inputs(file_paths, label=None):
+    """
+    Maps every input file exactly once, all later phases work on these InputBuffers.
+    The caller closes them with close_inputs before it writes any file.
+    A ContentLabel (see run_instrumented) takes over the digests of the buffers.
+    """
+    from input_buffer import InputBuffer
+
+    buffers = [InputBuffer.from_file(file_path) for file_path in file_paths]
+    if label is not None:
+        label.add_buffers(buffers)
+    return buffers
+
+
+def close_inputs(buffers):
+    for buffer in buffers:
+        buffer.close()
+
+
+def decode_inputs(buffers, file_paths, report):
+    """
+    Decodes the input buffers and checks them for syntax errors.
+    Returns the list of source strings, or None if one of the inputs is not valid.
+    """
+    codes = []
+    for buffer, file_path in zip(buffers, file_paths):
+        try:
+            code = buffer.text
+        except (SyntaxError, LookupError, UnicodeDecodeError):
+            logger.error(f"Error checking {file_path}: ", exc_info=True)
+            report.add(conflict_report.Conflict(
+                conflict_report.INVALID_INPUT, file_path, "Input can't be decoded"))
+            return None
+
+        if not check_syntax.check_code_syntax(code, file_path):
+            report.add(conflict_report.Conflict(
+                conflict_report.INVALID_INPUT, file_path, "Syntax errors in the input"))
+            return None
+        codes.append(code)
+    return codes
+
+
+def write_output(file_path, content):
+    import utilitys
+
+    utilitys.write_file_atomic(file_path, content)
+
+
+def parse_arguments(argv):
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(
+        prog="ast_merge_tool.py",
+        description="AST based three-way merge of Python files, usable as git mergetool. "
+                    "Use 'ast_merge_tool.py driver %O %A %B %P' as git merge driver.")
+    arg_parser.add_argument("base")
+    arg_parser.add_argument("local")
+    arg_parser.add_argument("remote")
+    arg_parser.add_argument("merged", nargs="?",
+                            help="the merge result, not used (and optional) with --check and --watch")
+    arg_parser.add_argument("--report", metavar="FILE",
+                            help="write a JSON conflict report to FILE")
+    arg_parser.add_argument("--report-code", action="store_true",
+                            help="include the code of the conflicting nodes in the JSON report")
+    arg_parser.add_argument("--parallel", action="store_true",
+                            help="parse the inputs in worker processes, "
+                                 "by default only inputs over AST_MERGE_PARALLEL_MIN_BYTES are")
+    arg_parser.add_argument("--profile", metavar="DIR",
+                            help="profile the merge, writes a .pstats file and collapsed stacks "
+                                 "(for flamegraph tools) labelled with the input hashes to DIR")
+    arg_parser.add_argument("--metrics", metavar="FILE",
+                            help="append the time of every merge phase as a JSON line to FILE")
+    arg_parser.add_argument("--trace-memory", action="store_true",
+                            help="add net and peak allocations and the top allocation sites "
+                                 "of every phase to the --metrics output (tracemalloc, slow)")
+    arg_parser.add_argument("--check", action="store_true",
+                            help="only decide whether the files can be merged automatically: prints a JSON verdict, "
+                                 f"exits with 0 or {EXIT_NOT_MERGEABLE}, MERGED is not written")
+    arg_parser.add_argument("--watch", action="store_true",
+                            help="keep base and remote parsed and print a JSON mergeability verdict "
+                                 "every time LOCAL is saved, MERGED is not written")
+    args = arg_parser.parse_args(argv)
+    if args.merged is None and not (args.check or args.watch):
+        arg_parser.error("MERGED is required unless --check or --watch is given")
+    return args
+
+
+def merge_main(args, report, label=None):
+    """
+    The mergetool flow: BASE LOCAL REMOTE MERGED.
+    Returns the exit code, every reason for a failed merge is added to the report.
+    """
+    logger.merge("+------------------------------------+")
+    logger.merge("|          STARTING MERGING          |")
+    logger.merge("+------------------------------------+")
+
+    BASE_FILE = args.base
+    LOCAL_FILE = args.local
+    REMOTE_FILE = args.remote
+
+    logger.merge(f"Starting merge: BASE={BASE_FILE}, LOCAL={
+        LOCAL_FILE}, REMOTE={REMOTE_FILE}")
+
+    input_files = [BASE_FILE, LOCAL_FILE, REMOTE_FILE]
+    buffers = read_inputs(input_files, label)
+    try:
+        return merge_inputs(args, report, input_files, buffers)
+    finally:
+        close_inputs(buffers)
+
+
+def merge_inputs(args, report, input_files, buffers):
+    """The mergetool flow on the mapped inputs, they are closed before MERGED is written."""
+    MERGED_FILE = args.merged
+
+    import merge_cache
+
+    cache = merge_cache.open_cache()
+    if cache:
+        cache_key = merge_cache.cache_key(
+            *(buffer.digest() for buffer in buffers))
+        cached = cache.get(cache_key)
+        if cached is not None and cached.status == merge_cache.STATUS_MERGED:
+            close_inputs(buffers)
+            write_output(MERGED_FILE, cached.merged)
+            logger.merge("[OK] MERGE SUCCESSFUL (cached result)")
+            return 0
+        # the cached report has no code, rerun the merge if the code is asked for
+        if cached is not None and not args.report_code:
+            report.extend_from_json(cached.report)
             logger.merge(
-                "Merge process terminated due to conflicts that cannot be resolved automatically by the tool.")
-            sys.exit(1)
-
-        raw_code = ast.unparse(merged_tree)
-        formatted_code = autopep8.fix_code(raw_code)
-
-        with open(MERGED_FILE, "w", encoding="utf-8") as f:
-            f.write(formatted_code)
-            # test if MERGED_FILE is checked for SyntaxErrors
-            # f.write("(")
-
-        if not check_syntax.check_file_syntax(MERGED_FILE):
-            logger.error(
-                "Automatic merging is not possible due to syntax errors in the merged output.")
-            sys.exit(1)
-
-        logger.merge("---------------- MERGE RESULT ---------------------")
-        logger.merge("BASE FILE:")
-        for line in BASE_FILE.splitlines():
-            logger.debug(line)
-            utilitys.log_file_content(BASE_FILE)
-        logger.merge("-------------------------------------")
-        logger.merge("LOCAL FILE:")
-        for line in LOCAL_FILE.splitlines():
-            logger.debug(line)
-            utilitys.log_file_content(LOCAL_FILE)
-        logger.merge("-------------------------------------")
-        for line in REMOTE_FILE.splitlines():
-            logger.debug(line)
-            utilitys.log_file_content(REMOTE_FILE)
-        logger.merge("-------------------------------------")
-        logger.merge("MERGE FILE:")
-        for line in formatted_code.splitlines():
-            logger.merge(line)
-        logger.merge("-------------------------------------")
-
-        logger.merge("[OK] MERGE SUCCESSFUL")
-        sys.exit(0)
-    
-    except Exception as e:
-        sys.exit(1)
-        logger.error("AST Merge Tool failed unexpectedly: ", e)
+                "Merge process terminated due to conflicts that cannot be resolved automatically by the tool (cached result).")
+            return 1
+
+    codes = decode_inputs(buffers, input_files, report)
+    if codes is None:
+        return 1
+    base_code, local_code, remote_code = codes
+    phases.mark("read")
+
+    report.sources[conflict_report.LOCAL] = buffers[1].source
+    report.sources[conflict_report.REMOTE] = buffers[2].source
+
+    budget = merge_budget.MergeBudget()
+    try:
+        with budget.armed():
+            ast_base, ast_local, ast_remote = parse_inputs(
+                buffers, args.parallel or None)
+
+            formatted_code = run_ast_merge(
+                ast_base, ast_local, ast_remote, budget=budget, report=report)
+    except merge_budget.BudgetExceeded as e:
+        logger.merge(f"Falling back to line-based merge: {e}")
+        merged_data, exit_code = line_based_merge_content(*buffers)
+        close_inputs(buffers)
+        if merged_data is not None:
+            write_output(MERGED_FILE, merged_data)
+        phases.mark("line_merge")
+        if exit_code:
+            report.add(conflict_report.Conflict(
+                conflict_report.BUDGET_EXCEEDED, e.phase, f"{e.reason}, the line-based merge left conflicts"))
+        return exit_code
+
+    # the merged code is verified before anything is written, git never sees a half-valid file
+    if formatted_code is not None and not check_syntax.check_code_syntax(formatted_code, MERGED_FILE):
+        logger.error(
+            "Automatic merging is not possible due to syntax errors in the merged output.")
+        report.add(conflict_report.Conflict(
+            conflict_report.INVALID_OUTPUT, MERGED_FILE, "Syntax errors in the merged output"))
+        formatted_code = None
+
+    if formatted_code is None:
+        if cache:
+            cache.put(cache_key, merge_cache.STATUS_CONFLICT,
+                      report=report.to_json())
+        return 1
+
+    if cache:
+        cache.put(cache_key, merge_cache.STATUS_MERGED, formatted_code)
+
+    close_inputs(buffers)
+    write_output(MERGED_FILE, formatted_code)
+
+    import utilitys
+
+    logger.merge("---------------- MERGE RESULT ---------------------")
+    logger.merge("BASE FILE:")
+    utilitys.log_text_content(base_code)
+    logger.merge("-------------------------------------")
+    logger.merge("LOCAL FILE:")
+    utilitys.log_text_content(local_code)
+    logger.merge("-------------------------------------")
+    logger.merge("REMOTE FILE:")
+    utilitys.log_text_content(remote_code)
+    logger.merge("-------------------------------------")
+    logger.merge("MERGE FILE:")
+    utilitys.log_text_content(formatted_code)
+    logger.merge("-------------------------------------")
+
+    logger.merge("[OK] MERGE SUCCESSFUL")
+    return 0
+
+
+def check_main(args, report, label=None):
+    """
+    The --check flow: stops at the first conflict and skips unparsing, formatting, writing and the result log.
+    Prints a one-line JSON verdict, returns 0 if the files can be merged automatically and
+    EXIT_NOT_MERGEABLE otherwise.
+    """
+    import json
+
+    input_files = [args.base, args.local, args.remote]
+    buffers = read_inputs(input_files, label)
+    try:
+        method, mergeable = check_inputs(args, report, input_files, buffers)
+    finally:
+        close_inputs(buffers)
+
+    print(json.dumps({
+        "path": args.local,
+        "mergeable": mergeable,
+        "method": method,
+        "conflicts": [conflict.summary() for conflict in report.conflicts],
+    }))
+    return 0 if mergeable else EXIT_NOT_MERGEABLE
+
+
+def check_inputs(args, report, input_files, buffers):
+    """The verdict of the --check flow on the mapped inputs: (method, mergeable)."""
+    base_buffer, local_buffer, remote_buffer = buffers
+
+    if local_buffer == remote_buffer or base_buffer == remote_buffer or base_buffer == local_buffer:
+        method, mergeable = METHOD_TRIVIAL, True
+    else:
+        import merge_cache
+
+        cache = merge_cache.open_cache()
+        cached = cache.get(merge_cache.cache_key(
+            *(buffer.digest() for buffer in buffers))) if cache else None
+        if cached is not None:
+            # the report of a check stops at the first conflict, so checks never store results
+            method, mergeable = METHOD_CACHED, cached.status == merge_cache.STATUS_MERGED
+            if not mergeable:
+                report.extend_from_json(cached.report)
+        else:
+            method, mergeable = METHOD_AST, decode_inputs(
+                buffers, input_files, report) is not None
+            phases.mark("read")
+
+        if method == METHOD_AST and mergeable:
+            budget = merge_budget.MergeBudget()
+            try:
+                with budget.armed():
+                    trees = parse_inputs(buffers, args.parallel or None)
+                    mergeable = check_ast_merge(
+                        *trees, budget=budget, report=report)
+            except merge_budget.BudgetExceeded as e:
+                # the same fallback as the mergetool flow, its result is dropped
+                logger.merge(f"Falling back to line-based merge: {e}")
+                method = METHOD_LINE
+                _, exit_code = line_based_merge_content(*buffers)
+                phases.mark("line_merge")
+                mergeable = not exit_code
+                if exit_code:
+                    report.add(conflict_report.Conflict(
+                        conflict_report.BUDGET_EXCEEDED, e.phase, f"{e.reason}, the line-based merge left conflicts"))
+
+    return method, mergeable
+
+
+def run_instrumented(input_files, function, *args, profile_dir=None, metrics_file=None, trace_memory=False):
+    """
+    function(*args), under the profiler if a profile directory is given (see profiling)
+    and with phase metrics appended to metrics_file if one is given (see metrics).
+    Both are labelled with a ContentLabel of the inputs, function gets it as its label argument.
+    """
+    if not profile_dir and not metrics_file:
+        return function(*args)
+
+    import functools
+    from input_buffer import ContentLabel
+
+    label = ContentLabel(input_files)
+    function = functools.partial(function, label=label)
+    if metrics_file:
+        import metrics
+
+        function, args = metrics.run_measured, (metrics_file,
+                                                label, trace_memory, function, *args)
+    if profile_dir:
+        import profiling
+
+        function, args = profiling.run_profiled, (profile_dir,
+                                                  label, function, *args)
+    return function(*args)
+
+
+def main():
+
+    if len(sys.argv) > 1 and sys.argv[1] == "driver":
+        # git passes a fixed argument list to the driver, the instrumentation is switched on by the environment
+        exit_code = 1
+        try:
+            if len(sys.argv) < 5:
+                exit_code = driver_main(sys.argv[2:])
+            else:
+                exit_code = run_instrumented(sys.argv[2:5], driver_main, sys.argv[2:],
+                                             profile_dir=os.environ.get(
+                                                 "AST_MERGE_PROFILE_DIR"),
+                                             metrics_file=os.environ.get(
+                                                 "AST_MERGE_METRICS_FILE"),
+                                             trace_memory=os.environ.get("AST_MERGE_TRACE_MEMORY", "0") != "0")
+        finally:
+            log_config.end_merge(failed=exit_code != 0)
+        sys.exit(exit_code)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "repo-merge":
+        import repo_merge
+
+        sys.exit(repo_merge.main(sys.argv[2:]))
+
+    args = parse_arguments(sys.argv[1:])
+    if args.watch:
+        import watch
+
+        sys.exit(watch.watch_main(args.base, args.local, args.remote))
+
+    report = conflict_report.ConflictReport()
+
+    try:
+        exit_code = run_instrumented([args.base, args.local, args.remote],
+                                     check_main if args.check else merge_main, args, report,
+                                     profile_dir=args.profile, metrics_file=args.metrics,
+                                     trace_memory=args.trace_memory)
+    except Exception:
+        logger.error("AST Merge Tool failed unexpectedly: ", exc_info=True)
+        exit_code = 1
+
+    # code snippets are only rendered when someone asked for them
+    if args.report:
+        write_output(args.report, report.to_json(include_code=args.report_code))
+    elif report and not args.check:
+        report.log_code()
 
+    log_config.end_merge(failed=exit_code != 0)
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
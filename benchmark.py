@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite of the merge tool.
+
+    python3 benchmark.py importtime [--runs N]
+    python3 benchmark.py scaling [--runs N] [--sizes N N ...] [--match-size N]
+    python3 benchmark.py parse [--runs N] [--sizes N N ...]
+
+Every benchmark exits with 1 if it runs over its budget.
+"""
+import argparse
+import math
+import os
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Budgets for a cold start, measured as the best of several runs. The startup budget is the time a run
+# takes on top of a bare "python -c pass", so a slow machine or interpreter build doesn't fail the check
+IMPORT_BUDGET_MS = 80
+STARTUP_BUDGET_MS = 80
+
+# Number of top-level functions of the generated inputs
+SCALING_SIZES = (500, 1000, 2000, 4000)
+PARSE_SIZES = (4000, 16000)
+# Top-level statements of the sequences the scaling benchmark matches on lists and on NumPy arrays
+MATCH_SIZE = 50_000
+# Merger phases (see Merger._checkpoint) that have to scale linearly with the input
+LINEAR_PHASES = ("imports", "changesets", "deleted_functions")
+# Fitted exponent above which a linear phase counts as regressed (2.0 would be quadratic)
+MAX_LINEAR_EXPONENT = 1.3
+# Phases below these are dominated by noise, their time or memory isn't judged
+MIN_PHASE_MS = 1.0
+MIN_PHASE_KB = 64
+
+
+def measure_import_time(module="ast_merge_tool"):
+    """
+    Imports the module in a fresh interpreter with -X importtime.
+    Returns (cumulative import time of the module in ms, wall time of the whole process in ms).
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    # lines look like "import time:   self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000, wall_ms
+
+    raise RuntimeError(f"no -X importtime entry found for {module}")
+
+
+def measure_bare_start():
+    """Wall time in ms of an interpreter that does nothing, the part of the startup the tool can't change."""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], cwd=BASE_DIR, check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def bench_importtime(args):
+    # first run warms the bytecode cache
+    measure_import_time()
+    runs = [measure_import_time() for _ in range(args.runs)]
+    import_ms = min(run[0] for run in runs)
+    wall_ms = min(run[1] for run in runs)
+    overhead_ms = wall_ms - min(measure_bare_start() for _ in range(args.runs))
+
+    print(f"import ast_merge_tool: {import_ms:.1f} ms (budget {IMPORT_BUDGET_MS} ms)")
+    print(f"interpreter start + import: {wall_ms:.1f} ms, "
+          f"{overhead_ms:.1f} ms more than a bare start (budget {STARTUP_BUDGET_MS} ms)")
+
+    return import_ms <= IMPORT_BUDGET_MS and overhead_ms <= STARTUP_BUDGET_MS
+
+
+def generate_inputs(size):
+    """
+    Base, local and remote with `size` functions and size / 10 imports and constants.
+    Local deletes and edits, remote adds functions and imports, spread over the whole file,
+    so every phase of the merge has work proportional to the size.
+    """
+    base, local, remote = [], [], []
+    for i in range(size // 10):
+        line = f"from package.module{i % 7} import name{i}\n"
+        base.append(line)
+        local.append(line)
+        remote.append(line)
+    remote.extend(f"from package.module{i % 7} import extra{i}\n" for i in range(size // 10))
+
+    for i in range(size):
+        function = f"def function{i}(x):\n    return x + {i}\n\n"
+        base.append(function)
+        remote.append(function)
+        if i % 10 == 3:
+            continue  # deleted in local
+        local.append(function)
+        if i % 10 == 0:
+            local.append(f"CONSTANT_LOCAL{i} = {i}\n")
+        if i % 10 == 5:
+            remote.append(f"def added{i}(x):\n    return function{i - 1}(x) * 2\n\n")
+
+    return "".join(base), "".join(local), "".join(remote)
+
+
+class PhaseRecorder:
+    """
+    Stands in for the MergeBudget of the Merger: check(phase) is called at the end of every phase
+    and records its time and, with trace_memory, how far the traced memory peaked above its start.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.times = {}
+        self.peaks = {}
+        self._last = None
+        self._memory_at_start = 0
+
+    def _start_phase(self):
+        if self.trace_memory:
+            import tracemalloc
+
+            self._memory_at_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._last = time.perf_counter()
+
+    def start(self):
+        self._start_phase()
+
+    def count_nodes(self, *trees):
+        pass
+
+    def check(self, phase):
+        now = time.perf_counter()
+        self.times[phase] = now - self._last
+
+        if self.trace_memory:
+            import tracemalloc
+
+            self.peaks[phase] = tracemalloc.get_traced_memory()[1] - self._memory_at_start
+
+        self._start_phase()
+
+
+def run_merger(codes, recorder):
+    import ast
+    from merger import Merger
+
+    # the merge changes its trees, every run gets new ones
+    trees = [ast.parse(code) for code in codes]
+    recorder.start()
+    merger = Merger(*trees, budget=recorder)
+    merger.merging(*merger.create_changesets())
+
+
+def fit_exponent(sizes, values):
+    """Slope of the least squares fit of log(value) over log(size), 1.0 is linear and 2.0 quadratic."""
+    points = [(math.log(size), math.log(value))
+              for size, value in zip(sizes, values) if value > 0]
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    return covariance / variance
+
+
+def bench_scaling(args):
+    import logging
+    import tracemalloc
+    from log_config import logger
+
+    logger.setLevel(logging.WARNING)
+    sys.setrecursionlimit(10_000)
+
+    times = {}
+    peaks = {}
+    for size in args.sizes:
+        codes = generate_inputs(size)
+
+        runs = []
+        for _ in range(args.runs):
+            recorder = PhaseRecorder()
+            run_merger(codes, recorder)
+            runs.append(recorder.times)
+        for phase in runs[0]:
+            times.setdefault(phase, []).append(min(run[phase] for run in runs))
+
+        tracemalloc.start()
+        recorder = PhaseRecorder(trace_memory=True)
+        run_merger(codes, recorder)
+        tracemalloc.stop()
+        for phase, peak in recorder.peaks.items():
+            peaks.setdefault(phase, []).append(peak)
+
+    print(f"sizes: {', '.join(str(size) for size in args.sizes)} functions")
+    print(f"{'phase':<18} {'time exp':>8} {'memory exp':>10}  ms at largest size")
+
+    ok = True
+    for phase, phase_times in times.items():
+        time_exponent = fit_exponent(args.sizes, phase_times)
+        memory_exponent = fit_exponent(args.sizes, peaks[phase])
+
+        verdict = ""
+        if phase in LINEAR_PHASES:
+            time_regressed = phase_times[-1] * 1000 >= MIN_PHASE_MS and time_exponent > MAX_LINEAR_EXPONENT
+            memory_regressed = peaks[phase][-1] / 1024 >= MIN_PHASE_KB and memory_exponent > MAX_LINEAR_EXPONENT
+            verdict = "  [FAIL] not linear" if time_regressed or memory_regressed else "  linear"
+            ok = ok and not (time_regressed or memory_regressed)
+
+        print(f"{phase:<18} {time_exponent:>8.2f} {memory_exponent:>10.2f}  "
+              f"{phase_times[-1] * 1000:>8.1f}{verdict}")
+
+    if args.match_size:
+        ok = bench_match(args.match_size, args.runs) and ok
+    return ok
+
+
+def bench_match(size, runs):
+    """
+    Times ast_mapper.match_sequences on the top-level statements of local and remote of a large input,
+    on lists and on NumPy arrays. Both have to return the same matches.
+    """
+    import ast
+    import gc
+    import ast_mapper
+
+    local, remote = [ast_mapper.map_top_level_nodes_without_imports(ast.parse(code))
+                     for code in generate_inputs(size)[1:]]
+    numpy = ast_mapper._load_numpy()
+    print(f"match_sequences, {len(local)} and {len(remote)} statements:")
+
+    results = []
+    for name, module in (("lists", None), ("numpy", numpy)):
+        if name == "numpy" and numpy is None:
+            print(f"{name:<18} not installed")
+            continue
+        sequences = [ast_mapper.FingerprintSequence(nodes, module) for nodes in (local, remote)]
+        # the parsed trees are new, the first collection that visits them would be timed with the match
+        gc.collect()
+        seconds = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            matches = ast_mapper.match_sequences(*sequences)
+            seconds.append(time.perf_counter() - started)
+        results.append(matches)
+        print(f"{name:<18} {min(seconds) * 1000:>8.1f} ms  {len(matches)} matches")
+
+    if len(results) == 2 and results[0] != results[1]:
+        print("[FAIL] lists and numpy match differently")
+        return False
+    return True
+
+
+def parse_strategies():
+    """name -> function(sources) returning the three trees, the strategies parse_inputs chooses from."""
+    import fingerprint
+    import incremental_parse
+    import parser
+
+    return {
+        "full": lambda sources: [parser.parse_python_code(source.text) for source in sources],
+        "incremental": incremental_parse.parse_incrementally,
+        "parallel": fingerprint.parse_lazily,
+    }
+
+
+def bench_parse(args):
+    """
+    Times the parse strategies and the merge on their trees: lazy and incremental trees
+    change the work of the later phases, so only parse + merge shows the real speedup.
+    The workers of the parallel strategy share the CPUs of this machine, the last line of a size
+    estimates it with one core per input: the worker times run side by side instead of one after another.
+    Informational, there is no budget.
+    """
+    import logging
+    import fingerprint
+    from input_buffer import InputBuffer
+    from log_config import logger
+    from merger import Merger
+
+    logger.setLevel(logging.WARNING)
+    sys.setrecursionlimit(10_000)
+    sizes = args.sizes if args.sizes != list(SCALING_SIZES) else list(PARSE_SIZES)
+
+    print(f"{os.cpu_count()} CPU(s)")
+    print(f"{'functions':>9} {'MB':>6} {'strategy':<12} {'parse ms':>9} {'merge ms':>9} {'total ms':>9} {'speedup':>8}")
+    for size in sizes:
+        codes = generate_inputs(size)
+        megabytes = sum(len(code) for code in codes) / 1024 / 1024
+        full_total = None
+        for name, parse in parse_strategies().items():
+            parse_times, merge_times = [], []
+            for _ in range(args.runs):
+                sources = [InputBuffer.from_text(code).source for code in codes]
+                started = time.perf_counter()
+                trees = list(fingerprint.intern_trees(*parse(sources)))
+                parsed = time.perf_counter()
+                merger = Merger(*trees)
+                merger.merging(*merger.create_changesets())
+                parse_times.append(parsed - started)
+                merge_times.append(time.perf_counter() - parsed)
+
+            parse_ms, merge_ms = min(parse_times) * 1000, min(merge_times) * 1000
+            total_ms = parse_ms + merge_ms
+            if full_total is None:
+                full_total = total_ms
+            print(f"{size:>9} {megabytes:>6.2f} {name:<12} {parse_ms:>9.1f} {merge_ms:>9.1f} "
+                  f"{total_ms:>9.1f} {full_total / total_ms:>7.2f}x")
+
+        worker_ms = []
+        for code in codes:
+            started = time.perf_counter()
+            fingerprint.summarize_source(code)
+            worker_ms.append((time.perf_counter() - started) * 1000)
+        if (os.cpu_count() or 1) < len(codes):
+            parse_ms -= sum(worker_ms) - max(worker_ms)
+            total_ms = parse_ms + merge_ms
+            print(f"{size:>9} {megabytes:>6.2f} {'parallel*':<12} {parse_ms:>9.1f} {merge_ms:>9.1f} "
+                  f"{total_ms:>9.1f} {full_total / total_ms:>7.2f}x  (* estimated, {len(codes)} cores)")
+
+    return True
+
+
+BENCHMARKS = {
+    "importtime": bench_importtime,
+    "scaling": bench_scaling,
+    "parse": bench_parse,
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    arg_parser.add_argument("--runs", type=int, default=5)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=list(SCALING_SIZES),
+                            help="input sizes of the scaling benchmark")
+    arg_parser.add_argument("--match-size", type=int, default=MATCH_SIZE,
+                            help="statements of the large sequence match of the scaling benchmark, 0 skips it")
+    args = arg_parser.parse_args()
+
+    if not BENCHMARKS[args.benchmark](args):
+        print("[FAIL] over budget")
+        sys.exit(1)
+    print("[OK] within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Builds a single-file zipapp of the merge tool with precompiled bytecode.
+
+    python3 build_bundle.py [output.pyz]
+
+The bytecode is compiled for the running interpreter, the bundle has to be run
+with the same Python version. autopep8 is not bundled and must be installed.
+"""
+import os
+import py_compile
+import shutil
+import sys
+import tempfile
+import zipapp
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, "dist", "ast_merge_tool.pyz")
+
+# development scripts that are not needed at runtime
+EXCLUDED_MODULES = {"build_bundle.py", "ast_test_script.py", "benchmark.py", "corpus.py"}
+
+MAIN_SOURCE = """import ast_merge_tool
+
+ast_merge_tool.main()
+"""
+
+
+def runtime_modules():
+    return sorted(
+        name for name in os.listdir(BASE_DIR)
+        if name.endswith(".py") and name not in EXCLUDED_MODULES
+    )
+
+
+def _compile_next_to_source(staging_dir, name):
+    """
+    Writes an unchecked hash based .pyc next to the source.
+    zipimport prefers the .pyc, the source is only kept for tracebacks.
+    """
+    source_path = os.path.join(staging_dir, name)
+    py_compile.compile(
+        source_path,
+        cfile=source_path + "c",
+        dfile=name,
+        doraise=True,
+        invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+    )
+
+
+def build_bundle(output=DEFAULT_OUTPUT):
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as staging_dir:
+        for name in runtime_modules():
+            shutil.copyfile(os.path.join(BASE_DIR, name),
+                            os.path.join(staging_dir, name))
+            _compile_next_to_source(staging_dir, name)
+
+        with open(os.path.join(staging_dir, "__main__.py"), "w", encoding="utf-8") as f:
+            f.write(MAIN_SOURCE)
+        _compile_next_to_source(staging_dir, "__main__.py")
+
+        zipapp.create_archive(
+            staging_dir,
+            target=output,
+            interpreter="/usr/bin/env python3",
+            compressed=True,
+        )
+
+    return output
+
+
+if __name__ == "__main__":
+    output = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_OUTPUT
+    print(f"Bundle written to {build_bundle(output)}")
@@ -1,24 +1,22 @@
 from log_config import logger
 
 
-def check_file_syntax(file_path: str) -> bool:
+def check_code_syntax(code: str, file_name: str) -> bool:
     """
-    Checks a Python file for syntax errors and prints detailed error info.
+    Checks Python source code for syntax errors without touching the disk.
     Returns True if no syntax errors.
     """
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            code = f.read()
-        compile(code, file_path, "exec")
-        logger.debug(f"No syntax errors found in {file_path}.")
+        compile(code, file_name, "exec")
+        logger.debug(f"No syntax errors found in {file_name}.")
         return True
 
     except SyntaxError as e:
         if e:
-            logger.error(f"Syntax Error in {file_path}: ", exc_info=True)
+            logger.error(f"Syntax Error in {file_name}: ", exc_info=True)
         return False
 
     except Exception as ex:
         if ex:
-            logger.error(f"Error checking {file_path}: ", exc_info=True)
+            logger.error(f"Error checking {file_name}: ", exc_info=True)
         return False
@@ -0,0 +1 @@
+HOST = "example.org"
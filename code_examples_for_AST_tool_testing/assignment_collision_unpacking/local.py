@@ -0,0 +1,2 @@
+HOST = "example.org"
+USER, PORT = "admin", 8080
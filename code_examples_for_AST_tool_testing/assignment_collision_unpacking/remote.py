@@ -0,0 +1,2 @@
+HOST = "example.org"
+PORT = 9090
@@ -0,0 +1,3 @@
+RETRIES = 3
+RETRIES += 2
+TIMEOUT = 10
@@ -0,0 +1,6 @@
+COUNT = 0
+
+
+def increment():
+    global COUNT
+    COUNT = COUNT + 1
@@ -0,0 +1,11 @@
+COUNT = 0
+
+
+def increment():
+    global COUNT
+    COUNT = COUNT + 1
+
+
+def reset():
+    global COUNT
+    COUNT = 0
@@ -0,0 +1,17 @@
+COUNT = 0
+LIMIT = 10
+
+
+def increment():
+    global COUNT
+    COUNT = COUNT + 1
+
+
+def reset():
+    global COUNT
+    COUNT = 0
+
+
+def set_limit(value):
+    global LIMIT
+    LIMIT = value
@@ -0,0 +1,12 @@
+COUNT = 0
+LIMIT = 10
+
+
+def increment():
+    global COUNT
+    COUNT = COUNT + 1
+
+
+def set_limit(value):
+    global LIMIT
+    LIMIT = value
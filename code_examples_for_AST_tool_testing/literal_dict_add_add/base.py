@@ -0,0 +1,2 @@
+SETTINGS = {"host": "localhost", "port": 8080}
+DEBUG = False
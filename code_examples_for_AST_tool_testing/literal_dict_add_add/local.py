@@ -0,0 +1,2 @@
+SETTINGS = {"host": "localhost", "port": 8080, "timeout": 30}
+DEBUG = False
@@ -0,0 +1,2 @@
+SETTINGS = {"host": "example.org", "port": 8080, "retries": 3}
+DEBUG = False
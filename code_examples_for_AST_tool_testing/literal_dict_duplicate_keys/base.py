@@ -0,0 +1 @@
+MAPPING = {"a": 1, "b": 2, "a": 3}
@@ -0,0 +1 @@
+MAPPING = {"a": 1, "b": 20, "a": 3}
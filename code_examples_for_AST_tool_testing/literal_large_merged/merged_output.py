@@ -0,0 +1,67 @@
+UNCHANGED = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29,
+             30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 45, 46, 47, 48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59]
+NAMES = [
+    'remote',
+    'item0',
+    'item1',
+    'item2',
+    'item3',
+    'item4',
+    'item5',
+    'item6',
+    'item7',
+    'item8',
+    'item9',
+    'item10',
+    'item11',
+    'item12',
+    'item13',
+    'item14',
+    'item15',
+    'item16',
+    'item17',
+    'item18',
+    'item19',
+    'item20',
+    'item21',
+    'item22',
+    'item23',
+    'item24',
+    'item25',
+    'item26',
+    'item27',
+    'item28',
+    'item29',
+    'item30',
+    'item31',
+    'item32',
+    'item33',
+    'item34',
+    'item35',
+    'item36',
+    'item37',
+    'item38',
+    'item39',
+    'item40',
+    'item41',
+    'item42',
+    'item43',
+    'item44',
+    'item45',
+    'item46',
+    'item47',
+    'item48',
+    'item49',
+    'item50',
+    'item51',
+    'item52',
+    'item53',
+    'item54',
+    'item55',
+    'item56',
+    'item57',
+    'item58',
+    'item59',
+    'local',
+]
+EXTRA = 1
@@ -0,0 +1 @@
+LEVELS = [1, 2, 3]
@@ -0,0 +1 @@
+LEVELS = [1, 20, 3]
@@ -0,0 +1 @@
+LEVELS = [1, 30, 3]
@@ -0,0 +1 @@
+NAMES = ["alpha", "beta", "gamma", "delta"]
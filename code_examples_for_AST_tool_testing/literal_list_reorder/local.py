@@ -0,0 +1 @@
+NAMES = ["delta", "alpha", "beta", "gamma"]
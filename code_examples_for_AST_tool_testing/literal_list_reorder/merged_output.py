@@ -0,0 +1 @@
+NAMES = ['delta', 'alpha', 'epsilon', 'beta', 'gamma']
@@ -0,0 +1 @@
+NAMES = ["alpha", "epsilon", "beta", "gamma", "delta"]
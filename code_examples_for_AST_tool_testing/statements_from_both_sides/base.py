@@ -0,0 +1,8 @@
+import json
+
+VERSION = "1.0"
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
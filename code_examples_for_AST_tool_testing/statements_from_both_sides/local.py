@@ -0,0 +1,14 @@
+import json
+import os
+
+VERSION = "1.0"
+CONFIG_DIR = os.path.expanduser("~/.config")
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def config_path(name):
+    return os.path.join(CONFIG_DIR, name)
@@ -0,0 +1,21 @@
+import json
+import os
+import sys
+VERSION = '1.0'
+CONFIG_DIR = os.path.expanduser('~/.config')
+DEFAULT_ENCODING = 'utf-8'
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def config_path(name):
+    return os.path.join(CONFIG_DIR, name)
+
+
+def save(path, data):
+    with open(path, 'w', encoding=DEFAULT_ENCODING) as f:
+        json.dump(data, f)
+    sys.stdout.write(path + '\n')
@@ -0,0 +1,16 @@
+import json
+import sys
+
+VERSION = "1.0"
+DEFAULT_ENCODING = "utf-8"
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(path, data):
+    with open(path, "w", encoding=DEFAULT_ENCODING) as f:
+        json.dump(data, f)
+    sys.stdout.write(path + "\n")
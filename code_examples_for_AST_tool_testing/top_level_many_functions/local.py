@@ -0,0 +1,42 @@
+import re
+
+SEPARATOR = ","
+
+
+def parse(text):
+    return 'parse' + text
+
+
+def validate(text):
+    return 'validate' + text
+
+
+def normalize(text):
+    return 'normalize' + text
+
+
+def strip(text):
+    return text.strip()
+
+
+WIDTH = 80
+
+
+def tokenize(text):
+    return 'tokenize' + text
+
+
+def render(text):
+    return 'render' + text
+
+
+def escape(text):
+    return 'escape' + text
+
+
+def indent(text):
+    return 'indent' + text
+
+
+def wrap(text):
+    return 'wrap' + text
@@ -0,0 +1,135 @@
+import json
+
+from log_config import logger
+import source_text
+from version import TOOL_VERSION
+
+
+# conflict kinds
+ASSIGNMENT_COLLISION = "assignment_collision"
+UNSUPPORTED_NODE = "unsupported_node"
+DELETED_FUNCTION_REFERENCED = "deleted_function_referenced"
+UNSAFE_FUNCTION_MERGE = "unsafe_function_merge"
+INVALID_INPUT = "invalid_input"
+INVALID_OUTPUT = "invalid_output"
+BUDGET_EXCEEDED = "budget_exceeded"
+TEXT_CONFLICT = "text_conflict"
+INTERNAL_ERROR = "internal_error"
+
+LOCAL = "local"
+REMOTE = "remote"
+
+SIDE_LABELS = {LOCAL: "LEFT (Local)", REMOTE: "RIGHT (Remote)"}
+
+
+SPAN_KEYS = ("lineno", "end_lineno", "col_offset", "end_col_offset")
+
+
+def node_span(node):
+    # conflicts restored from a cached report only have their spans left
+    if isinstance(node, dict):
+        return {key: node.get(key) for key in SPAN_KEYS}
+    return {key: getattr(node, key, None) for key in SPAN_KEYS}
+
+
+def _line_range(node):
+    span = node_span(node)
+    lineno = span["lineno"] if span["lineno"] is not None else "?"
+    end_lineno = span["end_lineno"] if span["end_lineno"] is not None else lineno
+    return f"{lineno}" if end_lineno == lineno else f"{lineno}-{end_lineno}"
+
+
+class Conflict:
+    """
+    One reason why the merge can't be done automatically.
+    Only references the offending nodes, their code is rendered when it is asked for.
+    """
+
+    def __init__(self, kind, symbol, reason, local_nodes=(), remote_nodes=()):
+        self.kind = kind
+        self.symbol = symbol
+        self.reason = reason
+        self.nodes = [(LOCAL, node) for node in local_nodes] + \
+            [(REMOTE, node) for node in remote_nodes]
+
+    def summary(self):
+        sides = ", ".join(f"{side} line {_line_range(node)}" for side, node in self.nodes)
+        symbol = f" '{self.symbol}'" if self.symbol else ""
+        return f"[{self.kind}]{symbol}: {self.reason}" + (f" ({sides})" if sides else "")
+
+    def to_dict(self, include_code=False, sources=None):
+        nodes = []
+        for side, node in self.nodes:
+            entry = {"side": side, **node_span(node)}
+            if include_code and not isinstance(node, dict):
+                entry["code"] = source_text.render_node(
+                    node, (sources or {}).get(side))
+            nodes.append(entry)
+
+        return {
+            "kind": self.kind,
+            "symbol": self.symbol,
+            "reason": self.reason,
+            "nodes": nodes,
+        }
+
+    def __repr__(self):
+        return f"<Conflict {self.kind} {self.symbol!r}>"
+
+
+class ConflictReport:
+    """
+    Machine readable collection of all conflicts of a merge.
+    With the SourceText of the local and remote input in sources, code is sliced from the original files.
+    """
+
+    def __init__(self):
+        self.conflicts = []
+        self.sources = {}
+
+    def add(self, conflict):
+        self.conflicts.append(conflict)
+        logger.merge(conflict.summary())
+
+    def __bool__(self):
+        return bool(self.conflicts)
+
+    def __len__(self):
+        return len(self.conflicts)
+
+    def to_dict(self, include_code=False):
+        return {
+            "tool_version": TOOL_VERSION,
+            "mergeable": not self.conflicts,
+            "conflicts": [conflict.to_dict(include_code, self.sources) for conflict in self.conflicts],
+        }
+
+    def to_json(self, include_code=False):
+        return json.dumps(self.to_dict(include_code), indent=2)
+
+    def extend_from_json(self, report_json):
+        """Adds the conflicts of a stored report (see to_json), their nodes are only spans."""
+        if not report_json:
+            return
+        for entry in json.loads(report_json)["conflicts"]:
+            conflict = Conflict(entry["kind"], entry["symbol"], entry["reason"])
+            conflict.nodes = [(node["side"], node_span(node))
+                              for node in entry["nodes"]]
+            self.add(conflict)
+
+    def log_code(self):
+        """Renders the code of every conflicting node into the merge log."""
+        import utilitys
+
+        for conflict in self.conflicts:
+            if not conflict.nodes:
+                continue
+            logger.merge(f"--- {conflict.summary()} ---")
+            for side in (LOCAL, REMOTE):
+                nodes = [node for node_side, node in conflict.nodes
+                         if node_side == side and not isinstance(node, dict)]
+                if not nodes:
+                    continue
+                logger.merge(f"{SIDE_LABELS[side]}:")
+                for line in utilitys.format_nodes_with_lineno(nodes, self.sources.get(side)).splitlines():
+                    logger.merge(line)
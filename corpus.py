@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Benchmark corpus mined from the merge commits of a git repository.
+
+    python3 corpus.py mine REPO CORPUS_DIR [--rev REV] [--max-merges N]
+    python3 corpus.py replay CORPUS_DIR [--json FILE]
+
+mine walks the two-parent merge commits reachable from REV. For every Python file that
+both parents changed against their merge base, it stores one case in the layout of
+code_examples_for_AST_tool_testing: base.py, local.py (first parent), remote.py
+(second parent) and merged_output.py (the committed result), plus case.json
+(repository, commit, path).
+
+replay merges every case (the merge driver pipeline, without the result cache) and reports
+throughput, latency percentiles, the auto-merge rate and the clean merges whose result differs
+from the committed one (compared as ASTs, formatting and comments don't count).
+It exits with 1 if there are mismatches.
+"""
+import argparse
+import ast
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import ast_merge_tool
+import log_config
+from log_config import logger
+import prescan
+from input_buffer import InputBuffer
+from repo_merge import git, read_blobs
+
+CASE_FILES = ("base.py", "local.py", "remote.py", "merged_output.py")
+CASE_INFO = "case.json"
+
+# Latency percentiles of the replay report
+PERCENTILES = (50, 90, 99)
+# Mismatching cases listed in the text report
+MAX_LISTED_MISMATCHES = 20
+
+
+def _changed_blobs(repo, old, new):
+    """path -> (old blob, new blob) of the files modified between two commits, renames are not followed."""
+    output = git(repo, "diff", "--raw", "-z", "--no-renames",
+                 "--no-abbrev", old, new).stdout
+    fields = output.split(b"\0")
+    changed = {}
+    # :<old mode> <new mode> <old blob> <new blob> <status> NUL <path> NUL
+    for info, path in zip(fields[0::2], fields[1::2]):
+        parts = info.split(b" ")
+        if len(parts) == 5 and parts[4] == b"M":
+            changed[os.fsdecode(path)] = (parts[2].decode("ascii"), parts[3].decode("ascii"))
+    return changed
+
+
+def _tree_blobs(repo, commit, paths):
+    """path -> blob id in the tree of the commit, for the paths that exist there."""
+    output = git(repo, "ls-tree", "-z", commit, "--", *paths).stdout
+    blobs = {}
+    for entry in output.split(b"\0"):
+        if not entry:
+            continue
+        # <mode> SP <type> SP <object> TAB <path>
+        info, path = entry.split(b"\t", 1)
+        _, kind, blob = info.split(b" ")
+        if kind == b"blob":
+            blobs[os.fsdecode(path)] = blob.decode("ascii")
+    return blobs
+
+
+def merge_commits(repo, rev="HEAD", max_merges=None):
+    """(merge commit, first parent, second parent) of the two-parent merges reachable from rev, newest first."""
+    args = ["rev-list", "--merges", "--parents"]
+    if max_merges:
+        args.append(f"--max-count={max_merges}")
+    merges = []
+    for line in git(repo, *args, rev).stdout.decode("ascii").splitlines():
+        commits = line.split()
+        # octopus merges have no single merge base
+        if len(commits) == 3:
+            merges.append(tuple(commits))
+    return merges
+
+
+def mine(repo, corpus_dir, rev="HEAD", max_merges=None):
+    """Writes a case for every Python file changed on both sides of a merge, returns the number of cases."""
+    cases = 0
+    for commit, first_parent, second_parent in merge_commits(repo, rev, max_merges):
+        try:
+            merge_base = git(repo, "merge-base", first_parent,
+                             second_parent).stdout.decode("ascii").strip()
+        except subprocess.CalledProcessError:
+            # unrelated histories
+            continue
+
+        changed_first = _changed_blobs(repo, merge_base, first_parent)
+        changed_second = _changed_blobs(repo, merge_base, second_parent)
+        paths = sorted(path for path in changed_first.keys() & changed_second.keys()
+                       if path.endswith(prescan.PYTHON_EXTENSIONS))
+        if not paths:
+            continue
+
+        results = _tree_blobs(repo, commit, paths)
+        paths = [path for path in paths if path in results]
+        triples = {path: (changed_first[path][0], changed_first[path][1], changed_second[path][1], results[path])
+                   for path in paths}
+        blobs = read_blobs(repo, [blob for blob_ids in triples.values() for blob in blob_ids])
+
+        for index, path in enumerate(paths):
+            case_dir = os.path.join(corpus_dir, f"{commit[:12]}-{index:03d}")
+            os.makedirs(case_dir, exist_ok=True)
+            for file_name, blob in zip(CASE_FILES, triples[path]):
+                with open(os.path.join(case_dir, file_name), "wb") as f:
+                    f.write(blobs[blob])
+            info = {"repo": os.path.abspath(repo), "commit": commit, "parents": [first_parent, second_parent],
+                    "merge_base": merge_base, "path": path}
+            with open(os.path.join(case_dir, CASE_INFO), "w", encoding="utf-8") as f:
+                json.dump(info, f, indent=2)
+            cases += 1
+
+    return cases
+
+
+def case_dirs(corpus_dir):
+    return sorted(os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir)
+                  if os.path.isfile(os.path.join(corpus_dir, name, CASE_FILES[0])))
+
+
+def same_result(merged, committed):
+    """Compares the merged and the committed file as ASTs, as bytes if one of them doesn't parse."""
+    try:
+        return ast.dump(ast.parse(merged)) == ast.dump(ast.parse(committed))
+    except (SyntaxError, ValueError):
+        return merged == committed
+
+
+def replay_case(case_dir):
+    """Merges one case. Returns (exit code, method, seconds, size, matches the committed result)."""
+    buffers = [InputBuffer.from_file(os.path.join(case_dir, file_name))
+               for file_name in CASE_FILES[:3]]
+    with open(os.path.join(case_dir, CASE_FILES[3]), "rb") as f:
+        committed = f.read()
+    path_name = None
+    if os.path.isfile(os.path.join(case_dir, CASE_INFO)):
+        with open(os.path.join(case_dir, CASE_INFO), encoding="utf-8") as f:
+            path_name = json.load(f)["path"]
+
+    started = time.perf_counter()
+    merged, exit_code, method = ast_merge_tool.merge_buffers(
+        buffers, path_name, parallel=False, use_cache=False)
+    seconds = time.perf_counter() - started
+    log_config.end_merge(failed=exit_code != 0)
+
+    if merged is None:
+        # LOCAL is kept as it is
+        merged = buffers[1].to_bytes()
+    if isinstance(merged, str):
+        merged = merged.encode("utf-8")
+    size = sum(buffer.size for buffer in buffers)
+    for buffer in buffers:
+        buffer.close()
+    return exit_code, method, seconds, size, exit_code != 0 or same_result(merged, committed)
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of the values."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def replay(corpus_dir):
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    started = time.perf_counter()
+    for case_dir in case_dirs(corpus_dir):
+        rows.append((os.path.basename(case_dir), *replay_case(case_dir)))
+    total_seconds = time.perf_counter() - started
+
+    latencies = [row[3] for row in rows]
+    methods = {}
+    for _, exit_code, method, *_ in rows:
+        if exit_code == 0:
+            methods[method] = methods.get(method, 0) + 1
+    return {
+        "cases": len(rows),
+        "seconds": round(total_seconds, 3),
+        "cases_per_second": round(len(rows) / total_seconds, 1) if total_seconds else 0.0,
+        "mb_per_second": round(sum(row[4] for row in rows) / 1024 / 1024 / total_seconds, 2) if total_seconds else 0.0,
+        "latency_ms": {f"p{percent}": round(percentile(latencies, percent) * 1000, 1)
+                       for percent in PERCENTILES} if rows else {},
+        "max_ms": round(max(latencies) * 1000, 1) if rows else 0.0,
+        "auto_merged": sum(methods.values()),
+        "auto_merge_rate": round(sum(methods.values()) / len(rows), 3) if rows else 0.0,
+        "clean_by_method": methods,
+        "mismatches": [row[0] for row in rows if not row[5]],
+    }
+
+
+def format_report(summary):
+    latency = ", ".join(f"{name} {value} ms" for name, value in summary["latency_ms"].items())
+    lines = [
+        f"cases:           {summary['cases']} in {summary['seconds']}s "
+        f"({summary['cases_per_second']} cases/s, {summary['mb_per_second']} MB/s)",
+        f"latency:         {latency}, max {summary['max_ms']} ms",
+        f"auto-merged:     {summary['auto_merged']} ({summary['auto_merge_rate']:.1%}) "
+        + ", ".join(f"{method} {count}" for method, count in sorted(summary["clean_by_method"].items())),
+        f"mismatches:      {len(summary['mismatches'])}",
+    ]
+    lines += [f"    {case}" for case in summary["mismatches"][:MAX_LISTED_MISMATCHES]]
+    return "\n".join(lines)
+
+
+def cmd_mine(args):
+    try:
+        cases = mine(args.repo, args.corpus_dir, args.rev, args.max_merges)
+    except subprocess.CalledProcessError as e:
+        print(f"git failed: {e.stderr.decode(errors='replace').strip()}", file=sys.stderr)
+        return False
+    print(f"{cases} case(s) written to {args.corpus_dir}")
+    return True
+
+
+def cmd_replay(args):
+    summary = replay(args.corpus_dir)
+    print(format_report(summary))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return not summary["mismatches"]
+
+
+COMMANDS = {
+    "mine": cmd_mine,
+    "replay": cmd_replay,
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    mine_parser = commands.add_parser("mine", help="extract the merge cases of a repository")
+    mine_parser.add_argument("repo")
+    mine_parser.add_argument("corpus_dir")
+    mine_parser.add_argument("--rev", default="HEAD",
+                             help="walk the merges reachable from REV (default: HEAD)")
+    mine_parser.add_argument("--max-merges", type=int, default=None,
+                             help="only the newest N merge commits")
+
+    replay_parser = commands.add_parser("replay", help="merge every case and compare with the committed result")
+    replay_parser.add_argument("corpus_dir")
+    replay_parser.add_argument("--json", metavar="FILE",
+                               help="also write the summary as JSON to FILE")
+    args = arg_parser.parse_args()
+
+    if not COMMANDS[args.command](args):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
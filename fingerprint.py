@@ -0,0 +1,332 @@
+import ast
+import hashlib
+import os
+from array import array
+
+
+# Inputs with at least this many bytes (all three together) are parsed in worker processes, 0 turns it off.
+# Off by default: the coordinator parses local and the changed part of remote again,
+# which eats up what the workers save (see benchmark.py parse).
+PARALLEL_MIN_BYTES = int(os.environ.get(
+    "AST_MERGE_PARALLEL_MIN_BYTES", 0))
+
+FINGERPRINT_SIZE = 16
+FINGERPRINT_ATTR = "_ast_merge_fingerprint"
+
+IMPORT_KINDS = ("Import", "ImportFrom")
+FUNCTION_KINDS = ("FunctionDef", "AsyncFunctionDef")
+
+
+def _hash_value(digest, value):
+    # length prefixed, so the fields of different nodes can't run into each other
+    data = repr(value).encode("utf-8", "surrogatepass")
+    digest.update(b"v%d:" % len(data))
+    digest.update(data)
+
+
+def compute_fingerprint(node):
+    """
+    Merkle hash of the node's structure: its type, its plain fields and the fingerprints of its children.
+    Positions are ignored like in ast.dump(include_attributes=False).
+    The fingerprints of the children have to be known (see node_fingerprint).
+    """
+    digest = hashlib.blake2b(type(node).__name__.encode(
+        "ascii"), digest_size=FINGERPRINT_SIZE)
+    for field in node._fields:
+        value = getattr(node, field, None)
+        if isinstance(value, ast.AST):
+            digest.update(b"n")
+            digest.update(getattr(value, FINGERPRINT_ATTR))
+        elif isinstance(value, list):
+            digest.update(b"l%d:" % len(value))
+            for item in value:
+                if isinstance(item, ast.AST):
+                    digest.update(b"n")
+                    digest.update(getattr(item, FINGERPRINT_ATTR))
+                else:
+                    _hash_value(digest, item)
+        else:
+            _hash_value(digest, value)
+    return digest.digest()
+
+
+def node_fingerprint(node):
+    """
+    Fingerprint of the node, computed once for the node and all its subtrees and kept on the nodes.
+    Iterative, deeply nested expressions don't hit the recursion limit.
+    """
+    fingerprint = getattr(node, FINGERPRINT_ATTR, None)
+    if fingerprint is not None:
+        return fingerprint
+
+    stack = [(node, False)]
+    while stack:
+        current, children_done = stack.pop()
+        if getattr(current, FINGERPRINT_ATTR, None) is not None:
+            continue
+        if children_done:
+            setattr(current, FINGERPRINT_ATTR, compute_fingerprint(current))
+            continue
+        stack.append((current, True))
+        for child in ast.iter_child_nodes(current):
+            if getattr(child, FINGERPRINT_ATTR, None) is None:
+                stack.append((child, False))
+
+    return getattr(node, FINGERPRINT_ATTR)
+
+
+class SubtreeInterner:
+    """
+    Hash-consing of the subtrees of base, local and remote, which are mostly identical:
+    every structurally equal subtree below the top-level statements is replaced by one canonical node,
+    so the three trees share their memory and equal subtrees are the same object.
+    The top-level statements (and their decorators) stay separate, their positions are used
+    for the source snippets of the conflict report. Shared nodes must not be changed.
+    """
+
+    def __init__(self):
+        self.canonical = {}
+
+    def _canonical(self, node):
+        return self.canonical.setdefault(node_fingerprint(node), node)
+
+    def intern_tree(self, tree):
+        if tree is None:
+            return None
+
+        for statement in tree.body:
+            if isinstance(statement, LazyStatement):
+                continue
+
+            stack = [statement]
+            while stack:
+                parent = stack.pop()
+                for field, value in ast.iter_fields(parent):
+                    if parent is statement and field == "decorator_list":
+                        continue
+                    if isinstance(value, ast.AST):
+                        canonical = self._canonical(value)
+                        if canonical is value:
+                            stack.append(value)
+                        else:
+                            setattr(parent, field, canonical)
+                    elif isinstance(value, list):
+                        for index, item in enumerate(value):
+                            if not isinstance(item, ast.AST):
+                                continue
+                            canonical = self._canonical(item)
+                            if canonical is item:
+                                stack.append(item)
+                            else:
+                                value[index] = canonical
+        return tree
+
+
+def intern_trees(base, local, remote):
+    """Shares the equal subtrees of the three trees, local's nodes are the canonical ones."""
+    interner = SubtreeInterner()
+    interner.intern_tree(local)
+    interner.intern_tree(base)
+    interner.intern_tree(remote)
+    return base, local, remote
+
+
+def use_parallel(total_bytes):
+    # on a single core the worker processes only add their start-up time
+    if (os.cpu_count() or 1) < 2:
+        return False
+    return bool(PARALLEL_MIN_BYTES) and total_bytes >= PARALLEL_MIN_BYTES
+
+
+class ModuleSummary:
+    """
+    Everything the coordinator needs to know about the top-level statements of an input, without the tree:
+    fingerprint, kind, name, line range (including decorators) and node count of every statement.
+    Small enough to be sent back from a worker process instead of a pickled AST.
+    """
+
+    def __init__(self, fingerprints, kinds, names, lines, node_counts):
+        self.fingerprints = fingerprints
+        self.kinds = kinds
+        self.names = names
+        self.lines = lines
+        self.node_counts = node_counts
+
+    @classmethod
+    def from_tree(cls, tree):
+        fingerprints = bytearray()
+        kinds = []
+        names = []
+        lines = array("l")
+        node_counts = array("l")
+
+        for node in tree.body:
+            fingerprints += node_fingerprint(node)
+            kinds.append(type(node).__name__)
+            names.append(getattr(node, "name", None))
+            decorators = getattr(node, "decorator_list", None)
+            lineno = min(decorator.lineno for decorator in decorators) if decorators else node.lineno
+            lines.extend((lineno, node.end_lineno))
+            node_counts.append(sum(1 for _ in ast.walk(node)))
+
+        return cls(bytes(fingerprints), kinds, names, lines, node_counts)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def fingerprint(self, index):
+        return self.fingerprints[index * FINGERPRINT_SIZE:(index + 1) * FINGERPRINT_SIZE]
+
+    def line_range(self, index):
+        return self.lines[2 * index], self.lines[2 * index + 1]
+
+
+def summarize_source(text):
+    """Worker: parses the source and returns its ModuleSummary, or None for a syntax error."""
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        return None
+    return ModuleSummary.from_tree(tree)
+
+
+def summarize_sources(texts):
+    """Parses and fingerprints the inputs in parallel worker processes, one per input."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    executor = ProcessPoolExecutor(
+        max_workers=min(len(texts), os.cpu_count() or 1))
+    try:
+        futures = [executor.submit(summarize_source, text) for text in texts]
+        return [future.result() for future in futures]
+    finally:
+        # returns right away if the merge budget interrupts the wait
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LazyStatement(ast.stmt):
+    """
+    Placeholder for a top-level statement that wasn't rebuilt, the merge only needs its fingerprint.
+    materialize() parses the statement if it turns out to be needed after all.
+    """
+    _fields = ()
+
+    def __init__(self, builder, index):
+        super().__init__()
+        self.builder = builder
+        self.index = index
+        self.kind = builder.summary.kinds[index]
+        self.name = builder.summary.names[index]
+        self.node_count = builder.summary.node_counts[index]
+        setattr(self, FINGERPRINT_ATTR, builder.summary.fingerprint(index))
+
+    def __repr__(self):
+        return f"<LazyStatement {self.kind} {self.name or ''}>"
+
+
+def materialize(node):
+    if isinstance(node, LazyStatement):
+        return node.builder.statement(node.index)
+    return node
+
+
+def is_lazy_function(node):
+    return isinstance(node, LazyStatement) and node.kind in FUNCTION_KINDS
+
+
+class TreeBuilder:
+    """
+    Rebuilds the tree of an input from its ModuleSummary and source.
+    Only the needed statements are parsed, grouped into regions of consecutive lines;
+    all others become LazyStatement placeholders.
+    """
+
+    def __init__(self, summary, source):
+        self.summary = summary
+        self.source = source
+        self._statements = {}
+
+    def _expand(self, needed):
+        # statements sharing a line (a = 1; b = 2) can only be parsed together
+        lines = self.summary.lines
+        for index in range(len(needed) - 1, 0, -1):
+            if needed[index] and lines[2 * index] == lines[2 * index - 1]:
+                needed[index - 1] = True
+        for index in range(len(needed) - 1):
+            if needed[index] and lines[2 * index + 1] == lines[2 * index + 2]:
+                needed[index + 1] = True
+        return needed
+
+    def _parse_region(self, first, last):
+        start_line = self.summary.line_range(first)[0]
+        end_line = self.summary.line_range(last)[1]
+        offsets = self.source.line_offsets
+        start = offsets[start_line - 1]
+        end = offsets[end_line] if end_line < len(offsets) else len(self.source.text)
+
+        region = ast.parse(self.source.text[start:end])
+        if start_line > 1:
+            ast.increment_lineno(region, start_line - 1)
+
+        if len(region.body) != last - first + 1:
+            raise ValueError(
+                f"region {start_line}-{end_line} doesn't match the summary")
+        for index, node in enumerate(region.body, first):
+            setattr(node, FINGERPRINT_ATTR, self.summary.fingerprint(index))
+            self._statements[index] = node
+
+    def statement(self, index):
+        if index not in self._statements:
+            needed = self._expand([i == index for i in range(len(self.summary))])
+            indices = [i for i, is_needed in enumerate(needed) if is_needed]
+            self._parse_region(indices[0], indices[-1])
+        return self._statements[index]
+
+    def build(self, needed):
+        needed = self._expand(list(needed))
+        body = []
+        index = 0
+        while index < len(needed):
+            if not needed[index]:
+                body.append(LazyStatement(self, index))
+                index += 1
+                continue
+
+            last = index
+            while last + 1 < len(needed) and needed[last + 1]:
+                last += 1
+            self._parse_region(index, last)
+            body.extend(self._statements[i] for i in range(index, last + 1))
+            index = last + 1
+
+        return ast.Module(body=body, type_ignores=[])
+
+
+def parse_lazily(sources):
+    """
+    Parses base, local and remote (SourceTexts) in parallel worker processes.
+    Only fingerprints come back, the trees are rebuilt for the regions the merge needs:
+    all of local (it is the skeleton of the output), remote imports and remote statements
+    that don't exist in local, nothing of base (only its function names are used).
+    Returns the three trees, all None if an input has syntax errors.
+    """
+    summaries = summarize_sources([source.text for source in sources])
+    if None in summaries:
+        return [None] * len(sources)
+
+    base_summary, local_summary, remote_summary = summaries
+    base_source, local_source, remote_source = sources
+
+    local_fingerprints = {local_summary.fingerprint(i)
+                          for i in range(len(local_summary))}
+    needed_remote = [remote_summary.kinds[i] in IMPORT_KINDS
+                     or remote_summary.fingerprint(i) not in local_fingerprints
+                     for i in range(len(remote_summary))]
+
+    return [
+        TreeBuilder(base_summary, base_source).build(
+            [False] * len(base_summary)),
+        TreeBuilder(local_summary, local_source).build(
+            [True] * len(local_summary)),
+        TreeBuilder(remote_summary, remote_source).build(needed_remote),
+    ]
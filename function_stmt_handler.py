@@ -1,7 +1,74 @@
 import ast
-from collections import Counter
+import os
+import threading
+from collections import Counter, OrderedDict
 from log_config import logger
-import sys
+import conflict_report
+import fingerprint
+import source_text
+
+
+# Cache of the function merge decisions: "memory" (default), "disk" (also kept in the merge cache database) or "0"
+FUNCTION_CACHE = os.environ.get("AST_MERGE_FUNCTION_CACHE", "memory")
+FUNCTION_CACHE_MAX_ENTRIES = 10000
+
+
+class FunctionMergeDecisions:
+    """
+    Decisions of attempt_function_merge, keyed by the fingerprints of both functions: safe or not and the reason.
+    Kept in memory for the whole process (merge trains and repo-merge see the same function edits
+    over and over), the least recently used decision is dropped beyond max_entries.
+    With a store (merge_cache.MergeCache) they are also kept on disk across runs.
+    AST_MERGE_CACHE=0 turns the disk store off together with the merge result cache.
+    Merges in parallel threads (merge_api) share it, every access holds the lock.
+    """
+
+    def __init__(self, store=None, max_entries=FUNCTION_CACHE_MAX_ENTRIES):
+        self.decisions = OrderedDict()
+        self.store = store
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            decision = self.decisions.get(key)
+            if decision is not None:
+                self.decisions.move_to_end(key)
+            elif self.store is not None:
+                decision = self.store.get_function_merge(key)
+                if decision is not None:
+                    self._remember(key, decision)
+            return decision
+
+    def put(self, key, decision):
+        with self.lock:
+            self._remember(key, decision)
+            if self.store is not None:
+                self.store.put_function_merge(key, *decision)
+
+    def _remember(self, key, decision):
+        self.decisions[key] = decision
+        self.decisions.move_to_end(key)
+        if len(self.decisions) > self.max_entries:
+            self.decisions.popitem(last=False)
+
+
+_decisions = None
+_decisions_lock = threading.Lock()
+
+
+def function_merge_decisions():
+    """The decision cache of this process, None if it is disabled (AST_MERGE_FUNCTION_CACHE=0)."""
+    global _decisions
+    with _decisions_lock:
+        if _decisions is None and FUNCTION_CACHE != "0":
+            store = None
+            if FUNCTION_CACHE == "disk":
+                import merge_cache
+
+                store = merge_cache.open_cache()
+            _decisions = FunctionMergeDecisions(store)
+    return _decisions
 
 
 def attempt_function_merge(node_left, node_right):
@@ -9,7 +76,7 @@ def attempt_function_merge(node_left, node_right):
     Checks if two nodes are functions with the same name.
     If yes, checks if their bodies can be safely reordered/merged automatically
     based on variable usage and side effects.
-
+    The decision for a pair of functions is only made once (see FunctionMergeDecisions).
     """
 
     valid_types = (ast.FunctionDef, ast.AsyncFunctionDef)
@@ -19,9 +86,33 @@ def attempt_function_merge(node_left, node_right):
     if node_left.name != node_right.name:
         return False, "Function names do not match."
 
+    decisions = function_merge_decisions()
+    key = fingerprint.node_fingerprint(
+        node_left) + fingerprint.node_fingerprint(node_right)
+    decision = decisions.get(key) if decisions is not None else None
+    if decision is None:
+        decision = analyze_function_merge(node_left, node_right)
+        if decisions is not None:
+            decisions.put(key, decision)
+    else:
+        logger.debug(f"Known merge decision for function: '{node_left.name}'")
+
+    safe, reason = decision
+    if not safe:
+        return False, reason
+
+    # Execute Merge (if safe): the statements of the left function followed by those of the right function
+    merged_body = node_left.body + node_right.body
+
+    logger.merge(
+        f"Auto-merge allowed for function '{node_left.name}' (safe reordering).")
+    return True, merged_body
+
+
+def analyze_function_merge(node_left, node_right):
+    """Decision for two functions with the same name: (safe, reason)."""
     logger.debug(f"Analyzing merge safety for function: '{node_left.name}'")
 
-    
     # Check LEFT statements
     left_safe = is_safe_for_reordering(node_left.body)
     if not left_safe:
@@ -33,16 +124,10 @@ def attempt_function_merge(node_left, node_right):
         return False, "Conflict: Remote function body contains side effects or complex variable usage."
 
     # Check for variable collisions between the two branches
-    
     if has_variable_collision(node_left.body, node_right.body):
         return False, "Conflict: Variable collision detected between branches."
 
-    # Execute Merge (if safe)
-    merged_body = node_left.body + node_right.body
-
-    logger.merge(
-        f"Auto-merge allowed for function '{node_left.name}' (safe reordering).")
-    return True, merged_body
+    return True, None
 
 
 def is_safe_for_reordering(statements):
@@ -108,10 +193,27 @@ def has_variable_collision(body_left, body_right):
     return False
 
 
-def process_and_merge_functions(mapping_left, mapping_right):
+def _with_body(node, body):
+    """Copy of the function node with another body, marked as synthesized (it has no source)."""
+    fields = {field: getattr(node, field, None) for field in node._fields}
+    fields["body"] = body
+    merged_node = ast.copy_location(type(node)(**fields), node)
+    return source_text.mark_synthesized(merged_node)
+
+
+def _replace_node(node_list, old_node, new_node):
+    for index, node in enumerate(node_list):
+        if node is old_node:
+            node_list[index] = new_node
+            return
+
+
+def process_and_merge_functions(mapping_left, mapping_right, report=None):
     """
     Identifies functions with the same name in both mappings.
     Attempts to merge them using 'attempt_function_merge'.
+    Returns False as soon as a pair of functions can't be merged safely,
+    the reason is added to the conflict report if one is given.
     """
 
     def build_func_lookup(mapping):
@@ -152,8 +254,10 @@ def process_and_merge_functions(mapping_left, mapping_right):
 
             # Determine which location is "further down" (higher index)
             
+            # the merged function is a new node, the nodes of the input trees are never changed
             if id_left >= id_right:
-                node_left.body = merged_body
+                _replace_node(info_left['list'], node_left,
+                              _with_body(node_left, merged_body))
 
                 try:
                     info_right['list'].remove(node_right)
@@ -166,7 +270,8 @@ def process_and_merge_functions(mapping_left, mapping_right):
         
             else:
                 
-                node_right.body = merged_body
+                _replace_node(info_right['list'], node_right,
+                              _with_body(node_right, merged_body))
 
                 try:
                     info_left['list'].remove(node_left)
@@ -180,4 +285,9 @@ def process_and_merge_functions(mapping_left, mapping_right):
             # Merge failed (unsafe)
             reason = result
             logger.merge(f"Auto-merge failed for '{name}': {reason}")
-            sys.exit(1)
+            if report is not None:
+                report.add(conflict_report.Conflict(
+                    conflict_report.UNSAFE_FUNCTION_MERGE, name, reason, [node_left], [node_right]))
+            return False
+
+    return True
@@ -19,6 +19,8 @@ def merge_imports(imports_local, imports_remote):
     Merges two lists of import nodes.
     """
     merged = {}
+    # alias names per ImportFrom, so adding an alias doesn't rescan the existing ones
+    merged_names = {}
 
     def add_import(node):
         if isinstance(node, ast.Import):
@@ -30,12 +32,14 @@ def merge_imports(imports_local, imports_remote):
                 merged[key] = ast.ImportFrom(
                     module=node.module, names=list(node.names), level=node.level
                 )
+                merged_names[key] = {a.name for a in node.names}
             else:
                 # Merge aliases without duplicates
-                existing_names = {a.name for a in merged[key].names}
+                existing_names = merged_names[key]
                 for a in node.names:
                     if a.name not in existing_names:
                         merged[key].names.append(a)
+                        existing_names.add(a.name)
 
     for imp in imports_local + imports_remote:
         add_import(imp)
@@ -0,0 +1,249 @@
+import ast
+import copy
+import hashlib
+import os
+import re
+import tokenize
+
+import parser
+
+
+# Inputs of together at least this many bytes are parsed incrementally, 0 turns it off
+INCREMENTAL_MIN_BYTES = int(os.environ.get(
+    "AST_MERGE_INCREMENTAL_MIN_BYTES", 256 * 1024))
+
+# lines at column 0 that continue the statement before them (if/else, try/except, ...)
+_CONTINUATION = re.compile(r"(else|elif|except|finally)\b")
+_LAYOUT_TOKENS = frozenset((tokenize.NL, tokenize.COMMENT, tokenize.NEWLINE, tokenize.INDENT,
+                            tokenize.DEDENT, tokenize.ENCODING, tokenize.ENDMARKER))
+
+
+class Chunk:
+    """Lines start_line..end_line of one or more top-level statements (decorators included)."""
+
+    __slots__ = ("start_line", "end_line")
+
+    def __init__(self, start_line, end_line):
+        self.start_line = start_line
+        self.end_line = end_line
+
+    def text(self, source):
+        offsets = source.line_offsets
+        end = offsets[self.end_line] if self.end_line < len(
+            offsets) else len(source.text)
+        return source.text[offsets[self.start_line - 1]:end]
+
+    def digest(self, source):
+        return hashlib.blake2b(self.text(source).encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def __repr__(self):
+        return f"<Chunk {self.start_line}-{self.end_line}>"
+
+
+def _lines(source, start_line=1):
+    # the lines as the tokenizer and ast.parse see them, \r alone ends a line as well
+    offsets = source.line_offsets
+    text = source.text
+    for index in range(start_line - 1, len(offsets)):
+        end = offsets[index + 1] if index + 1 < len(offsets) else len(text)
+        yield text[offsets[index]:end]
+
+
+def chunk_lines(source):
+    """
+    Splits a SourceText into chunks at the code lines that start at column 0, nothing is tokenized or parsed.
+    A line inside a multi-line string or bracket can start a chunk too early, the chunk before it
+    doesn't parse then and is fixed with statement_end.
+    Comments and blank lines after a statement don't belong to its chunk.
+    """
+    chunks = []
+    after_decorator = False
+    for lineno, line in enumerate(_lines(source), 1):
+        stripped = line.strip()
+        if not stripped or stripped[0] == "#":
+            continue
+        if chunks and (line[0] in " \t\f)]}" or after_decorator or _CONTINUATION.match(line)):
+            chunks[-1].end_line = lineno
+        else:
+            chunks.append(Chunk(lineno, lineno))
+        if line[0] not in " \t\f":
+            after_decorator = line[0] == "@"
+    return chunks
+
+
+def statement_end(source, start_line):
+    """
+    Last line of the top-level statement that starts at start_line (and of the statements sharing its lines),
+    found with tokenize. Raises tokenize.TokenError or SyntaxError for input the tokenizer rejects.
+    """
+    depth = 0
+    at_statement_start = True
+    in_decorator = False
+    started = False
+    end_line = start_line
+
+    for token in tokenize.generate_tokens(_lines(source, start_line).__next__):
+        kind = token.type
+        if kind == tokenize.INDENT:
+            depth += 1
+        elif kind == tokenize.DEDENT:
+            depth -= 1
+        elif kind == tokenize.NEWLINE:
+            at_statement_start = True
+            end_line = token.start[0] + start_line - 1
+        if kind in _LAYOUT_TOKENS:
+            continue
+
+        if at_statement_start and depth == 0:
+            if started and not in_decorator and not (
+                    kind == tokenize.NAME and _CONTINUATION.fullmatch(token.string)):
+                break
+            in_decorator = kind == tokenize.OP and token.string == "@"
+            started = True
+        at_statement_start = False
+
+    return end_line
+
+
+def _statement_start(node):
+    decorators = getattr(node, "decorator_list", None)
+    return min(decorator.lineno for decorator in decorators) if decorators else node.lineno
+
+
+def chunk_statements(tree, chunks):
+    """The top-level statements of a parsed tree grouped by chunk, None if they don't line up."""
+    groups = [[] for _ in chunks]
+    body = tree.body
+    position = 0
+    for index, chunk in enumerate(chunks):
+        while position < len(body) and _statement_start(body[position]) <= chunk.end_line:
+            node = body[position]
+            if _statement_start(node) < chunk.start_line or node.end_lineno > chunk.end_line:
+                return None
+            groups[index].append(node)
+            position += 1
+    if position != len(body) or not all(groups):
+        return None
+    return groups
+
+
+def _moved(node, line_delta):
+    """Copy of a top-level statement of base at another line, its (never changed) subtrees are shared."""
+    moved = copy.copy(node)
+    for field, value in ast.iter_fields(node):
+        if isinstance(value, list):
+            setattr(moved, field, list(value))
+    if line_delta:
+        moved.lineno += line_delta
+        moved.end_lineno += line_delta
+        decorators = getattr(moved, "decorator_list", None)
+        if decorators:
+            for index, decorator in enumerate(decorators):
+                decorator = decorators[index] = copy.copy(decorator)
+                decorator.lineno += line_delta
+                decorator.end_lineno += line_delta
+    return moved
+
+
+class IncrementalParser:
+    """
+    Parses base once and the other versions chunk by chunk: chunks whose text also exists in base
+    reuse base's statements (moved to their new lines), only the changed chunks are parsed.
+    The parse cost of local and remote grows with the size of their edits, not of the file.
+    parse(source, keep=True) makes the chunks of that version reusable as well, so a file that is
+    parsed again and again (see watch) only gets the chunks parsed that changed since the last parse.
+    """
+
+    def __init__(self, base_source):
+        self.base_tree = parser.parse_python_code(base_source.text)
+        self.base_chunks = {}
+        self.kept_chunks = {}
+        self.reused = 0
+        self.parsed = 0
+        if self.base_tree is None:
+            return
+
+        # chunks that start inside a string or bracket are joined with the chunk before them
+        starts = {_statement_start(node) for node in self.base_tree.body}
+        chunks = []
+        for chunk in chunk_lines(base_source):
+            if chunks and chunk.start_line not in starts:
+                chunks[-1].end_line = chunk.end_line
+            else:
+                chunks.append(chunk)
+
+        groups = chunk_statements(self.base_tree, chunks)
+        if groups is None:
+            raise ValueError("base chunks don't match its statements")
+        for chunk, statements in zip(chunks, groups):
+            self.base_chunks.setdefault(
+                chunk.digest(base_source), (chunk.start_line, statements))
+
+    def _statements(self, source, chunk, seen):
+        digest = chunk.digest(source)
+        known = self.base_chunks.get(digest) or self.kept_chunks.get(digest)
+        if known is not None:
+            start_line, statements = known
+            self.reused += 1
+            statements = [_moved(statement, chunk.start_line - start_line)
+                          for statement in statements]
+        else:
+            region = ast.parse(chunk.text(source))
+            if chunk.start_line > 1:
+                ast.increment_lineno(region, chunk.start_line - 1)
+            self.parsed += 1
+            statements = region.body
+
+        if seen is not None:
+            seen.setdefault(digest, (chunk.start_line, statements))
+        return statements
+
+    def parse(self, source, keep=False):
+        """Tree of another version, None for a syntax error."""
+        chunks = chunk_lines(source)
+        seen = {} if keep else None
+        body = []
+        index = 0
+        while index < len(chunks):
+            chunk = chunks[index]
+            try:
+                body.extend(self._statements(source, chunk, seen))
+                index += 1
+                continue
+            except SyntaxError:
+                pass
+
+            # the chunk ends inside a string or bracket, or the input is invalid
+            try:
+                end_line = statement_end(source, chunk.start_line)
+                body.extend(self._statements(
+                    source, Chunk(chunk.start_line, end_line), seen))
+            except (tokenize.TokenError, SyntaxError):
+                return parser.parse_python_code(source.text)
+            while index < len(chunks) and chunks[index].end_line <= end_line:
+                index += 1
+            if index < len(chunks) and chunks[index].start_line <= end_line:
+                # lines after the statement that were taken for a part of it
+                chunks[index] = Chunk(end_line + 1, chunks[index].end_line)
+
+        if keep:
+            self.kept_chunks = seen
+        return ast.Module(body=body, type_ignores=[])
+
+
+def use_incremental(total_bytes):
+    return bool(INCREMENTAL_MIN_BYTES) and total_bytes >= INCREMENTAL_MIN_BYTES
+
+
+def parse_incrementally(sources):
+    """
+    Parses base, local and remote (SourceTexts), local and remote incrementally against base.
+    Falls back to full parses if the chunks of base don't match its statements or an input can't be tokenized.
+    """
+    try:
+        incremental = IncrementalParser(sources[0])
+        if incremental.base_tree is None:
+            return [None] + [parser.parse_python_code(source.text) for source in sources[1:]]
+        return [incremental.base_tree] + [incremental.parse(source) for source in sources[1:]]
+    except (tokenize.TokenError, SyntaxError, ValueError):
+        return [parser.parse_python_code(source.text) for source in sources]
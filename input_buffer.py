@@ -0,0 +1,145 @@
+import hashlib
+import io
+import mmap
+import tokenize
+
+from source_text import SourceText
+
+
+class InputBuffer:
+    """
+    One input of the merge, read from disk exactly once.
+    Files are memory-mapped, hashing and snippet extraction work on zero-copy memoryview slices.
+    The text is decoded once, honouring the PEP 263 coding cookie, and shared by every phase.
+    """
+
+    def __init__(self, data, name=None, mapped=None):
+        self.name = name
+        self._mmap = mapped
+        self.view = memoryview(data)
+        self._encoding = None
+        self._text = None
+        self._source = None
+        self._digest = None
+
+    @classmethod
+    def from_file(cls, file_path):
+        with open(file_path, "rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                return cls(b"", file_path)
+        return cls(mapped, file_path, mapped)
+
+    @classmethod
+    def from_bytes(cls, data, name=None):
+        return cls(data, name)
+
+    @classmethod
+    def from_text(cls, text, name=None):
+        """Buffer of an already decoded source, it is never decoded again."""
+        buffer = cls(text.encode("utf-8"), name)
+        buffer._encoding = "utf-8"
+        buffer._text = text
+        return buffer
+
+    @property
+    def size(self):
+        return self.view.nbytes
+
+    def slice(self, start, end):
+        return self.view[start:end]
+
+    def head(self, size):
+        """First bytes of the buffer, e.g. to sniff for binary content."""
+        return bytes(self.view[:size])
+
+    def to_bytes(self):
+        """A full copy, only for the code paths that need real bytes (line-based merge)."""
+        return bytes(self.view)
+
+    @property
+    def encoding(self):
+        """Source encoding from the BOM or PEP 263 coding cookie, utf-8 by default."""
+        if self._encoding is None:
+            head = io.BytesIO(self.head(1024))
+            self._encoding, _ = tokenize.detect_encoding(head.readline)
+        return self._encoding
+
+    @property
+    def text(self):
+        """
+        The decoded source, decoded only once.
+        Raises SyntaxError for an invalid coding cookie and UnicodeDecodeError for undecodable content.
+        """
+        if self._text is None:
+            self._text = str(self.view, self.encoding)
+        return self._text
+
+    @property
+    def source(self):
+        if self._source is None:
+            self._source = SourceText(self.text, self.name)
+        return self._source
+
+    def digest(self):
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.view).digest()
+        return self._digest
+
+    def __eq__(self, other):
+        if not isinstance(other, InputBuffer):
+            return NotImplemented
+        return self.size == other.size and self.digest() == other.digest()
+
+    __hash__ = None
+
+    def close(self):
+        try:
+            self.view.release()
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+        except BufferError:
+            # slices of the buffer are still in use, the mapping is closed once they are gone
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f"<InputBuffer {self.name or ''} {self.size} bytes>"
+
+
+class ContentLabel:
+    """
+    Label of a merge run: the start of the content hashes of its inputs (base, local, remote).
+    The digests of the buffers the run maps are taken over (add_buffers), an input that was
+    never mapped is hashed when the label is first turned into a string.
+    """
+
+    def __init__(self, file_paths):
+        self.file_paths = list(file_paths)
+        self.digests = {}
+        self._label = None
+
+    def add_buffers(self, buffers):
+        for buffer in buffers:
+            if buffer.name in self.file_paths:
+                self.digests.setdefault(buffer.name, buffer.digest())
+
+    def __str__(self):
+        if self._label is None:
+            hashes = []
+            for file_path in self.file_paths:
+                digest = self.digests.get(file_path)
+                if digest is None:
+                    with InputBuffer.from_file(file_path) as buffer:
+                        digest = buffer.digest()
+                hashes.append(digest.hex()[:12])
+            self._label = "-".join(hashes)
+        return self._label
@@ -0,0 +1,287 @@
+import ast
+
+import fingerprint
+import source_text
+import text_merge
+
+
+CONTAINER_TYPES = (ast.Dict, ast.List, ast.Tuple, ast.Set)
+ASSIGNMENT_KINDS = ("Assign", "AnnAssign")
+
+# fingerprint of an absent dict entry
+_ABSENT = None
+
+# Merged top-level literals with at least this many entries are written one entry per line.
+# ast.unparse puts them on a single line, and wrapping that line takes autopep8 seconds.
+MULTILINE_MIN_ELEMENTS = 50
+
+# set on the assignments merge_literal_assignment creates
+MERGED_LITERAL_ATTR = "_ast_merge_merged_literal"
+
+# statements ast.unparse writes with a blank line in front of them
+_DEFINITION_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+_BRACKETS = {ast.Dict: ("{", "}"), ast.Set: ("{", "}"),
+             ast.List: ("[", "]"), ast.Tuple: ("(", ")")}
+
+
+def literal_assignment(node):
+    """(name, container) if the node assigns a dict/list/tuple/set literal to a single name, else None."""
+    if isinstance(node, ast.Assign) and len(node.targets) == 1:
+        target = node.targets[0]
+    elif isinstance(node, ast.AnnAssign) and node.value is not None:
+        target = node.target
+    else:
+        return None
+
+    if isinstance(target, ast.Name) and isinstance(node.value, CONTAINER_TYPES):
+        return target.id, node.value
+    return None
+
+
+def literal_assignments(mapping_changes):
+    """Maps the names of the container literal assignments in the change sets to (change node list, node)."""
+    literals = {}
+    for node_list in mapping_changes.values():
+        for node in node_list:
+            assignment = literal_assignment(node)
+            if assignment is not None:
+                literals.setdefault(assignment[0], (node_list, node))
+    return literals
+
+
+def base_literal_assignments(tree, names):
+    """The container literal assignments of the names in the base tree, the last one wins."""
+    literals = {}
+    for node in tree.body:
+        if isinstance(node, fingerprint.LazyStatement):
+            if node.kind not in ASSIGNMENT_KINDS:
+                continue
+            node = fingerprint.materialize(node)
+
+        assignment = literal_assignment(node)
+        if assignment is not None and assignment[0] in names:
+            literals[assignment[0]] = node
+    return literals
+
+
+def _shell_fingerprint(node):
+    # everything of the assignment except its value: kind, target, annotation
+    parts = [type(node).__name__.encode("ascii")]
+    for field in ("targets", "target", "annotation", "simple"):
+        value = getattr(node, field, None)
+        if isinstance(value, list):
+            parts.extend(fingerprint.node_fingerprint(item) for item in value)
+        elif isinstance(value, ast.AST):
+            parts.append(fingerprint.node_fingerprint(value))
+        elif value is not None:
+            parts.append(repr(value).encode("ascii"))
+    return b"|".join(parts)
+
+
+def _pick(base_value, local_value, remote_value):
+    """Three-way decision for a single entry: 'local', 'remote' or None for a conflict."""
+    if local_value == remote_value or remote_value == base_value:
+        return "local"
+    if local_value == base_value:
+        return "remote"
+    return None
+
+
+def _dict_entries(container):
+    """Ordered key fingerprint -> (key, value, value fingerprint), None if a key is repeated."""
+    entries = {}
+    for key, value in zip(container.keys, container.values):
+        value_fingerprint = fingerprint.node_fingerprint(value)
+        # {**other} has no key, the unpacked expression identifies the entry
+        key_fingerprint = fingerprint.node_fingerprint(
+            key) if key is not None else b"**" + value_fingerprint
+        if key_fingerprint in entries:
+            return None
+        entries[key_fingerprint] = (key, value, value_fingerprint)
+    return entries
+
+
+def _merge_dict(base, local, remote):
+    base_entries = _dict_entries(base)
+    local_entries = _dict_entries(local)
+    remote_entries = _dict_entries(remote)
+    if base_entries is None or local_entries is None or remote_entries is None:
+        return None
+
+    def value_of(entries, key):
+        entry = entries.get(key)
+        return entry[2] if entry is not None else _ABSENT
+
+    chosen = {}
+    for key in {**base_entries, **local_entries, **remote_entries}:
+        side = _pick(value_of(base_entries, key), value_of(
+            local_entries, key), value_of(remote_entries, key))
+        if side is None:
+            return None
+        entry = (local_entries if side == "local" else remote_entries).get(key)
+        if entry is not None:
+            chosen[key] = entry
+
+    # local order, entries added in remote follow the entry they follow in remote
+    # (after the entries local added at the same position)
+    inserted_after = {}
+    anchor = None
+    for key in remote_entries:
+        if key in local_entries:
+            anchor = key
+        elif key in chosen:
+            inserted_after.setdefault(anchor, []).append(key)
+
+    order = []
+    pending = inserted_after.get(None, [])
+    for key in local_entries:
+        if key in remote_entries:
+            order.extend(pending)
+            pending = inserted_after.get(key, [])
+        if key in chosen:
+            order.append(key)
+    order.extend(pending)
+
+    return ast.Dict(keys=[chosen[key][0] for key in order],
+                    values=[chosen[key][1] for key in order])
+
+
+def _unchanged_ends(sequences):
+    """Lengths of the prefix and the suffix that all sequences have in common."""
+    shortest = min(len(sequence) for sequence in sequences)
+    prefix = 0
+    while prefix < shortest and all(sequence[prefix] == sequences[0][prefix] for sequence in sequences):
+        prefix += 1
+    suffix = 0
+    while suffix < shortest - prefix and all(sequence[-1 - suffix] == sequences[0][-1 - suffix]
+                                             for sequence in sequences):
+        suffix += 1
+    return prefix, suffix
+
+
+def _merge_elements(base, local, remote):
+    nodes = {}
+    sequences = []
+    for container in (base, local, remote):
+        fingerprints = []
+        for element in container.elts:
+            element_fingerprint = fingerprint.node_fingerprint(element)
+            nodes.setdefault(element_fingerprint, element)
+            fingerprints.append(element_fingerprint)
+        sequences.append(fingerprints)
+
+    # the unchanged ends are anchored first, only the changed middle goes through diff3
+    # (which anchors large sequences on their unique elements, see text_merge._matching_blocks)
+    prefix, suffix = _unchanged_ends(sequences)
+    local_fingerprints = sequences[1]
+    head = local_fingerprints[:prefix]
+    tail = local_fingerprints[len(local_fingerprints) - suffix:]
+    sequences = [sequence[prefix:len(sequence) - suffix] for sequence in sequences]
+
+    merged = head
+    for chunk in text_merge.merge_sequences(*sequences):
+        if chunk[0] == "ok":
+            merged.extend(chunk[1])
+            continue
+
+        _, local_part, base_part, remote_part = chunk
+        if base_part:
+            # both sides changed the same elements
+            return None
+        # independent insertions at the same position: local ones first
+        local_set = set(local_part)
+        merged.extend(local_part)
+        merged.extend(item for item in remote_part if item not in local_set)
+    merged.extend(tail)
+
+    elements = [nodes[element_fingerprint] for element_fingerprint in merged]
+    if isinstance(local, ast.Set):
+        return ast.Set(elts=elements)
+    return type(local)(elts=elements, ctx=ast.Load())
+
+
+def merge_literal_assignment(base_node, local_node, remote_node):
+    """
+    Element-wise three-way merge of a container literal that is assigned in base, local and remote.
+    Entries are compared by their fingerprints, so only the changed entries cost more than a hash lookup.
+    Returns the merged assignment as a new node, or None if an entry was changed differently on both sides.
+    """
+    base_value = base_node.value
+    local_value = local_node.value
+    remote_value = remote_node.value
+    if not type(base_value) is type(local_value) is type(remote_value):
+        return None
+    if _shell_fingerprint(local_node) != _shell_fingerprint(remote_node):
+        return None
+
+    if isinstance(local_value, ast.Dict):
+        merged_value = _merge_dict(base_value, local_value, remote_value)
+    else:
+        merged_value = _merge_elements(base_value, local_value, remote_value)
+    if merged_value is None:
+        return None
+
+    fields = {field: getattr(local_node, field, None)
+              for field in local_node._fields}
+    fields["value"] = ast.copy_location(merged_value, local_value)
+    merged_node = ast.copy_location(type(local_node)(**fields), local_node)
+    setattr(merged_node, MERGED_LITERAL_ATTR, True)
+    return source_text.mark_synthesized(merged_node)
+
+
+def _element_count(container):
+    return len(container.keys) if isinstance(container, ast.Dict) else len(container.elts)
+
+
+def _multiline_literal(container):
+    opening, closing = _BRACKETS[type(container)]
+    if isinstance(container, ast.Dict):
+        entries = [f"**{ast.unparse(value)}" if key is None else f"{ast.unparse(key)}: {ast.unparse(value)}"
+                   for key, value in zip(container.keys, container.values)]
+    else:
+        entries = [ast.unparse(element) for element in container.elts]
+    return opening + "\n" + "".join(f"    {entry},\n" for entry in entries) + closing
+
+
+def _multiline_assignment(node):
+    """The merged literal assignment node (see literal_assignment) with its literal one entry per line."""
+    name, container = literal_assignment(node)
+    if isinstance(node, ast.AnnAssign):
+        target = name if node.simple else f"({name})"
+        return f"{target}: {ast.unparse(node.annotation)} = {_multiline_literal(container)}"
+    return f"{name} = {_multiline_literal(container)}"
+
+
+def _is_multiline(node):
+    if not getattr(node, MERGED_LITERAL_ATTR, False):
+        return False
+    return _element_count(literal_assignment(node)[1]) >= MULTILINE_MIN_ELEMENTS
+
+
+def unparse(module):
+    """
+    ast.unparse of the statements of the merged module, except that large merged container literals
+    are written one entry per line, like they are usually written by hand. The statements between them
+    are unparsed in runs and the pieces are joined the way ast.unparse joins statements.
+    The body is unparsed as a list of statements, so a docstring is written as the expression it is.
+    """
+    pieces = []
+    run = []
+    for node in module.body:
+        if _is_multiline(node):
+            if run:
+                pieces.append((run[0], ast.unparse(run)))
+                run = []
+            pieces.append((node, _multiline_assignment(node)))
+        else:
+            run.append(node)
+    if run:
+        pieces.append((run[0], ast.unparse(run)))
+
+    code = []
+    for first_node, text in pieces:
+        if code:
+            code.append("\n\n" if isinstance(first_node, _DEFINITION_TYPES) else "\n")
+        code.append(text)
+    return "".join(code)
@@ -1,6 +1,15 @@
 import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 
 import os
+try:
+    import fcntl
+except ImportError:
+    # Windows: rotations of concurrent processes are not serialized
+    fcntl = None
 logger = logging.getLogger(__name__)
 
 # Log file output
@@ -8,25 +17,230 @@ logger.setLevel(logging.DEBUG)
 logger.propagate = True
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-LOG_DIR = os.path.join(BASE_DIR, "Logs")
-os.makedirs(LOG_DIR, exist_ok=True)
+if os.path.isfile(BASE_DIR):
+    # running from the zipapp bundle, the logs go next to the .pyz file
+    BASE_DIR = os.path.dirname(BASE_DIR)
+LOG_DIR = os.environ.get("AST_MERGE_LOG_DIR") or os.path.join(BASE_DIR, "Logs")
+
+# Log files are rotated at this size or when they were last written on an earlier day,
+# rotated segments are compressed and kept LOG_BACKUPS times for at most LOG_MAX_AGE_DAYS, 0 disables a limit
+LOG_MAX_BYTES = int(float(os.environ.get(
+    "AST_MERGE_LOG_MAX_MB", 10)) * 1024 * 1024)
+LOG_BACKUPS = int(os.environ.get("AST_MERGE_LOG_BACKUPS", 5))
+LOG_MAX_AGE_DAYS = float(os.environ.get("AST_MERGE_LOG_MAX_AGE_DAYS", 14))
+
+# With a size the log files only get the last LOG_BUFFER records of a merge, and only if it fails
+LOG_BUFFER = int(os.environ.get("AST_MERGE_LOG_BUFFER", 0))
+
+
+class LazyFileHandler(logging.FileHandler):
+    """
+    FileHandler that creates the log directory and opens the file with the first record,
+    so importing log_config doesn't touch the filesystem.
+    """
+
+    def __init__(self, filename, mode="a", encoding="utf-8"):
+        super().__init__(filename, mode=mode, encoding=encoding, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+def _compress(source, destination):
+    import gzip
+    import shutil
+
+    # written under a temporary name, a reader never sees a half-written segment
+    partial = destination + ".partial"
+    with open(source, "rb") as f_in, gzip.open(partial, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.replace(partial, destination)
+    os.remove(source)
+
+
+class RotatingLogHandler(LazyFileHandler):
+    """
+    Log file that is rotated when it reaches max_bytes or when its last write was on an earlier day.
+    Rotated segments are gzip compressed (name.1.gz is the newest) and deleted when there are more than
+    backup_count of them or when they are older than max_age_days.
+    Several merges may write the same log at once. Writes hold a shared and rotations an exclusive
+    flock on name.lock; a rotation checks again whether it is still due once it has the lock,
+    and a handler whose file was rotated by another process reopens the log before its next write.
+    """
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUPS, max_age_days=LOG_MAX_AGE_DAYS):
+        super().__init__(filename)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.max_age_days = max_age_days
+        self._lock_file = None
+
+    def _segment(self, number):
+        return f"{self.baseFilename}.{number}.gz"
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        """flock on name.lock across processes, a no-op without fcntl (Windows)."""
+        if fcntl is None:
+            yield
+            return
+        if self._lock_file is None:
+            os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+            self._lock_file = open(self.baseFilename + ".lock", "a")
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _reopen_if_rotated(self):
+        """Closes the stream if the log file was renamed or removed since it was opened, emit opens it again."""
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self.stream.fileno())
+        if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+            self.stream.close()
+            self.stream = None
+
+    def _rotation_due(self):
+        try:
+            stat = os.stat(self.baseFilename)
+        except OSError:
+            return False
+        if self.max_bytes and stat.st_size >= self.max_bytes:
+            return True
+        # (year, month, day) of the last write
+        return stat.st_size > 0 and time.localtime(stat.st_mtime)[:3] < time.localtime()[:3]
+
+    def rotate(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+        with self._file_lock(exclusive=True):
+            # another process may have rotated the file while this one waited for the lock
+            if self._rotation_due():
+                self._rotate_locked()
+
+    def _rotate_locked(self):
+        if not self.backup_count:
+            os.remove(self.baseFilename)
+            return
+        for number in range(self.backup_count - 1, 0, -1):
+            try:
+                os.replace(self._segment(number), self._segment(number + 1))
+            except FileNotFoundError:
+                pass
+        _compress(self.baseFilename, self._segment(1))
+
+        if self.max_age_days:
+            oldest = time.time() - self.max_age_days * 86400
+            for number in range(2, self.backup_count + 1):
+                try:
+                    if os.path.getmtime(self._segment(number)) < oldest:
+                        os.remove(self._segment(number))
+                except OSError:
+                    pass
+
+    def emit(self, record):
+        try:
+            # the size and the day are checked when a process opens the file and after every write
+            if self.stream is None and self._rotation_due():
+                self.rotate()
+            with self._file_lock(exclusive=False):
+                self._reopen_if_rotated()
+                super().emit(record)
+                rotation_due = (self.max_bytes and self.stream is not None
+                                and self.stream.tell() >= self.max_bytes)
+            if rotation_due:
+                self.rotate()
+        except OSError:
+            self.handleError(record)
+
+    def close(self):
+        with self.lock:
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+        super().close()
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Keeps the last capacity records of a merge in memory.
+    end_merge() writes them to the target handlers if the merge failed and drops them otherwise.
+    Every thread has its own buffer, merges running in parallel threads (merge_api) don't mix their records.
+    """
+
+    def __init__(self, targets, capacity=LOG_BUFFER):
+        super().__init__(logging.DEBUG)
+        self.targets = targets
+        self.capacity = capacity
+        self._local = threading.local()
+
+    @property
+    def records(self):
+        records = getattr(self._local, "records", None)
+        if records is None:
+            records = self._local.records = deque(maxlen=self.capacity)
+        return records
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def flush_to_targets(self):
+        records = list(self.records)
+        self.records.clear()
+        for record in records:
+            for target in self.targets:
+                if record.levelno >= target.level:
+                    target.handle(record)
+        for target in self.targets:
+            target.flush()
+
+    def clear(self):
+        self.records.clear()
+
 
 # --- Debug + alles ---
 debug_log_path = os.path.join(LOG_DIR, "merge_tool.log")
-debug_handler = logging.FileHandler(debug_log_path, mode="a", encoding="utf-8")
+debug_handler = RotatingLogHandler(debug_log_path)
 debug_handler.setLevel(logging.DEBUG)
 
 # --- Info-only Log ---
 info_log_path = os.path.join(LOG_DIR, "only_info_merge_tool.log")
-info_handler = logging.FileHandler(info_log_path, mode="a", encoding="utf-8")
+info_handler = RotatingLogHandler(info_log_path)
 info_handler.setLevel(logging.INFO)
 
 formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
 debug_handler.setFormatter(formatter)
 info_handler.setFormatter(formatter)
 
-logger.addHandler(debug_handler)
-logger.addHandler(info_handler)
+if LOG_BUFFER > 0:
+    ring_buffer = RingBufferHandler([debug_handler, info_handler])
+    logger.addHandler(ring_buffer)
+else:
+    ring_buffer = None
+    logger.addHandler(debug_handler)
+    logger.addHandler(info_handler)
+
+
+def end_merge(failed):
+    """
+    Called at the end of every merge: with a ring buffer (AST_MERGE_LOG_BUFFER) the buffered
+    records of the calling thread are written to the log files if the merge failed and dropped otherwise.
+    """
+    if ring_buffer is None:
+        return
+    if failed:
+        ring_buffer.flush_to_targets()
+    else:
+        ring_buffer.clear()
 
 # Custom log level
 MERGE_LEVEL_NUM = 25
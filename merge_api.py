@@ -0,0 +1,116 @@
+"""
+In-memory merge API, for embedding the merge tool in a long-lived process:
+
+    import merge_api
+
+    result = merge_api.merge_sources(base, local, remote, merge_api.MergeOptions(path_name="pkg/mod.py"))
+    if result.clean:
+        save(result.merged)
+    else:
+        show(result.to_dict(include_code=True))
+
+Nothing is read from or written to disk (except the merge log and the optional result cache)
+and the process is never exited. Nothing process-wide is touched either unless asked for:
+no signal handler or timer, no worker processes. Merges can run in several threads at once:
+the buffered merge log and the phase listeners are kept per thread (see log_config.end_merge, phases),
+the function merge decisions are shared under a lock (see function_stmt_handler).
+"""
+import conflict_report
+import log_config
+from input_buffer import InputBuffer
+
+
+class MergeOptions:
+    """
+    path_name: path of the file in the repository, non-Python files are merged line-based
+    use_cache: look up and store the result in the merge result cache (see merge_cache)
+    parallel: parse the inputs in worker processes (forks a process pool, not for threaded hosts)
+    max_seconds, max_memory_mb: time limit and memory growth limit of the AST merge, 0 is no limit.
+        Over a limit the file is merged line-based. They are checked between the merge phases,
+        the AST node limit always applies (see merge_budget).
+    timer: also interrupt a single phase that runs over max_seconds, with SIGALRM.
+        Only used in the main thread, the handler of the host is restored afterwards.
+    """
+
+    def __init__(self, path_name=None, use_cache=False, parallel=False, max_seconds=0, max_memory_mb=0,
+                 timer=False):
+        self.path_name = path_name
+        self.use_cache = use_cache
+        self.parallel = parallel
+        self.max_seconds = max_seconds
+        self.max_memory_mb = max_memory_mb
+        self.timer = timer
+
+
+class MergeResult:
+    """
+    Outcome of merge_sources.
+    merged is the merged source (of the same type as the inputs), with conflict markers
+    if the merge isn't clean. method tells how it was merged: trivial, cached, ast or line.
+    """
+
+    def __init__(self, merged, clean, method, report):
+        self.merged = merged
+        self.clean = clean
+        self.method = method
+        self.report = report
+
+    @property
+    def conflicts(self):
+        return self.report.conflicts
+
+    def to_dict(self, include_code=False):
+        return {
+            "clean": self.clean,
+            "method": self.method,
+            **self.report.to_dict(include_code),
+        }
+
+    def __repr__(self):
+        return f"<MergeResult {'clean' if self.clean else 'conflict'} via {self.method}, {len(self.report)} conflict(s)>"
+
+
+def _to_buffer(source, name):
+    if isinstance(source, str):
+        return InputBuffer.from_text(source, name)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return InputBuffer.from_bytes(source, name)
+    raise TypeError(f"{name} must be str or bytes, not {type(source).__name__}")
+
+
+def merge_sources(base, local, remote, options=None):
+    """
+    Three-way merge of base, local and remote, given as str or bytes (all of the same type).
+    Returns a MergeResult, failed merges are reported in it and never raise or exit.
+    """
+    import ast_merge_tool
+    import merge_budget
+
+    options = options or MergeOptions()
+    as_text = isinstance(local, str)
+    buffers = [_to_buffer(source, name)
+               for source, name in ((base, "BASE"), (local, "LOCAL"), (remote, "REMOTE"))]
+
+    report = conflict_report.ConflictReport()
+    try:
+        report.sources[conflict_report.LOCAL] = buffers[1].source
+        report.sources[conflict_report.REMOTE] = buffers[2].source
+    except (SyntaxError, LookupError, UnicodeDecodeError):
+        # undecodable inputs are merged line-based, there are no snippets to render
+        pass
+
+    budget = merge_budget.MergeBudget(max_seconds=options.max_seconds, max_memory_mb=options.max_memory_mb,
+                                      timer=options.timer)
+    merged, exit_code, method = ast_merge_tool.merge_buffers(
+        buffers, options.path_name, bool(options.parallel), report, options.use_cache, budget)
+    log_config.end_merge(failed=exit_code != 0)
+
+    if merged is None:
+        # LOCAL is kept as it is
+        merged = local
+    elif as_text and not isinstance(merged, str):
+        merged = merged.decode(buffers[1].encoding, errors="surrogateescape")
+    elif not as_text and isinstance(merged, str):
+        merged = merged.encode("utf-8")
+
+    return MergeResult(merged, exit_code == 0, method, report)
@@ -0,0 +1,160 @@
+import ast
+import mmap
+import os
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from log_config import logger
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+# Per merge limits, 0 disables a limit. The memory limit is for the growth of the process during the merge.
+MAX_NODES = int(os.environ.get("AST_MERGE_MAX_NODES", 600_000))
+MAX_SECONDS = float(os.environ.get("AST_MERGE_MAX_SECONDS", 20))
+MAX_MEMORY_MB = int(os.environ.get("AST_MERGE_MAX_MEMORY_MB", 1024))
+
+# Nesting depth of suspended() per thread, budgets created while it is above 0 have no time and memory limits
+_suspended = threading.local()
+
+
+class BudgetExceeded(BaseException):
+    """
+    Raised when a merge runs over one of its budgets, the caller should fall back to a line-based merge.
+    A BaseException like KeyboardInterrupt: the timer raises it anywhere, a broad except Exception
+    in the code it interrupts must not swallow it.
+    """
+
+    def __init__(self, phase, reason):
+        super().__init__(f"budget exceeded in phase '{phase}': {reason}")
+        self.phase = phase
+        self.reason = reason
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process in MB, None if it can't be measured."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def current_memory_mb():
+    """Resident memory of this process right now in MB, None if it can't be measured (needs /proc)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * mmap.PAGESIZE / (1024 * 1024)
+
+
+def memory_mb():
+    """
+    The memory the budget is measured with: the current resident memory,
+    the peak (which only grows) where the current one isn't available.
+    """
+    memory = current_memory_mb()
+    if memory is None:
+        memory = peak_memory_mb()
+    return memory
+
+
+@contextmanager
+def suspended():
+    """
+    Switches off the time and memory limits of the merges started inside, e.g. while they are traced
+    (see metrics) and take several times longer and more memory than they would. The node limit stays.
+    """
+    _suspended.depth = getattr(_suspended, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _suspended.depth -= 1
+
+
+class MergeBudget:
+    """
+    Node count, wall time and memory limits for a single merge.
+    The limits are checked at the phase boundaries of the merge (see Merger._checkpoint).
+    While armed, a timer additionally interrupts a single phase that runs over the time limit.
+    Memory is measured against the memory of the process when the budget starts, so a long-lived
+    process that once needed a lot of memory doesn't send all of its later merges to the fallback.
+    None takes the limit from the environment (see MAX_NODES, MAX_SECONDS, MAX_MEMORY_MB).
+    timer=False never arms the timer, the time limit is then only checked at the phase boundaries.
+    """
+
+    def __init__(self, max_nodes=None, max_seconds=None, max_memory_mb=None, timer=True):
+        self.max_nodes = MAX_NODES if max_nodes is None else max_nodes
+        self.max_seconds = MAX_SECONDS if max_seconds is None else max_seconds
+        self.max_memory_mb = MAX_MEMORY_MB if max_memory_mb is None else max_memory_mb
+        if getattr(_suspended, "depth", 0):
+            self.max_seconds = self.max_memory_mb = 0
+        self.timer = timer
+        self.started = time.monotonic()
+        self.node_count = 0
+        self.memory_start = memory_mb() if self.max_memory_mb else None
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def count_nodes(self, *trees):
+        """Counts the nodes of the parsed trees, stops counting as soon as the limit is reached."""
+        for tree in trees:
+            if tree is None:
+                continue
+            for node in ast.walk(tree):
+                # statements that weren't rebuilt carry the node count of their summary
+                self.node_count += getattr(node, "node_count", 1)
+                if self.max_nodes and self.node_count > self.max_nodes:
+                    raise BudgetExceeded(
+                        "parse", f"more than {self.max_nodes} AST nodes")
+        logger.debug(f"Budget: {self.node_count} AST nodes")
+
+    def check(self, phase):
+        if self.max_seconds and self.elapsed() > self.max_seconds:
+            raise BudgetExceeded(
+                phase, f"took longer than {self.max_seconds} seconds")
+
+        if self.max_memory_mb and self.memory_start is not None:
+            growth = memory_mb() - self.memory_start
+            if growth > self.max_memory_mb:
+                raise BudgetExceeded(
+                    phase, f"memory grew by {growth:.0f} MB, over {self.max_memory_mb} MB")
+
+        logger.debug(f"Budget check after '{phase}': {self.elapsed():.3f}s")
+
+    @contextmanager
+    def armed(self):
+        """
+        Interrupts the merge with BudgetExceeded once the time limit is reached,
+        also in the middle of a phase. Only possible in the main thread on POSIX systems,
+        the SIGALRM handler and the timer of the process are taken over while armed.
+        """
+        can_arm = (self.timer and self.max_seconds and hasattr(signal, "setitimer")
+                   and threading.current_thread() is threading.main_thread())
+        if not can_arm:
+            yield self
+            return
+
+        def on_timeout(signum, frame):
+            raise BudgetExceeded(
+                "timer", f"took longer than {self.max_seconds} seconds")
+
+        remaining = max(self.max_seconds - self.elapsed(), 0.001)
+        previous = signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, remaining)
+        try:
+            yield self
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+from log_config import logger
+from version import TOOL_VERSION
+
+
+def _default_cache_dir():
+    cache_home = os.environ.get(
+        "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "ast_merge_tool")
+
+
+CACHE_ENABLED = os.environ.get("AST_MERGE_CACHE", "1") != "0"
+CACHE_DIR = os.environ.get("AST_MERGE_CACHE_DIR", _default_cache_dir())
+MAX_ENTRIES = int(os.environ.get("AST_MERGE_CACHE_MAX_ENTRIES", 2000))
+MAX_SIZE_MB = int(os.environ.get("AST_MERGE_CACHE_MAX_MB", 64))
+MAX_AGE_DAYS = float(os.environ.get("AST_MERGE_CACHE_MAX_AGE_DAYS", 30))
+
+STATUS_MERGED = "merged"
+STATUS_CONFLICT = "conflict"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS merge_results (
+    key TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    merged BLOB,
+    report TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS merge_results_last_used ON merge_results (last_used);
+CREATE TABLE IF NOT EXISTS function_merges (
+    key TEXT PRIMARY KEY,
+    safe INTEGER NOT NULL,
+    reason TEXT,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS function_merges_last_used ON function_merges (last_used);
+"""
+
+
+def result_settings():
+    """
+    The settings that can change a merged result, as a string: the environment settings,
+    the autopep8 version (it formats the result) and the Python version (ast.unparse output varies).
+    """
+    import sys
+    import autopep8
+    import ast_mapper
+    import literal_merge
+
+    return (f"numpy_min_nodes={ast_mapper.NUMPY_MIN_NODES};"
+            f"literal_multiline_min_elements={literal_merge.MULTILINE_MIN_ELEMENTS};"
+            f"autopep8={autopep8.__version__};"
+            f"python={sys.version_info[0]}.{sys.version_info[1]}")
+
+
+def cache_key(base_digest, local_digest, remote_digest):
+    """Content hashes (see InputBuffer.digest) of the three inputs plus the tool version and the result settings."""
+    key = hashlib.sha256(TOOL_VERSION.encode("utf-8"))
+    key.update(result_settings().encode("utf-8"))
+    for digest in (base_digest, local_digest, remote_digest):
+        key.update(digest)
+    return key.hexdigest()
+
+
+def function_merge_key(fingerprints):
+    """Fingerprints of a pair of functions (see function_stmt_handler.FunctionMergeDecisions) plus the tool version."""
+    return hashlib.sha256(TOOL_VERSION.encode("utf-8") + fingerprints).hexdigest()
+
+
+class CachedResult:
+    def __init__(self, status, merged, report):
+        self.status = status
+        self.merged = merged
+        self.report = report
+
+    def __repr__(self):
+        return f"<CachedResult {self.status}>"
+
+
+class MergeCache:
+    """
+    Local rerere-like store that maps (base, local, remote, tool version) to the merge outcome:
+    the merged text or the conflict report.
+    Entries are evicted by age, count and total size, least recently used first.
+    A broken cache never breaks a merge, every database error is logged and ignored.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=MAX_ENTRIES, max_size_mb=MAX_SIZE_MB,
+                 max_age_days=MAX_AGE_DAYS):
+        self.path = os.path.join(cache_dir, "merge_cache.sqlite3")
+        self.max_entries = max_entries
+        self.max_size = max_size_mb * 1024 * 1024
+        self.max_age = max_age_days * 24 * 3600
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # several merges may run in parallel, wait for the lock instead of failing.
+            # The function merge decisions share one cache between threads and serialize its use.
+            self._connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def get(self, key):
+        try:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT status, merged, report FROM merge_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            with connection:
+                connection.execute(
+                    "UPDATE merge_results SET last_used = ? WHERE key = ?", (time.time(), key))
+            status, merged, report = row
+            return CachedResult(status, merged.decode("utf-8") if merged is not None else None, report)
+
+        except (sqlite3.Error, OSError):
+            logger.debug("Merge cache lookup failed", exc_info=True)
+            return None
+
+    def put(self, key, status, merged=None, report=None):
+        merged_data = merged.encode("utf-8") if merged is not None else None
+        size = len(merged_data or b"") + len(report or "")
+        now = time.time()
+
+        try:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO merge_results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, status, merged_data, report, size, now, now))
+                self._evict(connection, now)
+
+        except (sqlite3.Error, OSError):
+            logger.debug("Merge cache store failed", exc_info=True)
+
+    def _evict(self, connection, now):
+        if self.max_age:
+            connection.execute(
+                "DELETE FROM merge_results WHERE last_used < ?", (now - self.max_age,))
+
+        if self.max_entries:
+            connection.execute(
+                "DELETE FROM merge_results WHERE key IN ("
+                "SELECT key FROM merge_results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+
+        if self.max_size:
+            total = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM merge_results").fetchone()[0]
+            if total > self.max_size:
+                for key, size in connection.execute(
+                        "SELECT key, size FROM merge_results ORDER BY last_used ASC").fetchall():
+                    connection.execute(
+                        "DELETE FROM merge_results WHERE key = ?", (key,))
+                    total -= size
+                    if total <= self.max_size:
+                        break
+
+    def get_function_merge(self, fingerprints):
+        """The stored (safe, reason) decision for a pair of functions, or None."""
+        key = function_merge_key(fingerprints)
+        try:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT safe, reason FROM function_merges WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            with connection:
+                connection.execute(
+                    "UPDATE function_merges SET last_used = ? WHERE key = ?", (time.time(), key))
+            safe, reason = row
+            return bool(safe), reason
+
+        except (sqlite3.Error, OSError):
+            logger.debug("Function merge cache lookup failed", exc_info=True)
+            return None
+
+    def put_function_merge(self, fingerprints, safe, reason):
+        now = time.time()
+        try:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    # named columns: tables of older versions still have a layout column
+                    "INSERT OR REPLACE INTO function_merges (key, safe, reason, last_used) VALUES (?, ?, ?, ?)",
+                    (function_merge_key(fingerprints), int(safe), reason, now))
+                if self.max_age:
+                    connection.execute(
+                        "DELETE FROM function_merges WHERE last_used < ?", (now - self.max_age,))
+                if self.max_entries:
+                    connection.execute(
+                        "DELETE FROM function_merges WHERE key IN ("
+                        "SELECT key FROM function_merges ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,))
+
+        except (sqlite3.Error, OSError):
+            logger.debug("Function merge cache store failed", exc_info=True)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def open_cache():
+    """Returns the configured MergeCache, or None if caching is disabled (AST_MERGE_CACHE=0)."""
+    if not CACHE_ENABLED:
+        return None
+    return MergeCache()
@@ -5,6 +5,12 @@ import import_stmt_handler
 import ast
 import utilitys
 import function_stmt_handler as fsh
+import conflict_report
+import fingerprint
+import symbol_table
+import literal_merge
+import phases
+from module_builder import ModuleBuilder, ORIGIN_LOCAL, ORIGIN_REMOTE, ORIGIN_SYNTHESIZED
 
 
 def merge_imports(local_file_tree, remote_file_tree):
@@ -26,19 +32,44 @@ class ChangeMarker:
 
 
 class Merger:
-    def __init__(self, ast_base, ast_local, ast_remote):
+    def __init__(self, ast_base, ast_local, ast_remote, budget=None, report=None, fail_fast=False):
         self.ast_base = ast_base
         self.ast_local = ast_local
         self.ast_remote = ast_remote
 
+        # with fail_fast merging() returns at the first conflict, the report only holds that one
+        self.fail_fast = fail_fast
+
+        # origin of every statement of the merged module (see module_builder), set by merging()
+        self.merged_origins = None
+
+        # every reason that prevents the automatic merge ends up in the report
+        self.report = report if report is not None else conflict_report.ConflictReport()
+
+        # optional merge_budget.MergeBudget, checked at every phase boundary
+        self.budget = budget
+        if self.budget:
+            self.budget.count_nodes(ast_base, ast_local, ast_remote)
+
         self.merged_imports_list = self.return_merged_imports()
+        self._checkpoint("imports")
 
         self.local_nodes_wo_import = ast_mapper.map_top_level_nodes_without_imports(
             self.ast_local)
         self.remote_nodes_wo_imports = ast_mapper.map_top_level_nodes_without_imports(
             self.ast_remote)
-        self.lcs_local_and_remote_wo_imports = ast_mapper.get_lcs_with_difflib(
+        self.lcs_local_and_remote_wo_imports = ast_mapper.get_lcs(
             self.local_nodes_wo_import, self.remote_nodes_wo_imports)
+        self._checkpoint("lcs")
+
+    def _checkpoint(self, phase):
+        """
+        Called at the end of every merge phase, marks the phase for the profiler (see phases).
+        Raises merge_budget.BudgetExceeded if the merge runs over its budget.
+        """
+        phases.mark(phase)
+        if self.budget:
+            self.budget.check(phase)
 
     def return_merged_imports(self):
         imports_local_File = import_stmt_handler.extract_imports(
@@ -58,35 +89,38 @@ class Merger:
         """
         merged_sequence = []
 
-        lcs_queue = self.lcs_local_and_remote_wo_imports[:]
-        local_queue = self.local_nodes_wo_import[:]
-        remote_queue = self.remote_nodes_wo_imports[:]
+        # read positions instead of list.pop(0), which made this loop quadratic
+        local_nodes = self.local_nodes_wo_import
+        remote_nodes = self.remote_nodes_wo_imports
+        local_pos = 0
+        remote_pos = 0
 
         mapping_changes_left = {}
         mapping_changes_right = {}
 
         change_id = 0
 
-        while lcs_queue:
-           
-            anchor = lcs_queue.pop(0)
-            diff_nodes_local = []
-            while local_queue and not self._are_nodes_equal(local_queue[0], anchor):
-                diff_nodes_local.append(local_queue.pop(0))
+        for anchor in self.lcs_local_and_remote_wo_imports:
+
+            start = local_pos
+            while local_pos < len(local_nodes) and not self._are_nodes_equal(local_nodes[local_pos], anchor):
+                local_pos += 1
+            diff_nodes_local = local_nodes[start:local_pos]
 
-            if local_queue:
-                local_queue.pop(0)
+            if local_pos < len(local_nodes):
+                local_pos += 1
 
-            diff_nodes_remote = []
-            while remote_queue and not self._are_nodes_equal(remote_queue[0], anchor):
-                diff_nodes_remote.append(remote_queue.pop(0))
+            start = remote_pos
+            while remote_pos < len(remote_nodes) and not self._are_nodes_equal(remote_nodes[remote_pos], anchor):
+                remote_pos += 1
+            diff_nodes_remote = remote_nodes[start:remote_pos]
 
-            if remote_queue:
-                remote_queue.pop(0)
+            if remote_pos < len(remote_nodes):
+                remote_pos += 1
 
             if diff_nodes_local or diff_nodes_remote:
-                mapping_changes_left[change_id] = diff_nodes_local
-                mapping_changes_right[change_id] = diff_nodes_remote
+                mapping_changes_left[change_id] = _materialize(diff_nodes_local)
+                mapping_changes_right[change_id] = _materialize(diff_nodes_remote)
 
                 merged_sequence.append(ChangeMarker(change_id))
 
@@ -94,19 +128,27 @@ class Merger:
 
             merged_sequence.append(anchor)
 
-        if local_queue or remote_queue:
+        if local_pos < len(local_nodes) or remote_pos < len(remote_nodes):
 
-            mapping_changes_left[change_id] = list(local_queue)
-            mapping_changes_right[change_id] = list(remote_queue)
+            mapping_changes_left[change_id] = _materialize(local_nodes[local_pos:])
+            mapping_changes_right[change_id] = _materialize(remote_nodes[remote_pos:])
 
             merged_sequence.append(ChangeMarker(change_id))
 
+        self._checkpoint("changesets")
+
         return merged_sequence, mapping_changes_left, mapping_changes_right
 
     def merging(self, merged_sequence, mapping_changes_left, mapping_changes_right):
-        full_tree_body = []
+        """
+        Returns the merged ast.Module, built flat by a ModuleBuilder (the origins end up in merged_origins),
+        or False if the merge isn't possible automatically.
+        """
         auto_merging_possible = True
 
+        self.merge_literal_assignments(
+            mapping_changes_left, mapping_changes_right)
+
         # nodes_left and nodes_right are only the change nodes without imports
         nodes_left = [node for node_list in mapping_changes_left.values()
                       for node in node_list]
@@ -121,29 +163,21 @@ class Merger:
                 "Auto merging not possible due to conflicting assignments.")
 
             for var_name in sorted(collisions):
-                logger.merge(f"--- Conflict for Variable: '{var_name}' ---")
-
-                # 1. Passende Nodes aus LEFT suchen und formatieren
-                left_matches = [
-                    n for n in nodes_left if var_name in get_assigned_names(n)]
-                left_str = utilitys.format_nodes_with_lineno(left_matches)
-                logger.merge("LEFT (Local):")
-                for line in left_str.splitlines():
-                    logger.merge(line)
-
-                # 2. Passende Nodes aus RIGHT suchen und formatieren
-                right_matches = [
-                    n for n in nodes_right if var_name in get_assigned_names(n)]
-                right_str = utilitys.format_nodes_with_lineno(right_matches)
-                logger.merge("RIGHT (Remote):")
-                for line in right_str.splitlines():
-                    logger.merge(line)
-
-            logger.merge("-------------------------------------------")
+                self.report.add(conflict_report.Conflict(
+                    conflict_report.ASSIGNMENT_COLLISION, var_name,
+                    "Variable is assigned in LEFT (Local) and RIGHT (Remote)",
+                    collisions[var_name]["left"], collisions[var_name]["right"]))
+                if self.fail_fast:
+                    break
+
             auto_merging_possible = False
         else:
             logger.debug("no assignments conflicts detected")
 
+        self._checkpoint("collisions")
+        if self.fail_fast and not auto_merging_possible:
+            return False
+
         all_clean, other_nodes_left, other_nodes_right = utilitys.analyze_node_types(
             nodes_left, nodes_right)
 
@@ -153,23 +187,18 @@ class Merger:
         else:
             logger.merge(
                 "Auto merging not possible due node types that the merge tool can't handle yet")
-            if other_nodes_left:
-                logger.merge("Local Nodes that can't be handled:")
-                left_str = utilitys.format_nodes_with_lineno(other_nodes_left)
-                for line in left_str.splitlines():
-                    logger.merge(line)
-
-            if other_nodes_right:
-                right_str = utilitys.format_nodes_with_lineno(
-                    other_nodes_right)
-                logger.merge("Remote Nodes that can't be handled:")
-                for line in right_str.splitlines():
-                    logger.merge(line)
+            conflicts = [_unsupported_node_conflict(node, local=True) for node in other_nodes_left]
+            conflicts += [_unsupported_node_conflict(node, local=False) for node in other_nodes_right]
+            for conflict in conflicts[:1] if self.fail_fast else conflicts:
+                self.report.add(conflict)
 
             auto_merging_possible = False
 
+        self._checkpoint("node_types")
+        if self.fail_fast and not auto_merging_possible:
+            return False
+
         if self.merged_imports_list and auto_merging_possible:
-            full_tree_body.append(self.merged_imports_list)
             logger.merge("Merged Imports:")
             for line in utilitys.node_to_string(self.merged_imports_list).splitlines():
                 logger.merge(line)
@@ -177,18 +206,28 @@ class Merger:
         deleted_fun_left, deleted_fun_right = utilitys.detect_deleted_functions(
             ast_mapper.map_top_level_nodes_without_imports(self.ast_base), nodes_left, nodes_right)
 
+        # one walk over each side for all deleted functions, instead of one walk per function
+        loaded_names_left = utilitys.index_loaded_names(
+            nodes_left) if deleted_fun_right else {}
+        loaded_names_right = utilitys.index_loaded_names(
+            nodes_right) if deleted_fun_left else {}
+        removed_left = []
+        removed_right = []
+
         for fun in deleted_fun_left:
-            if utilitys.is_function_referenced(fun, nodes_right):
-                logger.merge(f"Auto merging not possible. Function '{
-                             fun}' was deleted in LEFT (Local), but new references to it were found in RIGHT (Remote)")
+            refs = utilitys.find_referencing_nodes(
+                fun, nodes_right, loaded_names_right)
+            if refs:
+                self.report.add(conflict_report.Conflict(
+                    conflict_report.DELETED_FUNCTION_REFERENCED, fun,
+                    "Function was deleted in LEFT (Local), but new references to it were found in RIGHT (Remote)",
+                    remote_nodes=refs))
                 auto_merging_possible = False
-                refs = utilitys.find_function_references(fun, nodes_right)
-                for ref in refs:
-                    logger.merge(f"   -> Line {ref['lineno']}: {ref['code']}")
+                if self.fail_fast:
+                    return False
 
             else:
-                utilitys.remove_function_by_name_in_mapping(
-                    fun, mapping_changes_right)
+                removed_right.append(fun)
                 logger.merge(
                     f"Function '{fun}' was deleted in LEFT (Local). "
                     "No references found in RIGHT (Remote). "
@@ -196,25 +235,51 @@ class Merger:
                 )
 
         for fun in deleted_fun_right:
-            if utilitys.is_function_referenced(fun, nodes_left):
-                logger.merge(f"Auto merging not possible. Function '{
-                             fun}' was deleted in RIGHT (Remote), but new references to it were found in LEFT (Local)")
+            refs = utilitys.find_referencing_nodes(
+                fun, nodes_left, loaded_names_left)
+            if refs:
+                self.report.add(conflict_report.Conflict(
+                    conflict_report.DELETED_FUNCTION_REFERENCED, fun,
+                    "Function was deleted in RIGHT (Remote), but new references to it were found in LEFT (Local)",
+                    local_nodes=refs))
                 auto_merging_possible = False
-                refs = utilitys.find_function_references(fun, nodes_left)
-                for ref in refs:
-                    logger.merge(f"   -> Line {ref['lineno']}: {ref['code']}")
+                if self.fail_fast:
+                    return False
 
             else:
-                utilitys.remove_function_by_name_in_mapping(
-                    fun, mapping_changes_left)
+                removed_left.append(fun)
                 logger.merge(
                     f"Function '{fun}' was deleted in RIGHT (Remote). "
                     "No references found in LEFT (Local). "
                     "Removed function from merge result (deleted from LEFT set)."
                 )
 
-        fsh.process_and_merge_functions(
-            mapping_changes_left, mapping_changes_right)
+        utilitys.remove_functions_by_name_in_mapping(
+            removed_right, mapping_changes_right)
+        utilitys.remove_functions_by_name_in_mapping(
+            removed_left, mapping_changes_left)
+
+        self._checkpoint("deleted_functions")
+
+        if not fsh.process_and_merge_functions(
+                mapping_changes_left, mapping_changes_right, self.report):
+            auto_merging_possible = False
+
+        self._checkpoint("functions")
+        if self.fail_fast and not auto_merging_possible:
+            return False
+
+        if not auto_merging_possible:
+            return False
+
+        # all changes are final now, so the size of the merged body is known
+        size = len(self.merged_imports_list) + sum(
+            len(mapping_changes_left[item.change_id]) +
+            len(mapping_changes_right[item.change_id])
+            if isinstance(item, ChangeMarker) else 1
+            for item in merged_sequence)
+        builder = ModuleBuilder(size)
+        builder.extend(self.merged_imports_list, ORIGIN_SYNTHESIZED)
 
         for item in merged_sequence:
             if isinstance(item, ChangeMarker):
@@ -222,31 +287,57 @@ class Merger:
                 nodes_l = mapping_changes_left[cid]
                 nodes_r = mapping_changes_right[cid]
 
-                if nodes_l and nodes_r and auto_merging_possible:
-                    logger.merge("Conflicting nodes:")
-                    logger.merge("LEFT (Local):")
-                    str_l = utilitys.format_nodes_with_lineno(nodes_l)
-                    for line in str_l.splitlines():
-                        logger.merge(line)
-
-                    logger.merge("RIGHT (Remote):")
-                    str_r = utilitys.format_nodes_with_lineno(nodes_r)
-                    for line in str_r.splitlines():
-                        logger.merge(line)
-
+                if nodes_l and nodes_r:
                     logger.merge(
+                        f"Change {cid}: LEFT (Local) and RIGHT (Remote) both added nodes "
+                        f"({len(nodes_l)} local, {len(nodes_r)} remote). "
                         "Can be merged automatically and will be added to the merge.")
 
-                full_tree_body.append(nodes_l)
-                full_tree_body.append(nodes_r)
+                builder.extend(nodes_l, ORIGIN_LOCAL)
+                builder.extend(nodes_r, ORIGIN_REMOTE)
 
             else:
-                full_tree_body.append(item)
+                # the anchors are the local nodes of the LCS
+                builder.add(item, ORIGIN_LOCAL)
 
-        if auto_merging_possible:
-            return full_tree_body
-        else:
-            return False
+        merged_module = builder.build()
+        self.merged_origins = builder.origins
+        logger.debug(f"merged module: {builder.origin_counts()}")
+        return merged_module
+
+    def merge_literal_assignments(self, mapping_changes_left, mapping_changes_right):
+        """
+        Dict/list/tuple/set literals assigned in LEFT and RIGHT are merged entry by entry against BASE.
+        The merged assignment replaces the LEFT one, the RIGHT one is dropped,
+        so independent additions don't end up as assignment collisions.
+        """
+        literals_left = literal_merge.literal_assignments(mapping_changes_left)
+        literals_right = literal_merge.literal_assignments(
+            mapping_changes_right)
+        common_names = literals_left.keys() & literals_right.keys()
+        if not common_names:
+            return
+
+        literals_base = literal_merge.base_literal_assignments(
+            self.ast_base, common_names)
+
+        for name in sorted(common_names):
+            if name not in literals_base:
+                continue
+            list_left, node_left = literals_left[name]
+            list_right, node_right = literals_right[name]
+
+            merged_node = literal_merge.merge_literal_assignment(
+                literals_base[name], node_left, node_right)
+            if merged_node is None:
+                logger.merge(
+                    f"Literal '{name}': the same entries were changed in LEFT (Local) and RIGHT (Remote)")
+                continue
+
+            list_left[list_left.index(node_left)] = merged_node
+            list_right.remove(node_right)
+            logger.merge(
+                f"Literal '{name}' was changed in LEFT (Local) and RIGHT (Remote), merged entry by entry.")
 
     def _are_nodes_equal(self, node1, node2):
         """
@@ -255,62 +346,49 @@ class Merger:
         """
         if node1 is None or node2 is None:
             return False
-        # include_attributes=False ist extrem wichtig, um Zeilennummern zu ignorieren!
-        return ast.dump(node1, include_attributes=False) == ast.dump(node2, include_attributes=False)
+        # die LCS-Anker sind die Local-Nodes selbst
+        if node1 is node2:
+            return True
+        # Top-Level-Statements werden nicht interniert (ihre Positionen braucht der Conflict Report)
+        # und lazy geparste Statements haben nur ihren Fingerprint, daher kein Vergleich mit "is".
+        # Der Fingerprint liegt schon am Node (16 Bytes), der Vergleich ist genauso O(1);
+        # er ignoriert Zeilennummern (ast.dump mit include_attributes=False)
+        return fingerprint.node_fingerprint(node1) == fingerprint.node_fingerprint(node2)
 
 
-def get_assigned_names(node):
-    """
-    Extrahiert die Variablennamen aus einer Zuweisung.
-    Gibt ein Set von Namen zurück (z.B. {'x', 'y'} bei x = y = 1).
-    """
-    found_names = set()
+def _materialize(nodes):
+    # statements that were skipped by the lazy parse (see fingerprint.parse_lazily) are parsed once they are part of a change
+    return [fingerprint.materialize(node) for node in nodes]
 
-    # Fall 1: Normale Zuweisung (x = 1)
-    if isinstance(node, ast.Assign):
-        for target in node.targets:
-            if isinstance(target, ast.Name):
-                found_names.add(target.id)
-            # (Optional: Tuple unpacking wie 'x, y = ...' ist komplexer,
-            #  hier ignorieren wir es für einfache Konflikterkennung oft)
 
-    # Fall 2: Typisierte Zuweisung (x: int = 1)
-    elif isinstance(node, ast.AnnAssign):
-        if isinstance(node.target, ast.Name):
-            found_names.add(node.target.id)
-
-    return found_names
+def _unsupported_node_conflict(node, local):
+    symbol = getattr(node, "name", type(node).__name__)
+    reason = f"{type(node).__name__} statements can't be merged automatically yet"
+    if local:
+        return conflict_report.Conflict(conflict_report.UNSUPPORTED_NODE, symbol, reason, local_nodes=[node])
+    return conflict_report.Conflict(conflict_report.UNSUPPORTED_NODE, symbol, reason, remote_nodes=[node])
 
 
 def check_assignment_collision(nodes_left, nodes_right):
     """
-    Prüft, ob in beiden Listen dieselbe Variable zugewiesen wird.
+    Prüft, ob in beiden Listen dieselbe Variable zugewiesen wird
+    (Zuweisung mit Unpacking, AugAssign, Walrus oder global in einer Funktion).
     Returns:
         collisions: dict
             Schlüssel: Name der kollidierenden Variable
             Wert: dict mit 'left' und 'right', die Listen der Nodes enthalten, die die Variable zuweisen
     """
-    # 1. Mapping von Namen zu Nodes erstellen
-    mapping_left = {}
-    for node in nodes_left:
-        for name in get_assigned_names(node):
-            mapping_left.setdefault(name, []).append(node)
-
-    mapping_right = {}
-    for node in nodes_right:
-        for name in get_assigned_names(node):
-            mapping_right.setdefault(name, []).append(node)
-
-    # 2. Schnittmenge der Namen bestimmen
-    collision_names = set(mapping_left.keys()).intersection(
-        mapping_right.keys())
-
-    # 3. Mapping der Kollisions-Nodes erstellen
+    # Eine Symboltabelle pro Change-Set, die Namen teilen sich einen Index
+    index = symbol_table.SymbolIndex()
+    table_left = symbol_table.SymbolTable(nodes_left, index)
+    table_right = symbol_table.SymbolTable(nodes_right, index)
+
+    # Schnittmenge der Namen als Bitmap-Operation
     collisions = {}
-    for name in collision_names:
+    for name in table_left.collisions(table_right):
         collisions[name] = {
-            "left": mapping_left[name],
-            "right": mapping_right[name]
+            "left": table_left.definitions[name],
+            "right": table_right.definitions[name]
         }
 
     return collisions
@@ -0,0 +1,140 @@
+import json
+import time
+
+from log_config import logger
+import merge_budget
+import phases
+
+
+# Allocation sites listed with trace_memory
+TOP_SITES = 10
+
+
+class PhaseMetrics:
+    """
+    Phase listener (see phases) that records the wall time of every phase and, with trace_memory,
+    its net and peak allocations (tracemalloc) relative to the start of the phase and the source lines
+    that allocated its net growth (a snapshot at every phase boundary, taken outside the phase times).
+    The last snapshot compared with the first shows the memory the whole merge kept (caches, interned names, ...).
+    """
+
+    def __init__(self, trace_memory=False, top_sites=TOP_SITES):
+        self.trace_memory = trace_memory
+        self.top_sites = top_sites
+        self.phases = []
+        self.traced_peak = 0
+        self.allocation_sites = []
+        self.started = None
+        self._phase_started = None
+        self._memory_at_start = 0
+        self._first_snapshot = None
+        self._last_snapshot = None
+
+    def _snapshot_now(self):
+        import tracemalloc
+
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+
+    def _start_phase(self):
+        if self.trace_memory:
+            import tracemalloc
+
+            tracemalloc.reset_peak()
+            self._memory_at_start = tracemalloc.get_traced_memory()[0]
+        self._phase_started = time.perf_counter()
+
+    def start(self):
+        if self.trace_memory:
+            import tracemalloc
+
+            tracemalloc.start()
+            if self.top_sites:
+                # nothing is traced yet, the first snapshots are cheap. The first filter run fills
+                # the pattern caches of fnmatch and re, they would show up as sites of the first phase
+                self._snapshot_now()
+                self._first_snapshot = self._last_snapshot = self._snapshot_now()
+        self.started = time.perf_counter()
+        self._start_phase()
+
+    def mark(self, phase):
+        entry = {"phase": phase, "seconds": round(
+            time.perf_counter() - self._phase_started, 6)}
+
+        if self.trace_memory:
+            import tracemalloc
+
+            current, peak = tracemalloc.get_traced_memory()
+            entry["net_kb"] = round((current - self._memory_at_start) / 1024, 1)
+            entry["peak_kb"] = round((peak - self._memory_at_start) / 1024, 1)
+            self.traced_peak = max(self.traced_peak, peak)
+            if self._last_snapshot is not None:
+                snapshot = self._snapshot_now()
+                entry["sites"] = self.top_allocation_sites(snapshot, self._last_snapshot)
+                self._last_snapshot = snapshot
+
+        self.phases.append(entry)
+        self._start_phase()
+
+    def top_allocation_sites(self, snapshot, since):
+        """The source lines that allocated the most of the memory held in snapshot and not in since."""
+        return [
+            {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "size_kb": round(stat.size_diff / 1024, 1),
+             "count": stat.count_diff}
+            for stat in snapshot.compare_to(since, "lineno")[:self.top_sites]
+            if stat.size_diff > 0]
+
+    def stop(self):
+        self.mark(phases.FINISH)
+        if self._first_snapshot is not None:
+            self.allocation_sites = self.top_allocation_sites(self._last_snapshot, self._first_snapshot)
+        self._first_snapshot = None
+        self._last_snapshot = None
+        if self.trace_memory:
+            import tracemalloc
+
+            tracemalloc.stop()
+
+    def to_dict(self):
+        result = {
+            "seconds": round(time.perf_counter() - self.started, 6),
+            "peak_rss_mb": merge_budget.peak_memory_mb(),
+            "phases": self.phases,
+        }
+        if self.trace_memory:
+            result["traced_peak_kb"] = round(self.traced_peak / 1024, 1)
+            result["kept_sites"] = self.allocation_sites
+        return result
+
+
+def run_measured(metrics_file, label, trace_memory, function, *args):
+    """
+    Runs function(*args) and appends its phase metrics as one JSON line to metrics_file:
+    the label, the result of the function and the time (and with trace_memory the memory) of every phase.
+    Tracing makes the merge several times slower and bigger, its time and memory limits are suspended then.
+    Returns the result of the function.
+    """
+    recorder = PhaseMetrics(trace_memory)
+    phases.add_listener(recorder.mark)
+    recorder.start()
+    result = None
+    try:
+        if trace_memory:
+            with merge_budget.suspended():
+                result = function(*args)
+        else:
+            result = function(*args)
+        return result
+    finally:
+        recorder.stop()
+        phases.remove_listener(recorder.mark)
+
+        record = {"label": str(label), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  "result": result, **recorder.to_dict()}
+        with open(metrics_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        logger.merge(f"Merge metrics written to {metrics_file}")
@@ -0,0 +1,62 @@
+import ast
+
+import conflict_report
+import source_text
+
+
+# Where a statement of the merged module comes from, local and remote match the sides of the conflict report
+ORIGIN_BASE = "base"
+ORIGIN_LOCAL = conflict_report.LOCAL
+ORIGIN_REMOTE = conflict_report.REMOTE
+ORIGIN_SYNTHESIZED = "synthesized"
+
+
+class ModuleBuilder:
+    """
+    Builds the merged module in one flat body of known size, filled in place:
+    no nested per-change lists, no copies of the input statements.
+    The origin of every statement is recorded next to it (origins[i] belongs to body[i]),
+    nodes marked with source_text.mark_synthesized count as synthesized for whichever side they are added.
+    build() fills in the missing locations of the synthesized statements once,
+    the statements of the inputs keep theirs and are never changed.
+    """
+
+    def __init__(self, size):
+        self.body = [None] * size
+        self.origins = [None] * size
+        self.size = 0
+
+    def add(self, node, origin):
+        if source_text.is_synthesized(node):
+            origin = ORIGIN_SYNTHESIZED
+        self.body[self.size] = node
+        self.origins[self.size] = origin
+        self.size += 1
+
+    def extend(self, nodes, origin):
+        for node in nodes:
+            self.add(node, origin)
+
+    def origin_counts(self):
+        counts = {}
+        for origin in self.origins[:self.size]:
+            counts[origin] = counts.get(origin, 0) + 1
+        return counts
+
+    def build(self):
+        del self.body[self.size:]
+        del self.origins[self.size:]
+
+        previous = None
+        for node, origin in zip(self.body, self.origins):
+            if origin == ORIGIN_SYNTHESIZED and getattr(node, "lineno", None) is None:
+                # placed where the statement before it is, the node stays marked as synthesized
+                if previous is not None:
+                    ast.copy_location(node, previous)
+                else:
+                    node.lineno = node.end_lineno = 1
+                    node.col_offset = node.end_col_offset = 0
+                ast.fix_missing_locations(source_text.mark_synthesized(node))
+            previous = node
+
+        return ast.Module(body=self.body, type_ignores=[])
@@ -1,5 +1,6 @@
 import ast
 import os
+from input_buffer import InputBuffer
 
 
 def parse_python_code(code_string):
@@ -26,8 +27,8 @@ def parse_file_to_ast(file_path):
         return None
 
     try:
-        with open(file_path, "r") as f:
-            source_code = f.read()
+        with InputBuffer.from_file(file_path) as buffer:
+            source_code = buffer.text
 
         tree = ast.parse(source_code)
         return tree
@@ -0,0 +1,37 @@
+"""
+Phase markers of a merge.
+The pipeline calls mark(phase) at the end of every phase (read, parse, imports, lcs, changesets, ...,
+format, see Merger._checkpoint, or line_merge for the fallback), observers such as the profiler
+and the metrics register a listener for them.
+Listeners are registered per thread, they only see the phases of the merges run in their own thread.
+Without listeners a marker costs a single check.
+"""
+import threading
+
+# the phase after the last marker: writing the output and the report
+FINISH = "finish"
+
+_local = threading.local()
+
+
+def _listeners():
+    listeners = getattr(_local, "listeners", None)
+    if listeners is None:
+        listeners = _local.listeners = []
+    return listeners
+
+
+def add_listener(listener):
+    """listener(phase) is called at the end of every phase of the current thread."""
+    _listeners().append(listener)
+
+
+def remove_listener(listener):
+    _listeners().remove(listener)
+
+
+def mark(phase):
+    listeners = getattr(_local, "listeners", None)
+    if listeners:
+        for listener in list(listeners):
+            listener(phase)
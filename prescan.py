@@ -0,0 +1,44 @@
+import os
+
+
+PYTHON_EXTENSIONS = (".py", ".pyi", ".pyw")
+
+# Inputs above these limits are merged line-based, the AST path would take too long
+MAX_FILE_BYTES = int(os.environ.get("AST_MERGE_MAX_BYTES", 2 * 1024 * 1024))
+MAX_FILE_LINES = int(os.environ.get("AST_MERGE_MAX_LINES", 50_000))
+
+# Same heuristic as git: a NUL byte in the first 8000 bytes marks a binary file
+BINARY_SNIFF_BYTES = 8000
+
+
+def is_binary(buffer):
+    return b"\0" in buffer.head(BINARY_SNIFF_BYTES)
+
+
+def prescan_inputs(buffers, path_name=None):
+    """
+    Cheap checks on the InputBuffers before any parsing happens.
+    Returns None if the AST merge can be attempted, otherwise the reason for the textual fallback.
+    """
+    if path_name and not path_name.endswith(PYTHON_EXTENSIONS):
+        return f"'{path_name}' is not a Python file"
+
+    for buffer in buffers:
+        if is_binary(buffer):
+            return "binary content"
+
+        if buffer.size > MAX_FILE_BYTES:
+            return f"input larger than {MAX_FILE_BYTES} bytes"
+
+        # the decoded text is kept by the buffer, the AST merge doesn't decode again
+        try:
+            text = buffer.text
+        except SyntaxError:
+            return "invalid coding cookie"
+        except (LookupError, UnicodeDecodeError):
+            return f"input can't be decoded as {buffer.encoding}"
+
+        if text.count("\n") > MAX_FILE_LINES:
+            return f"input longer than {MAX_FILE_LINES} lines"
+
+    return None
@@ -0,0 +1,102 @@
+import os
+import signal
+import sys
+import threading
+import time
+
+from log_config import logger
+import phases
+
+
+# Seconds between two stack samples
+SAMPLE_INTERVAL = float(os.environ.get(
+    "AST_MERGE_PROFILE_INTERVAL", 0.001))
+
+
+class StackSampler:
+    """
+    Samples the stack of the main thread up to the frame the sampler was created in,
+    driven by a SIGPROF timer (CPU time). The signal handler runs in the sampled thread itself:
+    cProfile of Python 3.12 would mix up the calls of a separate sampling thread with the profiled ones.
+    Samples are held back until the next phase marker and then counted for that phase,
+    so every stack is tagged with the phase it was taken in.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.root = sys._getframe(1)
+        self.interval = interval
+        # (phase, stack) -> number of samples, stacks are tuples of frame names from the outermost frame
+        self.counts = {}
+        self._pending = {}
+        self._names = {}
+        self._previous_handler = None
+
+    def _on_signal(self, signum, frame):
+        names = self._names
+        stack = []
+        while frame is not None and frame is not self.root:
+            code = frame.f_code
+            name = names.get(code)
+            if name is None:
+                name = names[code] = f"{os.path.basename(code.co_filename)}:{code.co_qualname}"
+            stack.append(name)
+            frame = frame.f_back
+        stack.reverse()
+        stack = tuple(stack)
+        self._pending[stack] = self._pending.get(stack, 0) + 1
+
+    def mark(self, phase):
+        """Phase listener: the samples since the last marker belong to this phase."""
+        pending, self._pending = self._pending, {}
+        for stack, count in pending.items():
+            key = (phase, stack)
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    def start(self):
+        if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+            logger.warning(
+                "Stack sampling needs SIGPROF in the main thread, the collapsed stacks stay empty")
+            return
+        self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        if self._previous_handler is not None:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler)
+            self._previous_handler = None
+        self.mark(phases.FINISH)
+
+    def collapsed(self, label):
+        """The samples in the collapsed stack format of flamegraph tools: label;phase;frame;... count"""
+        return "".join(f"{label};{phase};{';'.join(stack)} {count}\n"
+                       for (phase, stack), count in sorted(self.counts.items()))
+
+
+def run_profiled(directory, label, function, *args):
+    """
+    Runs function(*args) under cProfile and the stack sampler and writes
+    <label>-<time>.pstats and <label>-<time>.collapsed to directory.
+    Returns the result of the function.
+    """
+    import cProfile
+
+    profiler = cProfile.Profile()
+    sampler = StackSampler()
+    phases.add_listener(sampler.mark)
+    sampler.start()
+    profiler.enable()
+    try:
+        return function(*args)
+    finally:
+        profiler.disable()
+        sampler.stop()
+        phases.remove_listener(sampler.mark)
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory, f"{label}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}")
+        profiler.dump_stats(path + ".pstats")
+        with open(path + ".collapsed", "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed(label))
+        logger.merge(f"Profile written to {path}.pstats and {path}.collapsed")
@@ -0,0 +1,191 @@
+import os
+import subprocess
+import time
+
+import log_config
+from log_config import logger
+import prescan
+
+
+RESULT_CLEAN = "clean"
+RESULT_CONFLICT = "conflict"
+RESULT_SKIPPED = "skipped"
+
+
+class UnmergedFile:
+    """One conflicted path of the index with the blob ids of its stages (1 = base, 2 = ours, 3 = theirs)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.stages = {}
+
+    def is_three_way(self):
+        return all(stage in self.stages for stage in (1, 2, 3))
+
+    def __repr__(self):
+        return f"<UnmergedFile {self.path} stages={sorted(self.stages)}>"
+
+
+def git(repo, *args, **kwargs):
+    """Runs git in repo, returns the CompletedProcess (stdout as bytes), raises CalledProcessError if git fails."""
+    return subprocess.run(["git", "-C", repo, *args], check=True, capture_output=True, **kwargs)
+
+
+def unmerged_files(repo):
+    """Reads the unmerged index entries (git ls-files -u), grouped by path."""
+    output = git(repo, "ls-files", "-u", "-z").stdout
+    files = {}
+    for entry in output.split(b"\0"):
+        if not entry:
+            continue
+        # <mode> SP <object> SP <stage> TAB <path>
+        info, path = entry.split(b"\t", 1)
+        _, blob, stage = info.split(b" ")
+        path = os.fsdecode(path)
+        unmerged = files.setdefault(path, UnmergedFile(path))
+        unmerged.stages[int(stage)] = blob.decode("ascii")
+    return list(files.values())
+
+
+def read_blobs(repo, blob_ids):
+    """
+    Reads the blobs through a single git cat-file --batch process, nothing is written to disk.
+    Returns a dict blob id -> content.
+    """
+    blob_ids = list(dict.fromkeys(blob_ids))
+    if not blob_ids:
+        return {}
+
+    request = "".join(f"{blob_id}\n" for blob_id in blob_ids).encode("ascii")
+    output = git(repo, "cat-file", "--batch", input=request).stdout
+
+    blobs = {}
+    position = 0
+    for blob_id in blob_ids:
+        # <object> SP <type> SP <size> LF <contents> LF
+        header_end = output.index(b"\n", position)
+        header = output[position:header_end].split(b" ")
+        if header[-1] == b"missing":
+            raise RuntimeError(f"blob {blob_id} is missing")
+        size = int(header[2])
+        blobs[blob_id] = output[header_end + 1:header_end + 1 + size]
+        position = header_end + 1 + size + 1
+    return blobs
+
+
+def merge_file(path, base_data, local_data, remote_data):
+    """
+    Worker: merges one file in memory. Returns (path, merged content, exit code, method, seconds),
+    the merged content is only used for clean merges.
+    """
+    from input_buffer import InputBuffer
+    import ast_merge_tool
+
+    started = time.perf_counter()
+    buffers = [InputBuffer.from_bytes(data, name)
+               for data, name in ((base_data, "BASE"), (local_data, "LOCAL"), (remote_data, "REMOTE"))]
+    # the merges already run in worker processes, they can't start their own
+    merged_content, exit_code, method = ast_merge_tool.merge_buffers(
+        buffers, path, parallel=False)
+    log_config.end_merge(failed=exit_code != 0)
+    if merged_content is None:
+        # LOCAL is kept as it is
+        merged_content = local_data
+    return path, merged_content, exit_code, method, time.perf_counter() - started
+
+
+def _run_merges(jobs, workers):
+    if workers == 1:
+        return [merge_file(*job) for job in jobs]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(merge_file, *job) for job in jobs]
+        return [future.result() for future in futures]
+
+
+def merge_repository(repo=".", workers=None):
+    """
+    Merges every conflicted Python file of the repository, the largest files are started first.
+    Clean results are written to the work tree and staged, conflicted files are left as git wrote them.
+    Returns a list of rows (path, size, method, result, seconds).
+    """
+    import utilitys
+
+    repo = os.fsdecode(git(repo, "rev-parse", "--show-toplevel").stdout).strip()
+
+    rows = []
+    candidates = []
+    for unmerged in unmerged_files(repo):
+        if not unmerged.path.endswith(prescan.PYTHON_EXTENSIONS):
+            continue
+        if not unmerged.is_three_way():
+            # added or deleted on one side, there is nothing to merge
+            rows.append((unmerged.path, 0, "-", RESULT_SKIPPED, 0.0))
+            continue
+        candidates.append(unmerged)
+
+    blobs = read_blobs(repo, [unmerged.stages[stage]
+                              for unmerged in candidates for stage in (1, 2, 3)])
+    jobs = [(unmerged.path, *(blobs[unmerged.stages[stage]] for stage in (1, 2, 3)))
+            for unmerged in candidates]
+    # the slowest merges go first, so they don't end up as the tail of the run
+    sizes = {job[0]: max(len(job[1]), len(job[2]), len(job[3])) for job in jobs}
+    jobs.sort(key=lambda job: sizes[job[0]], reverse=True)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+
+    clean_paths = []
+    for path, merged_content, exit_code, method, seconds in _run_merges(jobs, workers):
+        if exit_code == 0:
+            utilitys.write_file_atomic(os.path.join(repo, path), merged_content)
+            clean_paths.append(path)
+            rows.append((path, sizes[path], method, RESULT_CLEAN, seconds))
+        else:
+            rows.append((path, sizes[path], method, RESULT_CONFLICT, seconds))
+        logger.merge(f"repo-merge {path}: {rows[-1][3]} ({method}, {seconds:.2f}s)")
+
+    if clean_paths:
+        git(repo, "add", "--", *clean_paths)
+
+    return rows
+
+
+def format_summary(rows):
+    header = ("PATH", "SIZE", "METHOD", "RESULT", "SECONDS")
+    table = [header] + [(path, str(size), method, result, f"{seconds:.2f}")
+                        for path, size, method, result, seconds in rows]
+    widths = [max(len(row[column]) for row in table)
+              for column in range(len(header))]
+
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+             for row in table]
+    clean = sum(1 for row in rows if row[3] == RESULT_CLEAN)
+    lines.append(f"{clean} of {len(rows)} conflicted Python file(s) merged and staged")
+    return "\n".join(lines)
+
+
+def main(argv):
+    """ast_merge_tool.py repo-merge [--repo DIR] [--jobs N]"""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(
+        prog="ast_merge_tool.py repo-merge",
+        description="Merges all conflicted Python files of a git merge in progress and stages the clean results.")
+    arg_parser.add_argument("--repo", default=".",
+                            help="path inside the git repository (default: current directory)")
+    arg_parser.add_argument("--jobs", type=int, default=None,
+                            help="number of parallel merges (default: number of cores)")
+    args = arg_parser.parse_args(argv)
+
+    try:
+        rows = merge_repository(args.repo, args.jobs)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"git failed: {e.stderr.decode(errors='replace').strip()}")
+        return 2
+
+    print(format_summary(rows))
+    return 0 if all(row[3] == RESULT_CLEAN for row in rows) else 1
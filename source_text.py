@@ -0,0 +1,90 @@
+import ast
+import re
+from array import array
+
+
+# same line endings as the tokenizer, so the index matches the lineno of the AST nodes
+_NEWLINE = re.compile(r"\r\n|\r|\n")
+
+# set on nodes whose code no longer matches their position in the input (e.g. merged functions)
+SYNTHESIZED_ATTR = "_ast_merge_synthesized"
+
+
+def mark_synthesized(node):
+    setattr(node, SYNTHESIZED_ATTR, True)
+    return node
+
+
+def is_synthesized(node):
+    return getattr(node, SYNTHESIZED_ATTR, False) or getattr(node, "lineno", None) is None
+
+
+class SourceText:
+    """
+    Original source of an input together with the start offset of every line.
+    Code of parsed nodes is sliced out of the source instead of being unparsed,
+    so users see their own formatting.
+    """
+
+    def __init__(self, text, name=None):
+        self.text = text
+        self.name = name
+        self._line_offsets = None
+
+    @property
+    def line_offsets(self):
+        """Start offset of every line (index 0 is line 1), built with the first lookup."""
+        if self._line_offsets is None:
+            offsets = array("q", [0])
+            offsets.extend(match.end() for match in _NEWLINE.finditer(self.text))
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    def offset(self, lineno, col_offset):
+        """
+        Offset in the text of a (lineno, col_offset) position of the AST.
+        col_offset counts UTF-8 bytes, this only matters for lines with non-ASCII characters.
+        """
+        line_start = self.line_offsets[lineno - 1]
+        prefix = self.text[line_start:line_start + col_offset]
+        if prefix.isascii():
+            return line_start + col_offset
+        line_end = self.line_offsets[lineno] if lineno < len(
+            self.line_offsets) else len(self.text)
+        line = self.text[line_start:line_end].encode("utf-8")
+        return line_start + len(line[:col_offset].decode("utf-8", errors="replace"))
+
+    def segment(self, node):
+        """
+        Source code of the node, including its decorators.
+        Returns None for nodes without a position in this source.
+        """
+        if is_synthesized(node) or getattr(node, "end_lineno", None) is None:
+            return None
+        if node.end_lineno > len(self.line_offsets):
+            return None
+
+        lineno, col_offset = node.lineno, node.col_offset
+        decorators = getattr(node, "decorator_list", None)
+        if decorators:
+            # decorators share the indentation of the def/class line
+            lineno = min(decorator.lineno for decorator in decorators)
+
+        start = self.offset(lineno, col_offset)
+        end = self.offset(node.end_lineno, node.end_col_offset)
+        return self.text[start:end]
+
+    def __repr__(self):
+        return f"<SourceText {self.name or ''} {len(self.text)} chars>"
+
+
+def render_node(node, source=None):
+    """
+    Code of a node: a slice of the original source if the node has a position in it,
+    ast.unparse only for synthesized nodes.
+    """
+    if source is not None:
+        segment = source.segment(node)
+        if segment is not None:
+            return segment
+    return ast.unparse(node)
@@ -0,0 +1,165 @@
+import ast
+import sys
+
+
+# nested scopes, names bound in them are local to the scope (except declared globals)
+SCOPE_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+
+
+def target_names(target):
+    """Names bound by an assignment target, including tuple/list and star unpacking."""
+    if isinstance(target, ast.Name):
+        yield target.id
+    elif isinstance(target, (ast.Tuple, ast.List)):
+        for element in target.elts:
+            yield from target_names(element)
+    elif isinstance(target, ast.Starred):
+        yield from target_names(target.value)
+    # attributes and subscripts change an object, they don't bind a name
+
+
+def walrus_names(node):
+    """Names bound by := in the node, comprehensions included (they bind in the enclosing scope)."""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, ast.NamedExpr):
+            yield from target_names(current.target)
+        for child in ast.iter_child_nodes(current):
+            if not isinstance(child, SCOPE_TYPES):
+                stack.append(child)
+
+
+def global_names(function):
+    """
+    Module level names a function assigns after declaring them global, per scope:
+    a nested function binds a module level name only through its own global declaration,
+    nonlocal names and the loop variables of comprehensions are never module level.
+    """
+    names = set()
+    scopes = [function]
+    while scopes:
+        scope = scopes.pop()
+        declared = set()
+        stored = set()
+        stack = list(ast.iter_child_nodes(scope))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, SCOPE_TYPES):
+                scopes.append(node)
+                continue
+            if isinstance(node, ast.Global):
+                declared.update(node.names)
+            elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                stored.add(node.id)
+            elif isinstance(node, ast.comprehension):
+                # := in the condition still binds in this scope, the target doesn't
+                stack.append(node.iter)
+                stack.extend(node.ifs)
+                continue
+            stack.extend(ast.iter_child_nodes(node))
+        names |= declared & stored
+    return names
+
+
+def statement_names(node):
+    """Module level names bound by the top level statement itself."""
+    if isinstance(node, ast.Assign):
+        for target in node.targets:
+            yield from target_names(target)
+    elif isinstance(node, (ast.AnnAssign, ast.AugAssign)):
+        yield from target_names(node.target)
+
+    if not isinstance(node, SCOPE_TYPES):
+        yield from walrus_names(node)
+
+
+class SymbolIndex:
+    """
+    Interns the names of the symbol tables that are compared with each other
+    and gives every name a bit position in their bitmaps.
+    """
+
+    def __init__(self):
+        self.bits = {}
+        self.names = []
+
+    def bit(self, name):
+        bit = self.bits.get(name)
+        if bit is None:
+            name = sys.intern(name)
+            bit = self.bits[name] = len(self.names)
+            self.names.append(name)
+        return bit
+
+    def bitmap(self, names):
+        bits = bytearray((len(self.names) + 7) // 8)
+        for name in names:
+            bit = self.bits[name]
+            bits[bit >> 3] |= 1 << (bit & 7)
+        return int.from_bytes(bits, "little")
+
+    def names_of(self, bitmap):
+        names = []
+        while bitmap:
+            lowest = bitmap & -bitmap
+            names.append(self.names[lowest.bit_length() - 1])
+            bitmap ^= lowest
+        return names
+
+
+class SymbolTable:
+    """
+    Module level names bound by the nodes of one change set, built once per change set.
+    definitions maps every name to its defining nodes. Statements (x = 1, x += 1, a, *b = ..., (y := 2))
+    bind at module level, functions only through names they declare global.
+    """
+
+    def __init__(self, nodes, index=None):
+        self.index = index if index is not None else SymbolIndex()
+        self.definitions = {}
+        statement_bound = set()
+
+        for node in nodes:
+            for name in statement_names(node):
+                self._add(name, node)
+                statement_bound.add(name)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                for name in global_names(node):
+                    self._add(name, node)
+
+        self._statement_bound = statement_bound
+        self._bitmap = None
+        self._statement_bitmap = None
+
+    def _add(self, name, node):
+        name = self.index.names[self.index.bit(name)]
+        nodes = self.definitions.setdefault(name, [])
+        if not nodes or nodes[-1] is not node:
+            nodes.append(node)
+
+    @property
+    def bitmap(self):
+        """Bit set of all bound names (bit positions from the SymbolIndex)."""
+        if self._bitmap is None:
+            self._bitmap = self.index.bitmap(self.definitions)
+        return self._bitmap
+
+    @property
+    def statement_bitmap(self):
+        """Bit set of the names bound by statements, not only inside functions."""
+        if self._statement_bitmap is None:
+            self._statement_bitmap = self.index.bitmap(self._statement_bound)
+        return self._statement_bitmap
+
+    def __contains__(self, name):
+        return name in self.definitions
+
+    def collisions(self, other):
+        """
+        Names bound in both tables, both need the same SymbolIndex.
+        Two functions writing the same global don't collide, at least one side has to bind it as a statement.
+        """
+        bitmap = (self.statement_bitmap & other.bitmap) | (
+            self.bitmap & other.statement_bitmap)
+        return self.index.names_of(bitmap)
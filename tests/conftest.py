@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES_DIR = os.path.join(ROOT, "code_examples_for_AST_tool_testing")
+
+sys.path.insert(0, ROOT)
+
+# the tests never write to the tool's log directory or the user's merge cache
+os.environ.setdefault("AST_MERGE_LOG_DIR", tempfile.mkdtemp(prefix="ast_merge_logs_"))
+os.environ["AST_MERGE_CACHE"] = "0"
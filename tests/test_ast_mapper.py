@@ -0,0 +1,59 @@
+import ast
+import random
+
+import pytest
+
+import ast_mapper
+
+
+def statements(names):
+    return ast.parse("".join(f"{name} = 1\n" for name in names)).body
+
+
+def random_sides(seed, size):
+    """Two edited copies of one sequence, with repeated statements that can't be anchors."""
+    rng = random.Random(seed)
+    base = [f"name{rng.randrange(size)}" if rng.random() < 0.2 else f"unique{i}" for i in range(size)]
+    sides = []
+    for _ in range(2):
+        side = list(base)
+        for _ in range(size // 10):
+            position = rng.randrange(len(side))
+            action = rng.random()
+            if action < 0.4:
+                del side[position]
+            elif action < 0.8:
+                side.insert(position, f"added{rng.randrange(size * 10)}")
+            else:
+                side.insert(rng.randrange(len(side)), side.pop(position))
+        sides.append(statements(side))
+    return sides
+
+
+def matched_names(nodes_left, nodes_right, numpy=None):
+    sequences = [ast_mapper.FingerprintSequence(nodes, numpy) for nodes in (nodes_left, nodes_right)]
+    return [(nodes_left[left].targets[0].id, nodes_right[right].targets[0].id)
+            for left, right in ast_mapper.match_sequences(*sequences)]
+
+
+def test_matches_are_ordered_and_equal():
+    nodes_left, nodes_right = random_sides(1, 300)
+    matches = ast_mapper.match_sequences(*[ast_mapper.FingerprintSequence(nodes)
+                                           for nodes in (nodes_left, nodes_right)])
+    assert all(a[0] < b[0] and a[1] < b[1] for a, b in zip(matches, matches[1:]))
+    assert all(ast.dump(nodes_left[left]) == ast.dump(nodes_right[right]) for left, right in matches)
+
+
+def test_moved_statement_keeps_the_longer_run():
+    nodes_left = statements(["a", "b", "c", "d", "e", "f", "g"])
+    nodes_right = statements(["b", "c", "d", "e", "f", "g", "a"])
+    assert [left for left, _ in matched_names(nodes_left, nodes_right)] == ["b", "c", "d", "e", "f", "g"]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_numpy_and_lists_match_the_same(seed, monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    # every gap takes the NumPy path, not just the long ones
+    monkeypatch.setattr(ast_mapper, "NUMPY_MIN_NODES", 1)
+    nodes_left, nodes_right = random_sides(seed, 200)
+    assert matched_names(nodes_left, nodes_right, numpy) == matched_names(nodes_left, nodes_right)
@@ -0,0 +1,22 @@
+import json
+import subprocess
+import sys
+import zipfile
+
+import build_bundle
+
+
+def test_bundle_runs_the_tool(tmp_path):
+    bundle = build_bundle.build_bundle(str(tmp_path / "ast_merge_tool.pyz"))
+    with zipfile.ZipFile(bundle) as archive:
+        names = set(archive.namelist())
+    assert {"__main__.pyc", "ast_merge_tool.pyc", "ast_merge_tool.py"} <= names
+    assert not names & {"benchmark.py", "corpus.py", "build_bundle.py"}
+
+    paths = []
+    for name, text in (("base.py", "A = 1\n"), ("local.py", "A = 1\nB = 2\n"), ("remote.py", "A = 1\nC = 3\n")):
+        (tmp_path / name).write_text(text)
+        paths.append(str(tmp_path / name))
+    result = subprocess.run([sys.executable, bundle, *paths, "--check"], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.splitlines()[-1])["mergeable"]
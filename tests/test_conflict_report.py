@@ -0,0 +1,43 @@
+import ast
+import json
+
+import conflict_report
+from source_text import SourceText
+
+
+def conflict(source="x = (1 +\n     2)\n"):
+    node = ast.parse(source).body[0]
+    return conflict_report.Conflict(conflict_report.ASSIGNMENT_COLLISION, "x", "Both sides assign x",
+                                    local_nodes=[node])
+
+
+def test_report_is_mergeable_without_conflicts():
+    report = conflict_report.ConflictReport()
+    assert not report
+    assert report.to_dict()["mergeable"]
+
+
+def test_conflicts_have_spans_and_code_only_on_request():
+    report = conflict_report.ConflictReport()
+    report.sources[conflict_report.LOCAL] = SourceText("x = (1 +\n     2)\n")
+    report.add(conflict())
+
+    entry = report.to_dict()["conflicts"][0]
+    assert entry["nodes"] == [{"side": "local", "lineno": 1, "end_lineno": 2,
+                               "col_offset": 0, "end_col_offset": 7}]
+    # the code is sliced from the source, its formatting is kept
+    assert report.to_dict(include_code=True)["conflicts"][0]["nodes"][0]["code"] == "x = (1 +\n     2)"
+
+
+def test_summary():
+    assert conflict().summary() == "[assignment_collision] 'x': Both sides assign x (local line 1-2)"
+
+
+def test_stored_report_round_trip():
+    report = conflict_report.ConflictReport()
+    report.add(conflict())
+
+    restored = conflict_report.ConflictReport()
+    restored.extend_from_json(report.to_json())
+    assert json.loads(restored.to_json()) == json.loads(report.to_json())
+    assert restored.conflicts[0].summary() == report.conflicts[0].summary()
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+
+import corpus
+
+
+def git(repo, *args):
+    return subprocess.run(["git", "-C", str(repo), "-c", "user.name=test", "-c", "user.email=test@example.com",
+                           *args], check=True, capture_output=True)
+
+
+def commit_files(repo, files, message):
+    for name, text in files.items():
+        (repo / name).write_text(text)
+    git(repo, "add", "--", *files)
+    git(repo, "commit", "-q", "-m", message)
+
+
+def merged_repo(tmp_path, committed):
+    """A merge commit whose parents both changed mod.py, committed with the given mod.py."""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    commit_files(repo, {"mod.py": "A = 1\n", "notes.txt": "a\n"}, "base")
+    git(repo, "checkout", "-q", "-b", "other")
+    commit_files(repo, {"mod.py": "A = 1\nB = 2\n", "notes.txt": "b\n"}, "other")
+    git(repo, "checkout", "-q", "main")
+    commit_files(repo, {"mod.py": "A = 1\nC = 3\n", "notes.txt": "c\n"}, "main")
+    # conflicts, the resolution is committed below
+    subprocess.run(["git", "-C", str(repo), "-c", "user.name=test", "-c", "user.email=test@example.com",
+                    "merge", "-q", "other"], capture_output=True)
+    commit_files(repo, {"mod.py": committed, "notes.txt": "b\nc\n"}, "merge")
+    return repo
+
+
+def test_mine_and_replay(tmp_path):
+    # local (the first parent) comes first
+    repo = merged_repo(tmp_path, "A = 1\nC = 3\nB = 2\n")
+    corpus_dir = tmp_path / "corpus"
+    assert corpus.mine(str(repo), str(corpus_dir)) == 1
+
+    case_dir, = corpus.case_dirs(str(corpus_dir))
+    assert sorted(os.listdir(case_dir)) == sorted(corpus.CASE_FILES + (corpus.CASE_INFO,))
+    with open(os.path.join(case_dir, "local.py"), encoding="utf-8") as f:
+        assert f.read() == "A = 1\nC = 3\n"
+    with open(os.path.join(case_dir, corpus.CASE_INFO), encoding="utf-8") as f:
+        assert json.load(f)["path"] == "mod.py"
+
+    summary = corpus.replay(str(corpus_dir))
+    assert (summary["cases"], summary["auto_merged"], summary["mismatches"]) == (1, 1, [])
+
+
+def test_replay_reports_a_different_committed_result(tmp_path):
+    repo = merged_repo(tmp_path, "A = 1\nB = 2\nC = 3\nD = 4\n")
+    corpus_dir = tmp_path / "corpus"
+    corpus.mine(str(repo), str(corpus_dir))
+    assert len(corpus.replay(str(corpus_dir))["mismatches"]) == 1
+
+
+def test_same_result_ignores_formatting():
+    assert corpus.same_result(b"a = [1,\n     2]  # comment\n", b"a = [1, 2]\n")
+    assert not corpus.same_result(b"a = 1\n", b"a = 2\n")
+    assert corpus.same_result(b"a = (\n", b"a = (\n")
+
+
+def test_percentile():
+    assert corpus.percentile([4, 1, 3, 2], 50) == 2
+    assert corpus.percentile([4, 1, 3, 2], 99) == 4
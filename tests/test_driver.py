@@ -0,0 +1,197 @@
+import ast_merge_tool
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_bytes(text.encode())
+    return str(path)
+
+
+def run_driver(tmp_path, base, local, remote, path_name="mod.py"):
+    paths = [write(tmp_path, name, text) for name, text in
+             (("base", base), ("local", local), ("remote", remote))]
+    exit_code = ast_merge_tool.driver_main(paths + [path_name])
+    with open(paths[1], "rb") as f:
+        return exit_code, f.read().decode()
+
+
+def test_clean_ast_merge_is_written_in_place(tmp_path):
+    exit_code, merged = run_driver(tmp_path, "A = 1\n", "A = 1\nB = 2\n", "A = 1\nC = 3\n")
+    assert exit_code == 0
+    assert merged == "A = 1\nB = 2\nC = 3\n"
+
+
+def test_remote_without_changes_keeps_local(tmp_path):
+    exit_code, merged = run_driver(tmp_path, "A = 1\n", "A = 2\n", "A = 1\n")
+    assert (exit_code, merged) == (0, "A = 2\n")
+
+
+def test_non_python_files_are_merged_line_based(tmp_path):
+    exit_code, merged = run_driver(tmp_path, "a\nb\nc\n", "A\nb\nc\n", "a\nb\nC\n", "notes.txt")
+    assert (exit_code, merged) == (0, "A\nb\nC\n")
+
+
+def test_conflicts_are_left_as_markers(tmp_path):
+    exit_code, merged = run_driver(tmp_path, "A = 1\n", "A = 2\n", "A = 3\n")
+    assert exit_code == 1
+    assert "<<<<<<< LOCAL" in merged and ">>>>>>> REMOTE" in merged
+
+
+def test_syntax_errors_fall_back_to_the_line_merge(tmp_path):
+    exit_code, merged = run_driver(tmp_path, "a = (\n", "a = (\nb\n", "a = (\n")
+    assert (exit_code, merged) == (0, "a = (\nb\n")
+
+
+def test_missing_arguments():
+    assert ast_merge_tool.driver_main(["only-base"]) == 1
+
+
+def test_inputs_are_closed_before_the_output_is_written(tmp_path, monkeypatch):
+    opened = []
+    read_inputs = ast_merge_tool.read_inputs
+
+    def tracking_read_inputs(file_paths, label=None):
+        buffers = read_inputs(file_paths, label)
+        opened.extend(buffers)
+        return buffers
+
+    def checking_write_output(file_path, content):
+        assert all(buffer._mmap is None for buffer in opened)
+        write_output(file_path, content)
+
+    write_output = ast_merge_tool.write_output
+    monkeypatch.setattr(ast_merge_tool, "read_inputs", tracking_read_inputs)
+    monkeypatch.setattr(ast_merge_tool, "write_output", checking_write_output)
+    exit_code, merged = run_driver(tmp_path, "A = 1\n", "A = 1\nB = 2\n", "A = 1\nC = 3\n")
+    assert exit_code == 0 and opened
+
+
+def test_content_label_reuses_the_digests_of_the_mapped_inputs(tmp_path):
+    from input_buffer import ContentLabel, InputBuffer
+
+    paths = [write(tmp_path, name, name + "\n") for name in ("base", "local", "remote")]
+    label = ContentLabel(paths)
+    with InputBuffer.from_file(paths[1]) as buffer:
+        label.add_buffers([buffer])
+        digest = buffer.digest()
+    # the file changes after it was read, the label keeps the content that was merged
+    write(tmp_path, "local", "changed\n")
+    parts = str(label).split("-")
+    assert len(parts) == 3 and parts[1] == digest.hex()[:12]
+
+
+def test_instrumented_runs_pass_the_label_to_the_driver(tmp_path):
+    paths = [write(tmp_path, name, text) for name, text in
+             (("base", "A = 1\n"), ("local", "A = 1\nB = 2\n"), ("remote", "A = 1\nC = 3\n"))]
+    labels = []
+
+    def labelled_driver(argv, label=None):
+        labels.append(label)
+        return ast_merge_tool.driver_main(argv, label=label)
+
+    metrics_file = str(tmp_path / "metrics.jsonl")
+    assert ast_merge_tool.run_instrumented(paths, labelled_driver, paths, metrics_file=metrics_file) == 0
+    # every input was mapped once by the driver, the label never hashes them again
+    assert sorted(labels[0].digests) == sorted(paths)
+
+
+def test_merge_over_budget_is_merged_line_based(tmp_path, monkeypatch):
+    import merge_budget
+
+    # both sides add a line at the end: the AST merge keeps both, the line merge conflicts
+    monkeypatch.setattr(merge_budget, "MAX_NODES", 5)
+    exit_code, merged = run_driver(tmp_path, "A = 1\n", "A = 1\nB = 2\n", "A = 1\nC = 3\n")
+    assert exit_code == 1
+    assert "<<<<<<< LOCAL" in merged
+
+    monkeypatch.setattr(merge_budget, "MAX_NODES", 0)
+    exit_code, merged = run_driver(tmp_path, "A = 1\n", "A = 1\nB = 2\n", "A = 1\nC = 3\n")
+    assert (exit_code, merged) == (0, "A = 1\nB = 2\nC = 3\n")
+
+
+def run_check(tmp_path, capsys, base, local, remote, merged=None):
+    import json
+
+    import conflict_report
+
+    paths = [write(tmp_path, name, text) for name, text in
+             (("base.py", base), ("local.py", local), ("remote.py", remote))]
+    argv = paths + ([merged] if merged else []) + ["--check"]
+    report = conflict_report.ConflictReport()
+    exit_code = ast_merge_tool.check_main(ast_merge_tool.parse_arguments(argv), report)
+    return exit_code, json.loads(capsys.readouterr().out), report
+
+
+def test_check_of_a_clean_merge(tmp_path, capsys):
+    merged = str(tmp_path / "merged.py")
+    exit_code, verdict, _ = run_check(tmp_path, capsys, "A = 1\n", "A = 1\nB = 2\n", "A = 1\nC = 3\n", merged)
+    assert exit_code == 0
+    assert verdict == {"path": str(tmp_path / "local.py"), "mergeable": True, "method": "ast", "conflicts": []}
+    assert not (tmp_path / "merged.py").exists()
+
+
+def test_check_of_a_conflict(tmp_path, capsys):
+    merged = str(tmp_path / "merged.py")
+    exit_code, verdict, _ = run_check(tmp_path, capsys, "A = 1\n", "A = 2\n", "A = 3\n", merged)
+    assert exit_code == ast_merge_tool.EXIT_NOT_MERGEABLE == 3
+    assert not verdict["mergeable"] and verdict["method"] == "ast"
+    assert verdict["conflicts"] == ["[assignment_collision] 'A': Variable is assigned in LEFT (Local) "
+                                    "and RIGHT (Remote) (local line 1, remote line 1)"]
+    assert not (tmp_path / "merged.py").exists()
+
+
+def test_check_of_trivial_inputs(tmp_path, capsys):
+    exit_code, verdict, _ = run_check(tmp_path, capsys, "A = 1\n", "A = 2\n", "A = 1\n")
+    assert (exit_code, verdict["method"], verdict["mergeable"]) == (0, "trivial", True)
+
+
+def test_check_uses_a_cached_result(tmp_path, capsys, monkeypatch):
+    import conflict_report
+    import merge_cache
+    from input_buffer import InputBuffer
+
+    cache = merge_cache.MergeCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(merge_cache, "open_cache", lambda: cache)
+    texts = (("base.py", "A = 1\n"), ("local.py", "A = 2\n"), ("remote.py", "A = 3\n"))
+    digests = []
+    for name, text in texts:
+        with InputBuffer.from_file(write(tmp_path, name, text)) as buffer:
+            digests.append(buffer.digest())
+    stored = conflict_report.ConflictReport()
+    stored.add(conflict_report.Conflict(conflict_report.ASSIGNMENT_COLLISION, "A", "stored"))
+    cache.put(merge_cache.cache_key(*digests), merge_cache.STATUS_CONFLICT, report=stored.to_json())
+
+    exit_code, verdict, _ = run_check(tmp_path, capsys, *(text for _, text in texts))
+    assert (exit_code, verdict["method"]) == (3, "cached")
+    assert verdict["conflicts"] == ["[assignment_collision] 'A': stored"]
+    cache.close()
+
+
+def test_check_over_budget_is_decided_line_based(tmp_path, capsys, monkeypatch):
+    import merge_budget
+
+    monkeypatch.setattr(merge_budget, "MAX_NODES", 5)
+    exit_code, verdict, _ = run_check(tmp_path, capsys, "A = 1\n", "A = 1\nB = 2\n", "A = 1\nC = 3\n")
+    assert (exit_code, verdict["method"]) == (3, "line")
+    assert verdict["conflicts"][0].startswith("[budget_exceeded]")
+
+    exit_code, verdict, _ = run_check(tmp_path, capsys, "A = 1\nX = 0\nB = 1\n", "A = 2\nX = 0\nB = 1\n",
+                                      "A = 1\nX = 0\nB = 2\n")
+    assert (exit_code, verdict["method"], verdict["conflicts"]) == (0, "line", [])
+
+
+def test_check_stops_at_the_first_conflict(tmp_path, capsys):
+    import conflict_report
+    import parser
+
+    # two collisions and a referenced deleted function, the full merge reports all three
+    base, local, remote = ("A = 1\nB = 1\n\n\ndef f():\n    pass\n", "A = 2\nB = 2\n",
+                           "A = 3\nB = 3\nC = f()\n\n\ndef f():\n    pass\n")
+    full = conflict_report.ConflictReport()
+    trees = [parser.parse_python_code(text) for text in (base, local, remote)]
+    assert ast_merge_tool.run_ast_merge(*trees, report=full) is None
+    assert len(full) == 3
+
+    exit_code, verdict, report = run_check(tmp_path, capsys, base, local, remote)
+    assert exit_code == 3
+    assert len(report) == 1 and verdict["conflicts"] == [full.conflicts[0].summary()]
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+import merge_api
+from conftest import EXAMPLES_DIR
+
+# Example folders that can't be merged automatically, their merged_output.py (if any) is outdated
+EXPECTED_CONFLICTS = {
+    "assignment_collision_unpacking",
+    "augmented_assignment_not_merged",
+    "changset_test",
+    "conflicting_function_names",
+    "deleted_fun_test_with_new_references",
+    "literal_dict_duplicate_keys",
+    "literal_list_conflicting_edits",
+    "simple_constants_test_with_conflicts",
+    "simple_import_test_with_syntx_error",
+    "test_function_merging",
+    "unsupported_nodes_test",
+}
+
+EXAMPLES = sorted(name for name in os.listdir(EXAMPLES_DIR)
+                  if os.path.isfile(os.path.join(EXAMPLES_DIR, name, "base.py")))
+
+
+def read(example, file_name):
+    with open(os.path.join(EXAMPLES_DIR, example, file_name), "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("example", EXAMPLES)
+def test_example(example):
+    result = merge_api.merge_sources(read(example, "base.py"), read(example, "local.py"),
+                                     read(example, "remote.py"), merge_api.MergeOptions(path_name="example.py"))
+    if example in EXPECTED_CONFLICTS:
+        assert not result.clean
+        assert result.conflicts
+    else:
+        assert result.clean, result.to_dict()
+        assert result.merged == read(example, "merged_output.py")
@@ -0,0 +1,66 @@
+import ast
+
+import fingerprint
+from source_text import SourceText
+
+
+def statement(source):
+    return ast.parse(source).body[0]
+
+
+def test_fingerprints_ignore_positions_not_structure():
+    assert fingerprint.node_fingerprint(statement("a = f(1)")) == \
+        fingerprint.node_fingerprint(ast.parse("\n\nif x:\n    a = f( 1 )\n").body[0].body[0])
+    assert fingerprint.node_fingerprint(statement("a = f(1)")) != fingerprint.node_fingerprint(statement("a = f(2)"))
+    assert fingerprint.node_fingerprint(statement("a = '1'")) != fingerprint.node_fingerprint(statement("a = 1"))
+
+
+def test_deep_nesting_does_not_recurse():
+    tree = ast.Constant(1)
+    for _ in range(5000):
+        tree = ast.UnaryOp(ast.USub(), tree)
+    assert len(fingerprint.node_fingerprint(tree)) == fingerprint.FINGERPRINT_SIZE
+
+
+def test_summary_of_a_module():
+    summary = fingerprint.summarize_source("import os\n\n@decorator\ndef f():\n    pass\n")
+    assert summary.kinds == ["Import", "FunctionDef"]
+    assert summary.names == [None, "f"]
+    # the decorator belongs to the function
+    assert summary.line_range(1) == (3, 5)
+    assert summary.fingerprint(0) == fingerprint.node_fingerprint(statement("import os"))
+    assert fingerprint.summarize_source("def f(:\n") is None
+
+
+def test_tree_builder_parses_only_the_needed_statements():
+    text = "a = 1\nb = 2; c = 3\n\n\ndef f():\n    return a\n"
+    builder = fingerprint.TreeBuilder(fingerprint.summarize_source(text), SourceText(text))
+    tree = builder.build([False, False, True, False])
+
+    # statements sharing a line are parsed together
+    assert [type(node).__name__ for node in tree.body] == ["LazyStatement", "Assign", "Assign", "LazyStatement"]
+    function = fingerprint.materialize(tree.body[3])
+    assert function.lineno == 5 and ast.unparse(function) == "def f():\n    return a"
+    assert fingerprint.is_lazy_function(tree.body[3])
+    assert fingerprint.node_fingerprint(tree.body[0]) == fingerprint.node_fingerprint(statement("a = 1"))
+
+
+def test_parse_lazily_rebuilds_local_and_the_new_remote_statements():
+    texts = ("A = 1\n\n\ndef f():\n    pass\n", "A = 2\n\n\ndef f():\n    pass\n", "import os\nA = 1\nB = 2\n")
+    base, local, remote = fingerprint.parse_lazily([SourceText(text) for text in texts])
+    assert all(isinstance(node, fingerprint.LazyStatement) for node in base.body)
+    assert ast.dump(local) == ast.dump(ast.parse(texts[1]))
+    assert [type(node).__name__ for node in remote.body] == ["Import", "Assign", "Assign"]
+
+    assert fingerprint.parse_lazily([SourceText(text) for text in ("a = 1\n", "def f(:\n", "")]) == [None] * 3
+
+
+def test_interned_trees_share_equal_subtrees():
+    texts = ("def f():\n    return g(1) + 2\n", "def f():\n    return g(1) + 3\n", "x = g(1)\n")
+    base, local, remote = fingerprint.intern_trees(*[ast.parse(text) for text in texts])
+    call_local = local.body[0].body[0].value.left
+    assert base.body[0].body[0].value.left is call_local
+    assert remote.body[0].value is call_local
+    # the top-level statements keep their own nodes and positions
+    assert base.body[0] is not local.body[0]
+    assert ast.unparse(base) == texts[0].rstrip("\n")
@@ -0,0 +1,47 @@
+import ast
+
+import function_stmt_handler
+
+
+def functions(source):
+    return ast.parse(source).body
+
+
+def test_decisions_evict_the_least_recently_used():
+    decisions = function_stmt_handler.FunctionMergeDecisions(max_entries=2)
+    decisions.put(b"a", (True, None))
+    decisions.put(b"b", (True, None))
+    assert decisions.get(b"a") == (True, None)
+
+    decisions.put(b"c", (False, "Conflict"))
+    assert list(decisions.decisions) == [b"a", b"c"]
+    assert decisions.get(b"b") is None
+
+
+def test_store_is_asked_on_a_miss():
+    class Store:
+        def __init__(self):
+            self.stored = {}
+
+        def get_function_merge(self, key):
+            return self.stored.get(key)
+
+        def put_function_merge(self, key, safe, reason):
+            self.stored[key] = (safe, reason)
+
+    store = Store()
+    function_stmt_handler.FunctionMergeDecisions(store).put(b"pair", (False, "Conflict"))
+    assert function_stmt_handler.FunctionMergeDecisions(store).get(b"pair") == (False, "Conflict")
+
+
+def test_safe_bodies_are_concatenated():
+    left, right = functions("def f():\n    a = 1\n\n\ndef f():\n    b = 2\n")
+    safe, body = function_stmt_handler.attempt_function_merge(left, right)
+    assert safe
+    assert [statement.targets[0].id for statement in body] == ["a", "b"]
+
+
+def test_variable_collisions_are_not_merged():
+    left, right = functions("def f():\n    a = 1\n\n\ndef f():\n    a = 2\n")
+    assert function_stmt_handler.attempt_function_merge(left, right) == (
+        False, "Conflict: Variable collision detected between branches.")
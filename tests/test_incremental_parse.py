@@ -0,0 +1,110 @@
+import ast
+
+import pytest
+
+import incremental_parse
+from source_text import SourceText
+
+BASE = '''"""Module docstring."""
+import os
+
+
+@decorator
+def first(x):
+    return x
+
+
+TEXT = """
+not a statement
+"""
+VALUES = [
+    1,
+    2,
+]
+if os.name == "nt":
+    SEP = "\\\\"
+else:
+    SEP = "/"
+
+
+class Thing:
+    pass
+'''
+
+
+def dump(tree):
+    # statements taken over from base share their subtrees with it, only the statements themselves are moved
+    positions = [(node.lineno, node.col_offset, node.end_lineno, node.end_col_offset) for node in tree.body]
+    return ast.dump(tree), positions
+
+
+def parse(base, other):
+    parser = incremental_parse.IncrementalParser(SourceText(base))
+    return parser, parser.parse(SourceText(other))
+
+
+@pytest.mark.parametrize("other", [
+    BASE,
+    BASE.replace("return x", "return x + 1"),
+    "# new header\n\n" + BASE,
+    BASE + "\n\ndef added():\n    pass\n",
+    BASE.replace("class Thing", "class Renamed"),
+    BASE.replace('not a statement', 'def fake():\n    pass'),
+    BASE.replace("\n", "\r\n"),
+    BASE.replace("    2,\n]", "    2,\n    3,\n]"),
+])
+def test_same_tree_as_a_full_parse(other):
+    _, tree = parse(BASE, other)
+    assert dump(tree) == dump(ast.parse(other))
+
+
+def test_only_changed_chunks_are_parsed():
+    other = BASE.replace("return x", "return x + 1")
+    parser, _ = parse(BASE, other)
+    assert parser.parsed == 1
+    assert parser.reused > 1
+
+
+def test_moved_statements_get_their_new_lines():
+    other = "X = 0\n" + BASE
+    _, tree = parse(BASE, other)
+    first = next(node for node in tree.body if isinstance(node, ast.FunctionDef))
+    assert first.lineno == ast.parse(other).body[3].lineno
+    # base keeps its positions
+    parser = incremental_parse.IncrementalParser(SourceText(BASE))
+    base_first = next(node for node in parser.base_tree.body if isinstance(node, ast.FunctionDef))
+    parser.parse(SourceText(other))
+    assert base_first.lineno == 6
+
+
+def test_syntax_errors():
+    _, tree = parse(BASE, BASE + "\ndef broken(:\n")
+    assert tree is None
+    parser = incremental_parse.IncrementalParser(SourceText("def broken(:\n"))
+    assert parser.base_tree is None
+
+
+def test_kept_chunks_are_reused_on_the_next_parse():
+    parser = incremental_parse.IncrementalParser(SourceText(BASE))
+    first = BASE + "\ndef added():\n    pass\n"
+    parser.parse(SourceText(first), keep=True)
+    parsed = parser.parsed
+
+    second = first.replace("return x", "return x * 2")
+    tree = parser.parse(SourceText(second), keep=True)
+    # only the edited function, the function added before is kept
+    assert parser.parsed - parsed == 1
+    assert dump(tree) == dump(ast.parse(second))
+
+
+def test_parse_incrementally_falls_back_to_full_parses():
+    sources = [SourceText(text) for text in ("def broken(:\n", "A = 1\n", "A = 2\n")]
+    base_tree, local_tree, remote_tree = incremental_parse.parse_incrementally(sources)
+    assert base_tree is None
+    assert dump(local_tree) == dump(ast.parse("A = 1\n"))
+    assert dump(remote_tree) == dump(ast.parse("A = 2\n"))
+
+
+def test_chunk_lines():
+    chunks = incremental_parse.chunk_lines(SourceText("@d\ndef f():\n    pass\n# c\nX = (\n    1\n)\n"))
+    assert [(chunk.start_line, chunk.end_line) for chunk in chunks] == [(1, 3), (5, 7)]
@@ -0,0 +1,53 @@
+import hashlib
+
+from input_buffer import ContentLabel, InputBuffer
+
+
+def test_file_is_mapped_and_decoded_once(tmp_path):
+    path = tmp_path / "mod.py"
+    path.write_bytes(b"# -*- coding: latin-1 -*-\ns = '\xe4'\n")
+    with InputBuffer.from_file(str(path)) as buffer:
+        assert buffer._mmap is not None
+        assert buffer.encoding == "iso-8859-1"
+        assert buffer.text is buffer.text
+        assert buffer.text.endswith("s = '\xe4'\n")
+        assert buffer.source.text is buffer.text
+    assert buffer._mmap is None
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.py"
+    path.write_bytes(b"")
+    with InputBuffer.from_file(str(path)) as buffer:
+        assert buffer.size == 0 and buffer.text == ""
+
+
+def test_equality_by_content():
+    assert InputBuffer.from_bytes(b"a = 1\n") == InputBuffer.from_text("a = 1\n")
+    assert InputBuffer.from_bytes(b"a = 1\n") != InputBuffer.from_bytes(b"a = 2\n")
+
+
+def test_close_with_slices_in_use(tmp_path):
+    path = tmp_path / "mod.py"
+    path.write_bytes(b"a = 1\n")
+    buffer = InputBuffer.from_file(str(path))
+    head = buffer.slice(0, 1)
+    buffer.close()
+    assert bytes(head) == b"a"
+
+
+def test_content_label_reuses_the_digests(tmp_path, monkeypatch):
+    paths = []
+    for name, text in (("base", b"a\n"), ("local", b"b\n"), ("remote", b"c\n")):
+        (tmp_path / name).write_bytes(text)
+        paths.append(str(tmp_path / name))
+
+    label = ContentLabel(paths)
+    label.add_buffers([InputBuffer.from_file(paths[0]), InputBuffer.from_file(paths[1])])
+    opened = []
+    from_file = InputBuffer.from_file
+    monkeypatch.setattr(InputBuffer, "from_file", lambda path: opened.append(path) or from_file(path))
+
+    assert str(label) == "-".join(hashlib.sha256(text).hexdigest()[:12] for text in (b"a\n", b"b\n", b"c\n"))
+    # only the input that was never mapped is read again
+    assert opened == [paths[2]]
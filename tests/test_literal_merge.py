@@ -0,0 +1,95 @@
+import ast
+
+import literal_merge
+
+
+def merge(base, local, remote):
+    nodes = [ast.parse(code).body[0] for code in (base, local, remote)]
+    merged = literal_merge.merge_literal_assignment(*nodes)
+    return None if merged is None else ast.unparse(merged)
+
+
+def test_clean_add_add():
+    assert merge("X = [1, 2]", "X = [1, 2, 3]", "X = [0, 1, 2]") == "X = [0, 1, 2, 3]"
+    assert merge("D = {'a': 1}", "D = {'a': 1, 'b': 2}", "D = {'a': 1, 'c': 3}") == "D = {'a': 1, 'b': 2, 'c': 3}"
+
+
+def test_add_add_at_the_same_position():
+    # independent insertions: local ones first, an element added on both sides only once
+    assert merge("X = [1, 9]", "X = [1, 2, 3, 9]", "X = [1, 3, 4, 9]") == "X = [1, 2, 3, 4, 9]"
+
+
+def test_conflicting_edits_of_the_same_element():
+    assert merge("X = [1, 2, 3]", "X = [1, 20, 3]", "X = [1, 30, 3]") is None
+    assert merge("D = {'a': 1}", "D = {'a': 2}", "D = {'a': 3}") is None
+    # the same edit on both sides is no conflict
+    assert merge("X = [1, 2, 3]", "X = [1, 20, 3]", "X = [1, 20, 3, 4]") == "X = [1, 20, 3, 4]"
+
+
+def test_edit_against_removal():
+    assert merge("D = {'a': 1, 'b': 2}", "D = {'b': 2}", "D = {'a': 5, 'b': 2}") is None
+    assert merge("D = {'a': 1, 'b': 2}", "D = {'b': 2}", "D = {'a': 1, 'b': 3}") == "D = {'b': 3}"
+
+
+def test_reordering():
+    assert merge("X = ['a', 'b', 'c', 'd']", "X = ['d', 'a', 'b', 'c']",
+                 "X = ['a', 'e', 'b', 'c', 'd']") == "X = ['d', 'a', 'e', 'b', 'c']"
+    # dicts keep the order of local, entries added in remote follow their remote neighbour
+    assert merge("D = {'a': 1, 'b': 2}", "D = {'b': 2, 'a': 1}",
+                 "D = {'a': 1, 'x': 0, 'b': 2}") == "D = {'b': 2, 'a': 1, 'x': 0}"
+
+
+def test_duplicate_keys_are_not_merged():
+    assert merge("D = {'a': 1, 'a': 2}", "D = {'a': 1, 'a': 2, 'b': 3}", "D = {'a': 1, 'a': 2, 'c': 4}") is None
+
+
+def test_different_container_types_or_targets():
+    assert merge("X = [1]", "X = (1, 2)", "X = [1, 3]") is None
+    assert merge("X: list = [1]", "X: tuple = [1, 2]", "X: list = [1, 3]") is None
+
+
+def test_unchanged_ends():
+    assert literal_merge._unchanged_ends([[1, 2, 3, 4], [1, 5, 4], [1, 2, 6, 4]]) == (1, 1)
+    assert literal_merge._unchanged_ends([[1, 1], [1, 1, 1], [1, 1]]) == (2, 0)
+
+
+def merged_module(base, local, remote, prefix=""):
+    nodes = [ast.parse(code).body[0] for code in (base, local, remote)]
+    merged = literal_merge.merge_literal_assignment(*nodes)
+    return ast.Module(body=ast.parse(prefix).body + [merged], type_ignores=[])
+
+
+def test_only_merged_literals_are_written_multiline():
+    items = list(range(literal_merge.MULTILINE_MIN_ELEMENTS))
+    module = merged_module(f"X = {items}", f"X = {items + [100]}", f"X = {[-1] + items}",
+                           prefix=f"UNCHANGED = {items}\n")
+    code = literal_merge.unparse(module)
+    lines = code.splitlines()
+    assert lines[0] == f"UNCHANGED = {items}"
+    assert lines[1:3] == ["X = [", "    -1,"]
+    assert lines[-2:] == ["    100,", "]"]
+    assert ast.dump(ast.parse(code)) == ast.dump(ast.parse(ast.unparse(module)))
+
+
+def test_unparse_keeps_placeholder_like_text():
+    items = list(range(literal_merge.MULTILINE_MIN_ELEMENTS))
+    text = "__ast_merge_literal_0__"
+    module = merged_module(f"X = {items}", f"X = {items + [100]}", f"X = {[-1] + items}",
+                           prefix=f"NAME = {text!r}\ndef f():\n    return {text!r}\n")
+    code = literal_merge.unparse(module)
+    assert code.count(text) == 2
+    assert ast.dump(ast.parse(code)) == ast.dump(ast.parse(ast.unparse(module)))
+
+
+def test_unparse_without_merged_literals_is_ast_unparse():
+    module = ast.parse("'''doc'''\nimport os\nX = 1\n@decorator\ndef f():\n    pass\nclass C:\n    pass\nY = [1]\n")
+    assert literal_merge.unparse(module) == ast.unparse(module.body)
+
+
+def test_unparse_joins_pieces_like_ast_unparse():
+    items = list(range(literal_merge.MULTILINE_MIN_ELEMENTS))
+    module = merged_module(f"X: list = {items}", f"X: list = {items + [100]}", f"X: list = {[-1] + items}")
+    module.body += ast.parse("def f():\n    pass\nY = 1\n").body
+    code = literal_merge.unparse(module)
+    assert code.startswith("X: list = [\n")
+    assert code.endswith("]\n\ndef f():\n    pass\nY = 1")
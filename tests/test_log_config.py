@@ -0,0 +1,115 @@
+import gzip
+import logging
+import multiprocessing
+import os
+
+import pytest
+
+import log_config
+
+
+def _record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+
+def _handler(path, **kwargs):
+    handler = log_config.RotatingLogHandler(str(path), **kwargs)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def _logged_lines(path):
+    lines = []
+    directory = os.path.dirname(path)
+    for name in os.listdir(directory):
+        if name.endswith(".gz"):
+            with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as f:
+                lines += f.read().splitlines()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            lines += f.read().splitlines()
+    return lines
+
+
+def test_rotates_at_the_size_limit(tmp_path):
+    path = tmp_path / "merge.log"
+    handler = _handler(path, max_bytes=100, backup_count=3, max_age_days=0)
+    for number in range(33):
+        handler.emit(_record(f"record {number:02d}"))
+    handler.close()
+
+    assert sorted(os.listdir(tmp_path)) == ["merge.log", "merge.log.1.gz", "merge.log.2.gz",
+                                            "merge.log.3.gz", "merge.log.lock"]
+    with gzip.open(tmp_path / "merge.log.1.gz", "rt", encoding="utf-8") as f:
+        newest_segment = f.read().splitlines()
+    with open(path, encoding="utf-8") as f:
+        assert int(newest_segment[-1].split()[1]) + 1 == int(f.read().split()[1])
+
+
+def test_handler_reopens_a_log_rotated_by_another_process(tmp_path):
+    path = tmp_path / "merge.log"
+    first = _handler(path, max_bytes=50, backup_count=5, max_age_days=0)
+    second = _handler(path, max_bytes=50, backup_count=5, max_age_days=0)
+    second.emit(_record("second, before the rotation"))
+    for number in range(5):
+        first.emit(_record(f"first {number}"))
+    assert os.path.exists(tmp_path / "merge.log.1.gz")
+
+    second.emit(_record("second, after the rotation"))
+    first.close()
+    second.close()
+    with open(path, encoding="utf-8") as f:
+        assert "second, after the rotation" in f.read()
+
+
+def test_a_rotation_that_is_no_longer_due_is_skipped(tmp_path):
+    path = tmp_path / "merge.log"
+    handler = _handler(path, max_bytes=1000, backup_count=5, max_age_days=0)
+    handler.emit(_record("small"))
+    handler.rotate()
+    handler.close()
+    assert not os.path.exists(tmp_path / "merge.log.1.gz")
+
+
+def _write_records(path, writer, count):
+    handler = _handler(path, max_bytes=2000, backup_count=1000, max_age_days=0)
+    for number in range(count):
+        handler.emit(_record(f"{writer} {number}"))
+    handler.close()
+
+
+@pytest.mark.skipif(log_config.fcntl is None or "fork" not in multiprocessing.get_all_start_methods(),
+                    reason="needs flock and fork")
+def test_concurrent_processes_lose_no_records(tmp_path):
+    path = str(tmp_path / "merge.log")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_write_records, args=(path, writer, 500)) for writer in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    lines = _logged_lines(path)
+    assert sorted(lines) == sorted(f"{writer} {number}" for writer in range(4) for number in range(500))
+
+
+def test_ring_buffer_keeps_the_records_of_each_thread_apart():
+    import threading
+
+    class Target(logging.Handler):
+        def __init__(self):
+            super().__init__(logging.DEBUG)
+            self.messages = []
+
+        def emit(self, record):
+            self.messages.append(record.getMessage())
+
+    target = Target()
+    buffer = log_config.RingBufferHandler([target], capacity=10)
+    buffer.handle(_record("main"))
+    thread = threading.Thread(target=lambda: (buffer.handle(_record("other")), buffer.clear()))
+    thread.start()
+    thread.join()
+    buffer.flush_to_targets()
+    assert target.messages == ["main"]
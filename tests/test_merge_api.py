@@ -0,0 +1,77 @@
+import signal
+import threading
+
+import pytest
+
+import merge_api
+
+BASE = "import os\n\nA = 1\n"
+LOCAL = "import os\nimport sys\n\nA = 1\n"
+REMOTE = "import os\n\nA = 1\nB = 2\n"
+
+
+def test_clean_merge_of_text():
+    result = merge_api.merge_sources(BASE, LOCAL, REMOTE)
+    assert result.clean and result.method == "ast"
+    assert isinstance(result.merged, str)
+    assert "import sys" in result.merged and "B = 2" in result.merged
+
+
+def test_bytes_in_bytes_out():
+    result = merge_api.merge_sources(BASE.encode(), LOCAL.encode(), REMOTE.encode())
+    assert result.clean and isinstance(result.merged, bytes)
+
+
+def test_trivial_merges():
+    assert merge_api.merge_sources(BASE, LOCAL, BASE).merged == LOCAL
+    assert merge_api.merge_sources(BASE, BASE, REMOTE).merged == REMOTE
+
+
+def test_conflicts_are_reported_not_raised():
+    result = merge_api.merge_sources("A = 1\n", "A = 2\n", "A = 3\n")
+    assert not result.clean
+    assert result.conflicts
+    report = result.to_dict(include_code=True)
+    assert report["clean"] is False and report["conflicts"]
+
+
+def test_mixed_input_types():
+    with pytest.raises(TypeError):
+        merge_api.merge_sources(BASE, LOCAL, 42)
+
+
+def test_no_signal_handler_or_timer_by_default(monkeypatch):
+    import merge_budget
+
+    installed = []
+    monkeypatch.setattr(merge_budget.signal, "signal", lambda *args: installed.append(args))
+    monkeypatch.setattr(merge_budget.signal, "setitimer", lambda *args: installed.append(args))
+    assert merge_api.merge_sources(BASE, LOCAL, REMOTE).clean
+    assert installed == []
+
+
+def test_the_timer_restores_the_handler_of_the_host():
+    previous = signal.getsignal(signal.SIGALRM)
+    options = merge_api.MergeOptions(max_seconds=60, timer=True)
+    assert merge_api.merge_sources(BASE, LOCAL, REMOTE, options).clean
+    assert signal.getsignal(signal.SIGALRM) is previous
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+
+
+def test_time_limit_falls_back_to_the_line_merge():
+    options = merge_api.MergeOptions(max_seconds=1e-9)
+    result = merge_api.merge_sources(BASE, LOCAL, REMOTE, options)
+    assert result.method == "line"
+    assert result.clean and result.merged == "import os\nimport sys\n\nA = 1\nB = 2\n"
+
+
+def test_merges_from_threads():
+    results = []
+    options = merge_api.MergeOptions(max_seconds=60, timer=True)
+    threads = [threading.Thread(target=lambda: results.append(merge_api.merge_sources(BASE, LOCAL, REMOTE, options)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 4 and all(result.clean for result in results)
@@ -0,0 +1,43 @@
+import pytest
+
+import merge_api
+import merge_budget
+
+
+def test_budget_exceeded_is_not_an_exception():
+    # a broad except Exception in the interrupted code must not swallow it
+    assert not issubclass(merge_budget.BudgetExceeded, Exception)
+
+
+def test_memory_is_measured_from_the_start_of_the_budget(monkeypatch):
+    memory = [5000.0]
+    monkeypatch.setattr(merge_budget, "memory_mb", lambda: memory[0])
+    budget = merge_budget.MergeBudget(max_memory_mb=100)
+    budget.check("parse")
+
+    memory[0] += 150
+    with pytest.raises(merge_budget.BudgetExceeded) as e:
+        budget.check("merge")
+    assert e.value.phase == "merge"
+
+
+def test_current_memory():
+    memory = merge_budget.current_memory_mb()
+    assert memory is None or memory > 0
+
+
+def test_node_limit(monkeypatch):
+    monkeypatch.setattr(merge_budget, "MAX_NODES", 10)
+    budget = merge_budget.MergeBudget()
+    with pytest.raises(merge_budget.BudgetExceeded):
+        budget.count_nodes(__import__("ast").parse("a = b + c\n" * 5))
+
+
+def test_merge_over_budget_falls_back_to_the_line_merge(monkeypatch):
+    monkeypatch.setattr(merge_budget, "MAX_NODES", 10)
+    base = "A = 1\nB = 2\nC = 3\n"
+    local = "A = 0\nB = 2\nC = 3\n"
+    remote = "A = 1\nB = 2\nC = 4\n"
+    result = merge_api.merge_sources(base, local, remote)
+    assert (result.clean, result.method) == (True, "line")
+    assert result.merged == "A = 0\nB = 2\nC = 4\n"
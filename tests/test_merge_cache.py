@@ -0,0 +1,98 @@
+import itertools
+
+import merge_cache
+
+
+def make_cache(tmp_path, monkeypatch, **limits):
+    clock = itertools.count(1_000_000)
+    monkeypatch.setattr(merge_cache.time, "time", lambda: float(next(clock)))
+    return merge_cache.MergeCache(str(tmp_path), **limits)
+
+
+def test_store_and_lookup(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch)
+    cache.put("merged", merge_cache.STATUS_MERGED, "a = 1\n")
+    cache.put("conflict", merge_cache.STATUS_CONFLICT, report='{"conflicts": []}')
+
+    assert cache.get("merged").merged == "a = 1\n"
+    assert cache.get("conflict").status == merge_cache.STATUS_CONFLICT
+    assert cache.get("missing") is None
+    cache.close()
+
+
+def test_evicts_the_least_recently_used_entries(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch, max_entries=2)
+    cache.put("a", merge_cache.STATUS_MERGED, "a\n")
+    cache.put("b", merge_cache.STATUS_MERGED, "b\n")
+    cache.get("a")
+    cache.put("c", merge_cache.STATUS_MERGED, "c\n")
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    cache.close()
+
+
+def test_evicts_by_total_size(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch, max_size_mb=1)
+    cache.put("old", merge_cache.STATUS_MERGED, "x" * 600_000)
+    cache.put("new", merge_cache.STATUS_MERGED, "y" * 600_000)
+
+    assert cache.get("old") is None
+    assert cache.get("new") is not None
+    cache.close()
+
+
+def test_evicts_by_age(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch, max_age_days=1)
+    cache.put("old", merge_cache.STATUS_MERGED, "a\n")
+    monkeypatch.setattr(merge_cache.time, "time", lambda: 1_000_000 + 2 * 24 * 3600.0)
+    cache.put("new", merge_cache.STATUS_MERGED, "b\n")
+
+    assert cache.get("old") is None
+    cache.close()
+
+
+def test_key_depends_on_the_tool_version_and_the_settings(monkeypatch):
+    digests = (b"base", b"local", b"remote")
+    key = merge_cache.cache_key(*digests)
+    assert merge_cache.cache_key(*digests) == key
+    assert merge_cache.cache_key(b"base", b"remote", b"local") != key
+
+    monkeypatch.setattr(merge_cache, "TOOL_VERSION", "0.0.0")
+    assert merge_cache.cache_key(*digests) != key
+    monkeypatch.undo()
+
+    import ast_mapper
+    monkeypatch.setattr(ast_mapper, "NUMPY_MIN_NODES", ast_mapper.NUMPY_MIN_NODES + 1)
+    assert merge_cache.cache_key(*digests) != key
+    monkeypatch.undo()
+
+    import autopep8
+    monkeypatch.setattr(autopep8, "__version__", "0.0.0")
+    assert merge_cache.cache_key(*digests) != key
+
+
+
+def test_function_merge_decisions(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch, max_entries=2)
+    assert cache.get_function_merge(b"pair") is None
+    cache.put_function_merge(b"pair", True, None)
+    cache.put_function_merge(b"other", False, "Conflict")
+    assert cache.get_function_merge(b"pair") == (True, None)
+    assert cache.get_function_merge(b"other") == (False, "Conflict")
+
+    cache.put_function_merge(b"third", True, None)
+    assert cache.get_function_merge(b"pair") is None
+
+
+def test_function_merges_table_of_an_older_version(tmp_path, monkeypatch):
+    import sqlite3
+
+    connection = sqlite3.connect(str(tmp_path / "merge_cache.sqlite3"))
+    connection.execute("CREATE TABLE function_merges (key TEXT PRIMARY KEY, safe INTEGER NOT NULL, "
+                       "reason TEXT, layout TEXT, last_used REAL NOT NULL)")
+    connection.close()
+
+    cache = make_cache(tmp_path, monkeypatch)
+    cache.put_function_merge(b"pair", True, None)
+    assert cache.get_function_merge(b"pair") == (True, None)
@@ -0,0 +1,62 @@
+import json
+
+import merge_budget
+import metrics
+import phases
+
+
+def _merge_like():
+    phases.mark("parse")
+    data = [bytes(1000) for _ in range(100)]
+    phases.mark("merge")
+    return len(data)
+
+
+def _budget_limits():
+    budget = merge_budget.MergeBudget(max_seconds=5, max_memory_mb=100)
+    return [budget.max_seconds, budget.max_memory_mb]
+
+
+def _read(metrics_file):
+    with open(metrics_file, encoding="utf-8") as f:
+        return json.loads(f.read().splitlines()[-1])
+
+
+def test_phase_times(tmp_path):
+    metrics_file = tmp_path / "metrics.jsonl"
+    assert metrics.run_measured(metrics_file, "label", False, _merge_like) == 100
+    record = _read(metrics_file)
+    assert record["result"] == 100
+    assert [entry["phase"] for entry in record["phases"]] == ["parse", "merge", phases.FINISH]
+    assert "net_kb" not in record["phases"][0]
+    assert "kept_sites" not in record
+
+
+def test_traced_memory_per_phase(tmp_path, monkeypatch):
+    snapshots = []
+    take_snapshot = metrics.PhaseMetrics._snapshot_now
+
+    def counting_snapshot(self):
+        snapshots.append(1)
+        return take_snapshot(self)
+
+    monkeypatch.setattr(metrics.PhaseMetrics, "_snapshot_now", counting_snapshot)
+    metrics_file = tmp_path / "metrics.jsonl"
+    metrics.run_measured(metrics_file, "label", True, _merge_like)
+
+    record = _read(metrics_file)
+    merge_phase = record["phases"][1]
+    assert merge_phase["phase"] == "merge"
+    assert merge_phase["peak_kb"] >= merge_phase["net_kb"] >= 90
+    # two at the start (the first one warms the filter caches) and one at every phase boundary
+    assert len(snapshots) == 2 + len(record["phases"])
+    # the list the merge phase built is attributed to it, not to the phase before
+    assert merge_phase["sites"][0]["site"].startswith(__file__) and merge_phase["sites"][0]["size_kb"] >= 90
+    assert all(site["size_kb"] < 90 for site in record["phases"][0]["sites"])
+    assert isinstance(record["kept_sites"], list)
+
+
+def test_budget_is_suspended_while_tracing(tmp_path):
+    metrics_file = tmp_path / "metrics.jsonl"
+    assert metrics.run_measured(metrics_file, "label", True, _budget_limits) == [0, 0]
+    assert metrics.run_measured(metrics_file, "label", False, _budget_limits) == [5, 100]
@@ -0,0 +1,53 @@
+import ast
+
+import module_builder
+import source_text
+
+
+def statements(source):
+    return ast.parse(source).body
+
+
+def test_body_and_origins():
+    builder = module_builder.ModuleBuilder(5)
+    builder.extend(statements("a = 1\nb = 2\n"), module_builder.ORIGIN_BASE)
+    builder.add(statements("c = 3\n")[0], module_builder.ORIGIN_LOCAL)
+    module = builder.build()
+
+    assert ast.unparse(module) == "a = 1\nb = 2\nc = 3"
+    # the unused slots are dropped
+    assert len(builder.origins) == 3
+    assert builder.origin_counts() == {module_builder.ORIGIN_BASE: 2, module_builder.ORIGIN_LOCAL: 1}
+
+
+def test_synthesized_statements_get_the_position_of_their_predecessor():
+    first, second = statements("a = 1\n\n\nb = 2\n")
+    merged = ast.Assign(targets=[ast.Name("c", ast.Store())], value=ast.Constant(3))
+    builder = module_builder.ModuleBuilder(3)
+    builder.add(first, module_builder.ORIGIN_LOCAL)
+    builder.add(second, module_builder.ORIGIN_REMOTE)
+    builder.add(merged, module_builder.ORIGIN_LOCAL)
+    builder.build()
+
+    assert builder.origins[2] == module_builder.ORIGIN_SYNTHESIZED
+    assert merged.lineno == 4 and merged.value.lineno == 4
+    assert source_text.is_synthesized(merged)
+    # the input statements keep their positions
+    assert (first.lineno, second.lineno) == (1, 4)
+
+
+def test_marked_statements_count_as_synthesized():
+    node = source_text.mark_synthesized(statements("a = 1\n")[0])
+    builder = module_builder.ModuleBuilder(1)
+    builder.add(node, module_builder.ORIGIN_REMOTE)
+    builder.build()
+    assert builder.origins == [module_builder.ORIGIN_SYNTHESIZED]
+    assert node.lineno == 1
+
+
+def test_synthesized_first_statement():
+    node = ast.Pass()
+    builder = module_builder.ModuleBuilder(1)
+    builder.add(node, module_builder.ORIGIN_BASE)
+    builder.build()
+    assert (node.lineno, node.col_offset) == (1, 0)
@@ -0,0 +1,33 @@
+import prescan
+from input_buffer import InputBuffer
+
+
+def buffers(*contents):
+    return [InputBuffer.from_bytes(content) for content in contents]
+
+
+def test_python_inputs_can_be_merged():
+    assert prescan.prescan_inputs(buffers(b"a = 1\n", b"a = 2\n", b"a = 1\n"), "pkg/mod.py") is None
+    assert prescan.prescan_inputs(buffers(b"a = 1\n"), None) is None
+
+
+def test_other_extensions_are_merged_line_based():
+    assert "not a Python file" in prescan.prescan_inputs(buffers(b"a\n"), "notes.txt")
+
+
+def test_binary_content():
+    assert prescan.prescan_inputs(buffers(b"a = 1\n", b"a\0b"), "mod.py") == "binary content"
+
+
+def test_size_and_line_limits(monkeypatch):
+    monkeypatch.setattr(prescan, "MAX_FILE_BYTES", 10)
+    assert "larger than 10 bytes" in prescan.prescan_inputs(buffers(b"a = 1\n" * 3))
+
+    monkeypatch.setattr(prescan, "MAX_FILE_BYTES", 1000)
+    monkeypatch.setattr(prescan, "MAX_FILE_LINES", 2)
+    assert "longer than 2 lines" in prescan.prescan_inputs(buffers(b"a = 1\n" * 3))
+
+
+def test_undecodable_inputs():
+    assert prescan.prescan_inputs(buffers(b"# -*- coding: nonexistent -*-\n")) == "invalid coding cookie"
+    assert "can't be decoded as utf-8" in prescan.prescan_inputs(buffers(b"a = 1\nb = 2\nc = '\xff'\n"))
@@ -0,0 +1,58 @@
+import os
+import pstats
+import threading
+import time
+
+import phases
+import profiling
+
+
+def busy_phases():
+    for phase in ("parse", "merge"):
+        started = time.process_time()
+        while time.process_time() - started < 0.05:
+            pass
+        phases.mark(phase)
+    return "result"
+
+
+def test_listeners_see_every_phase():
+    seen = []
+    phases.add_listener(seen.append)
+    try:
+        phases.mark("parse")
+        phases.mark("merge")
+    finally:
+        phases.remove_listener(seen.append)
+    phases.mark("format")
+    assert seen == ["parse", "merge"]
+
+
+def test_listeners_only_see_their_own_thread():
+    seen = []
+    phases.add_listener(seen.append)
+    try:
+        thread = threading.Thread(target=phases.mark, args=("parse",))
+        thread.start()
+        thread.join()
+        phases.mark("merge")
+    finally:
+        phases.remove_listener(seen.append)
+    assert seen == ["merge"]
+
+
+def test_profile_files_are_written(tmp_path):
+    assert profiling.run_profiled(str(tmp_path), "label", busy_phases) == "result"
+
+    names = sorted(os.listdir(tmp_path))
+    assert [os.path.splitext(name)[1] for name in names] == [".collapsed", ".pstats"]
+    assert all(name.startswith("label-") for name in names)
+    pstats.Stats(str(tmp_path / names[1]))
+
+    with open(tmp_path / names[0], encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    # label;phase;frames... count, tagged with the phase the sample was taken in
+    sampled_phases = {line.split(";")[1] for line in lines}
+    assert sampled_phases <= {"parse", "merge", phases.FINISH}
+    assert {"parse", "merge"} & sampled_phases
+    assert all(line.startswith("label;") and line.rsplit(" ", 1)[1].isdigit() for line in lines)
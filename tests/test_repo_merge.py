@@ -0,0 +1,69 @@
+import os
+import subprocess
+
+import pytest
+
+import repo_merge
+
+
+def git(repo, *args):
+    return subprocess.run(["git", "-C", str(repo), "-c", "user.name=test", "-c", "user.email=test@example.com",
+                           *args], check=True, capture_output=True)
+
+
+def commit_files(repo, files, message):
+    for name, text in files.items():
+        (repo / name).write_text(text)
+    git(repo, "add", "--", *files)
+    git(repo, "commit", "-q", "-m", message)
+
+
+@pytest.fixture
+def conflicted_repo(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    commit_files(repo, {"clean.py": "A = 1\n", "conflict.py": "A = 1\n", "notes.txt": "a\n"}, "base")
+    git(repo, "checkout", "-q", "-b", "other")
+    commit_files(repo, {"clean.py": "A = 1\nB = 2\n", "conflict.py": "A = 2\n", "notes.txt": "b\n"}, "other")
+    git(repo, "checkout", "-q", "main")
+    commit_files(repo, {"clean.py": "A = 1\nC = 3\n", "conflict.py": "A = 3\n", "notes.txt": "c\n"}, "main")
+    # git's own line merge conflicts on all three files
+    with pytest.raises(subprocess.CalledProcessError):
+        git(repo, "merge", "-q", "other")
+    return repo
+
+
+def test_unmerged_files(conflicted_repo):
+    files = {unmerged.path: unmerged for unmerged in repo_merge.unmerged_files(str(conflicted_repo))}
+    assert sorted(files) == ["clean.py", "conflict.py", "notes.txt"]
+    assert all(unmerged.is_three_way() for unmerged in files.values())
+
+
+def test_read_blobs(conflicted_repo):
+    unmerged = {unmerged.path: unmerged for unmerged in repo_merge.unmerged_files(str(conflicted_repo))}
+    stages = unmerged["clean.py"].stages
+    blobs = repo_merge.read_blobs(str(conflicted_repo), [stages[1], stages[2], stages[3], stages[1]])
+    assert [blobs[stages[stage]] for stage in (1, 2, 3)] == [b"A = 1\n", b"A = 1\nC = 3\n", b"A = 1\nB = 2\n"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_merge_repository(conflicted_repo, workers):
+    rows = repo_merge.merge_repository(str(conflicted_repo), workers)
+    results = {row[0]: row[3] for row in rows}
+    assert results == {"clean.py": repo_merge.RESULT_CLEAN, "conflict.py": repo_merge.RESULT_CONFLICT}
+
+    assert (conflicted_repo / "clean.py").read_text() == "A = 1\nC = 3\nB = 2\n"
+    # clean results are staged, the rest is left as git wrote it
+    assert [unmerged.path for unmerged in repo_merge.unmerged_files(str(conflicted_repo))] == [
+        "conflict.py", "notes.txt"]
+    assert "<<<<<<<" in (conflicted_repo / "conflict.py").read_text()
+
+    summary = repo_merge.format_summary(rows)
+    assert summary.splitlines()[-1] == "1 of 2 conflicted Python file(s) merged and staged"
+
+
+def test_main_exit_code(conflicted_repo, capsys):
+    assert repo_merge.main(["--repo", str(conflicted_repo), "--jobs", "1"]) == 1
+    assert "clean.py" in capsys.readouterr().out
+    assert repo_merge.main(["--repo", os.devnull]) == 2
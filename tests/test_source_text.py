@@ -0,0 +1,37 @@
+import ast
+
+import source_text
+from source_text import SourceText
+
+
+def test_segment_keeps_the_original_formatting():
+    text = "a = [1,\n     2]  # comment\n\n@decorator\ndef f():\n    return  a\n"
+    source = SourceText(text)
+    assignment, function = ast.parse(text).body
+    assert source.segment(assignment) == "a = [1,\n     2]"
+    assert source.segment(function) == "@decorator\ndef f():\n    return  a"
+
+
+def test_columns_of_non_ascii_lines():
+    text = "s = 'äöü'; t = 1\n"
+    source = SourceText(text)
+    second = ast.parse(text).body[1]
+    assert source.segment(second) == "t = 1"
+
+
+def test_line_endings_match_the_tokenizer():
+    text = "a = 1\r\nb = 2\rc = 3\n"
+    source = SourceText(text)
+    assert [source.segment(node) for node in ast.parse(text).body] == ["a = 1", "b = 2", "c = 3"]
+
+
+def test_synthesized_nodes_are_unparsed():
+    text = "a = 1\n"
+    node = ast.parse(text).body[0]
+    source = SourceText(text)
+    assert source_text.render_node(node, source) == "a = 1"
+
+    source_text.mark_synthesized(node)
+    assert source.segment(node) is None
+    assert source_text.render_node(node, source) == "a = 1"
+    assert source_text.is_synthesized(ast.Pass())
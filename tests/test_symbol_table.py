@@ -0,0 +1,85 @@
+import ast
+
+import symbol_table
+import utilitys
+
+
+def names(code):
+    return set(symbol_table.SymbolTable(ast.parse(code).body).definitions)
+
+
+def collisions(left, right):
+    index = symbol_table.SymbolIndex()
+    table_left = symbol_table.SymbolTable(ast.parse(left).body, index)
+    table_right = symbol_table.SymbolTable(ast.parse(right).body, index)
+    return sorted(table_left.collisions(table_right))
+
+
+def test_unpacking():
+    assert names("a, (b, *rest) = values\nx = y = 1\nobj.attr = 2\nitems[0] = 3\n") == {"a", "b", "rest", "x", "y"}
+
+
+def test_walrus():
+    assert names("if (n := len(data)) > 10:\n    pass\n") == {"n"}
+    assert names("print(m := 1)\n") == {"m"}
+
+
+def test_walrus_in_a_function_is_local():
+    assert names("def f():\n    if (n := 1):\n        pass\n") == set()
+
+
+def test_comprehension_scope():
+    # the loop variable belongs to the comprehension, := in it binds at module level
+    assert names("squares = [i * i for i in range(3)]\n") == {"squares"}
+    assert names("found = [last := i for i in range(3) if (seen := i)]\n") == {"found", "last", "seen"}
+
+
+def test_global_in_a_function():
+    assert names("def f():\n    global counter\n    counter = 1\n    local = 2\n") == {"counter"}
+    assert names("def f():\n    global counter\n    print(counter)\n") == set()
+
+
+def test_global_comprehension_target_is_not_assigned():
+    assert names("def f():\n    global i\n    return [i for i in range(3)]\n") == set()
+
+
+def test_nested_function_scopes():
+    code = ("def outer():\n"
+            "    global a\n"
+            "    def inner():\n"
+            "        a = 1\n"
+            "        global b\n"
+            "        b = 2\n"
+            "    return inner\n")
+    assert names(code) == {"b"}
+
+
+def test_nonlocal_is_not_module_level():
+    code = ("def outer():\n"
+            "    x = 0\n"
+            "    def inner():\n"
+            "        nonlocal x\n"
+            "        x += 1\n"
+            "    return inner\n")
+    assert names(code) == set()
+
+
+def test_star_import_binds_no_tracked_name():
+    # imports are merged separately, they never collide with assignments
+    assert names("from os.path import *\nimport sys\n") == set()
+    assert collisions("from os.path import *\n", "join = 1\n") == []
+
+
+def test_collisions():
+    assert collisions("a = 1\nb = 2\n", "b = 3\nc = 4\n") == ["b"]
+    assert collisions("x, *y = z\n", "(y := 5)\n") == ["y"]
+    # two functions writing the same global don't collide, a statement and a function do
+    function = "def {}():\n    global g\n    g = 1\n"
+    assert collisions(function.format("f"), function.format("h")) == []
+    assert collisions(function.format("f"), "g = 2\n") == ["g"]
+
+
+def test_augmented_assignments_need_a_manual_merge():
+    nodes = ast.parse("x += 1\n").body
+    clean, other_left, other_right = utilitys.analyze_node_types(nodes, [])
+    assert not clean and other_left == nodes
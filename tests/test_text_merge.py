@@ -0,0 +1,70 @@
+import text_merge
+
+
+def merge(base, local, remote):
+    return text_merge.merge_lines(base.encode(), local.encode(), remote.encode())
+
+
+def test_changes_on_both_sides_in_different_places():
+    merged, conflicts = merge("a\nb\nc\nd\n", "A\nb\nc\nd\n", "a\nb\nc\nD\n")
+    assert (merged, conflicts) == (b"A\nb\nc\nD\n", 0)
+
+
+def test_same_change_on_both_sides():
+    merged, conflicts = merge("a\nb\n", "a\nB\n", "a\nB\n")
+    assert (merged, conflicts) == (b"a\nB\n", 0)
+
+
+def test_conflicting_changes_get_markers():
+    merged, conflicts = merge("a\nb\nc\n", "a\nL\nc\n", "a\nR\nc\n")
+    assert conflicts == 1
+    assert merged == b"a\n<<<<<<< LOCAL\nL\n=======\nR\n>>>>>>> REMOTE\nc\n"
+
+
+def test_insertions_at_the_end():
+    merged, conflicts = merge("a\n", "a\nl\n", "a\n")
+    assert (merged, conflicts) == (b"a\nl\n", 0)
+
+    merged, conflicts = merge("a\n", "a\nl\n", "a\nr\n")
+    assert conflicts == 1
+
+
+def test_missing_newline_at_the_end_of_a_conflict_side():
+    merged, conflicts = merge("a\nb", "a\nl", "a\nr")
+    assert conflicts == 1
+    assert b"l\n=======\nr\n>>>>>>>" in merged
+
+
+def test_deletion_on_one_side():
+    merged, conflicts = merge("a\nb\nc\n", "a\nc\n", "a\nb\nc\nd\n")
+    assert (merged, conflicts) == (b"a\nc\nd\n", 0)
+
+
+def test_merge_sequences_chunks():
+    chunks = text_merge.merge_sequences("abc", "aXc", "abc")
+    assert chunks == [("ok", "a"), ("ok", "X"), ("ok", "c")]
+
+
+def test_large_inputs_match_like_difflib():
+    base = [b"line %d\n" % i for i in range(2000)]
+    other = list(base)
+    for i in range(0, 2000, 97):
+        other[i] = b"changed\n"
+    other[500:500] = [b"new\n", b"line 7\n"]
+    assert len(base) * len(other) > text_merge.DIFFLIB_MAX_PAIRS
+
+    blocks = text_merge._matching_blocks(base, other)
+    assert blocks[-1] == (len(base), len(other), 0)
+    assert sum(size for _, _, size in blocks) == sum(
+        size for _, _, size in text_merge._difflib_blocks(base, other))
+    for base_start, other_start, size in blocks:
+        assert base[base_start:base_start + size] == other[other_start:other_start + size]
+
+
+def test_large_inputs_with_repeated_lines():
+    # the worst case of difflib: no line is unique
+    base = b"pass\nx = 1\n" * 5000
+    local = base.replace(b"pass\nx = 1\n", b"pass\nx = 2\n", 1)
+    remote = base + b"y = 3\n"
+    merged, conflicts = text_merge.merge_lines(base, local, remote)
+    assert (merged, conflicts) == (local + b"y = 3\n", 0)
@@ -0,0 +1,42 @@
+import os
+import stat
+
+import utilitys
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_files_get_the_default_permissions(tmp_path):
+    old_umask = os.umask(0o027)
+    try:
+        utilitys.write_file_atomic(str(tmp_path / "new.py"), "a = 1\n")
+    finally:
+        os.umask(old_umask)
+    assert mode(tmp_path / "new.py") == 0o640
+    assert (tmp_path / "new.py").read_text() == "a = 1\n"
+
+
+def test_replaced_files_keep_their_permissions(tmp_path):
+    path = tmp_path / "script.py"
+    path.write_text("old\n")
+    os.chmod(path, 0o755)
+    utilitys.write_file_atomic(str(path), b"new\n")
+    assert mode(path) == 0o755
+    assert path.read_bytes() == b"new\n"
+
+
+def test_symlinks_are_followed(tmp_path):
+    target = tmp_path / "target.py"
+    target.write_text("old\n")
+    link = tmp_path / "link.py"
+    link.symlink_to(target)
+    utilitys.write_file_atomic(str(link), "new\n")
+    assert link.is_symlink()
+    assert target.read_text() == "new\n"
+
+
+def test_no_temp_files_are_left(tmp_path):
+    utilitys.write_file_atomic(str(tmp_path / "a.py"), "a\n")
+    assert os.listdir(tmp_path) == ["a.py"]
@@ -0,0 +1,60 @@
+import pytest
+
+import ast_merge_tool
+import watch
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.fixture
+def session(tmp_path):
+    base = write(tmp_path, "base.py", "A = 1\n\n\ndef f():\n    return 1\n")
+    write(tmp_path, "local.py", "A = 1\n\n\ndef f():\n    return 2\n")
+    remote = write(tmp_path, "remote.py", "A = 1\nB = 2\n\n\ndef f():\n    return 1\n")
+    return watch.WatchSession(base, str(tmp_path / "local.py"), remote)
+
+
+def test_verdicts_follow_the_saves_of_local(tmp_path, session):
+    verdict = session.check()
+    assert verdict["mergeable"] and verdict["conflicts"] == []
+
+    write(tmp_path, "local.py", "A = 3\nB = 4\n\n\ndef f():\n    return 2\n")
+    verdict = session.check()
+    assert not verdict["mergeable"] and verdict["conflicts"]
+    # only the changed assignment is parsed again, the function is reused
+    assert verdict["reused_chunks"] >= 1
+
+
+def test_syntax_errors_in_local_are_reported(tmp_path, session):
+    write(tmp_path, "local.py", "def f(:\n")
+    verdict = session.check()
+    assert not verdict["mergeable"]
+    assert verdict["conflicts"][0]["reason"] == "Syntax errors in the input"
+
+
+def test_merged_is_optional_only_for_check_and_watch():
+    assert ast_merge_tool.parse_arguments(["b", "l", "r", "--watch"]).merged is None
+    assert ast_merge_tool.parse_arguments(["b", "l", "r", "--check"]).merged is None
+    assert ast_merge_tool.parse_arguments(["b", "l", "r", "m"]).merged == "m"
+    with pytest.raises(SystemExit):
+        ast_merge_tool.parse_arguments(["b", "l", "r"])
+
+
+def test_merge_errors_are_reported_and_the_next_save_is_checked(tmp_path, session, monkeypatch):
+    from merger import Merger
+
+    def broken_changesets(self):
+        raise AttributeError("broken")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(Merger, "create_changesets", broken_changesets)
+        verdict = session.check()
+    assert not verdict["mergeable"]
+    assert verdict["conflicts"][0]["kind"] == "internal_error"
+
+    write(tmp_path, "local.py", "A = 1\n\n\ndef f():\n    return 3\n")
+    assert session.check()["mergeable"]
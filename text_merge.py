@@ -0,0 +1,230 @@
+import bisect
+import difflib
+
+
+CONFLICT_START = b"<<<<<<<"
+CONFLICT_SEPARATOR = b"======="
+CONFLICT_END = b">>>>>>>"
+
+# Sequences (and gaps between anchors) up to this many item pairs are matched with difflib,
+# which takes quadratic time in the worst case. Larger ones are matched like a patience diff.
+DIFFLIB_MAX_PAIRS = 250_000
+
+
+def _difflib_blocks(base, other):
+    matcher = difflib.SequenceMatcher(None, base, other, autojunk=False)
+    return matcher.get_matching_blocks()
+
+
+def _unique_anchors(base, base_start, base_end, other, other_start, other_end):
+    """
+    (base index, other index) of the items that occur exactly once in both ranges,
+    the longest chain of them that is in order on both sides (patience sorting).
+    """
+    base_positions = {}
+    for index in range(base_start, base_end):
+        item = base[index]
+        base_positions[item] = None if item in base_positions else index
+    other_positions = {}
+    for index in range(other_start, other_end):
+        item = other[index]
+        if base_positions.get(item) is not None:
+            other_positions[item] = None if item in other_positions else index
+
+    pairs = sorted((base_positions[item], index)
+                   for item, index in other_positions.items() if index is not None)
+    tails = []
+    tail_indices = []
+    previous = [-1] * len(pairs)
+    for index, (_, other_index) in enumerate(pairs):
+        slot = bisect.bisect_left(tails, other_index)
+        if slot == len(tails):
+            tails.append(other_index)
+            tail_indices.append(index)
+        else:
+            tails[slot] = other_index
+            tail_indices[slot] = index
+        previous[index] = tail_indices[slot - 1] if slot else -1
+
+    anchors = []
+    index = tail_indices[-1] if tail_indices else -1
+    while index != -1:
+        anchors.append(pairs[index])
+        index = previous[index]
+    anchors.reverse()
+    return anchors
+
+
+def _matching_blocks(base, other):
+    """
+    Matching blocks (base start, other start, size) of two sequences, ending with (len(base), len(other), 0)
+    like difflib's get_matching_blocks. Small sequences are matched by difflib itself.
+    Large ones in close to linear time: the common prefix and suffix first, then the items that occur
+    once on each side as anchors, the gaps between them the same way. Gaps without anchors are left
+    to difflib while they are small and stay unmatched (one changed region) otherwise.
+    """
+    if len(base) * len(other) <= DIFFLIB_MAX_PAIRS:
+        return _difflib_blocks(base, other)
+
+    blocks = []
+    # gaps (base start, base end, other start, other end) and finished blocks, the next one on top
+    stack = [(0, len(base), 0, len(other))]
+    while stack:
+        item = stack.pop()
+        if len(item) == 3:
+            blocks.append(item)
+            continue
+        base_start, base_end, other_start, other_end = item
+
+        prefix = 0
+        while (base_start + prefix < base_end and other_start + prefix < other_end
+               and base[base_start + prefix] == other[other_start + prefix]):
+            prefix += 1
+        if prefix:
+            blocks.append((base_start, other_start, prefix))
+        base_start += prefix
+        other_start += prefix
+
+        suffix = 0
+        while (base_start < base_end - suffix and other_start < other_end - suffix
+               and base[base_end - suffix - 1] == other[other_end - suffix - 1]):
+            suffix += 1
+        base_end -= suffix
+        other_end -= suffix
+        tail = [(base_end, other_end, suffix)] if suffix else []
+
+        if base_start == base_end or other_start == other_end:
+            blocks.extend(tail)
+            continue
+
+        anchors = _unique_anchors(
+            base, base_start, base_end, other, other_start, other_end)
+        if not anchors:
+            if (base_end - base_start) * (other_end - other_start) <= DIFFLIB_MAX_PAIRS:
+                blocks.extend((base_start + a, other_start + b, size) for a, b, size in
+                              _difflib_blocks(base[base_start:base_end], other[other_start:other_end]) if size)
+            blocks.extend(tail)
+            continue
+
+        items = []
+        for base_index, other_index in anchors:
+            items.append((base_start, base_index, other_start, other_index))
+            items.append((base_index, other_index, 1))
+            base_start, other_start = base_index + 1, other_index + 1
+        items.append((base_start, base_end, other_start, other_end))
+        items.extend(tail)
+        stack.extend(reversed(items))
+
+    # adjacent blocks become one
+    merged = []
+    for base_start, other_start, size in blocks:
+        if merged:
+            last_base, last_other, last_size = merged[-1]
+            if last_base + last_size == base_start and last_other + last_size == other_start:
+                merged[-1] = (last_base, last_other, last_size + size)
+                continue
+        merged.append((base_start, other_start, size))
+    merged.append((len(base), len(other), 0))
+    return merged
+
+
+def _sync_regions(base, local, remote):
+    """
+    Returns the regions where base, local and remote are identical.
+    Each region is (base_start, base_end, local_start, local_end, remote_start, remote_end).
+    The last region is always the empty region at the end of all three sequences.
+    """
+    local_matches = _matching_blocks(base, local)
+    remote_matches = _matching_blocks(base, remote)
+
+    regions = []
+    il = ir = 0
+    while il < len(local_matches) and ir < len(remote_matches):
+        base_l, match_l, len_l = local_matches[il]
+        base_r, match_r, len_r = remote_matches[ir]
+
+        start = max(base_l, base_r)
+        end = min(base_l + len_l, base_r + len_r)
+        if start < end:
+            local_start = match_l + (start - base_l)
+            remote_start = match_r + (start - base_r)
+            regions.append((start, end,
+                            local_start, local_start + (end - start),
+                            remote_start, remote_start + (end - start)))
+
+        if base_l + len_l < base_r + len_r:
+            il += 1
+        else:
+            ir += 1
+
+    regions.append((len(base), len(base), len(local),
+                   len(local), len(remote), len(remote)))
+    return regions
+
+
+def merge_sequences(base, local, remote):
+    """
+    Three-way merge (diff3) of three sequences of hashable items.
+    Returns a list of chunks, either ("ok", items) or ("conflict", local_items, base_items, remote_items).
+    """
+    chunks = []
+    ib = il = ir = 0
+
+    for base_start, base_end, local_start, local_end, remote_start, remote_end in _sync_regions(base, local, remote):
+        local_part = local[il:local_start]
+        remote_part = remote[ir:remote_start]
+
+        if local_part or remote_part:
+            base_part = base[ib:base_start]
+            if local_part == remote_part:
+                chunks.append(("ok", local_part))
+            elif local_part == base_part:
+                chunks.append(("ok", remote_part))
+            elif remote_part == base_part:
+                chunks.append(("ok", local_part))
+            else:
+                chunks.append(
+                    ("conflict", local_part, base_part, remote_part))
+
+        if base_end > base_start:
+            chunks.append(("ok", base[base_start:base_end]))
+
+        ib, il, ir = base_end, local_end, remote_end
+
+    return chunks
+
+
+def merge_lines(base_data, local_data, remote_data, local_label=b"LOCAL", remote_label=b"REMOTE"):
+    """
+    Line-based three-way merge of raw file contents (bytes).
+    Conflicting regions are written with git-style conflict markers.
+    Returns (merged_bytes, conflict_count).
+    """
+    base = base_data.splitlines(keepends=True)
+    local = local_data.splitlines(keepends=True)
+    remote = remote_data.splitlines(keepends=True)
+
+    output = []
+    conflict_count = 0
+
+    for chunk in merge_sequences(base, local, remote):
+        if chunk[0] == "ok":
+            output.extend(chunk[1])
+            continue
+
+        _, local_part, _, remote_part = chunk
+        conflict_count += 1
+        output.append(CONFLICT_START + b" " + local_label + b"\n")
+        output.extend(_terminated(local_part))
+        output.append(CONFLICT_SEPARATOR + b"\n")
+        output.extend(_terminated(remote_part))
+        output.append(CONFLICT_END + b" " + remote_label + b"\n")
+
+    return b"".join(output), conflict_count
+
+
+def _terminated(lines):
+    """Makes sure the last line of a conflict side ends with a newline before the next marker."""
+    if lines and not lines[-1].endswith((b"\n", b"\r")):
+        return lines[:-1] + [lines[-1] + b"\n"]
+    return lines
@@ -1,11 +1,16 @@
 import ast
+import os
+import tempfile
 from log_config import logger
+import source_text
+import fingerprint
 
 
-def format_nodes_with_lineno(node_or_list):
+def format_nodes_with_lineno(node_or_list, source=None):
     """
     Returns node(s) as a string with line numbers.
     Accepts single nodes or a list of nodes.
+    With the SourceText of the nodes, the code is sliced from the original source instead of unparsed.
     """
     if node_or_list is None:
         return ""
@@ -18,7 +23,7 @@ def format_nodes_with_lineno(node_or_list):
         # Sicherheitscheck, falls Nicht-AST-Objekte (z.B. Marker) dabei sind
         if isinstance(node, ast.AST):
             lineno = getattr(node, 'lineno', '?')
-            code = ast.unparse(node)
+            code = source_text.render_node(node, source)
             lines.append(f"  Line {lineno}: {code}")
         else:
             # Fallback für Strings oder Marker-Objekte
@@ -27,10 +32,11 @@ def format_nodes_with_lineno(node_or_list):
     return "\n".join(lines)
 
 
-def node_to_string(node_or_list):
+def node_to_string(node_or_list, source=None):
     """
     Converts AST node(s) into readable code.
     Accepts single nodes or a list of nodes.
+    With the SourceText of the nodes, the code is sliced from the original source instead of unparsed.
     """
     if node_or_list is None:
         return ""
@@ -41,7 +47,7 @@ def node_to_string(node_or_list):
     code_lines = []
     for node in nodes:
         if isinstance(node, ast.AST):
-            code_lines.append(ast.unparse(node))
+            code_lines.append(source_text.render_node(node, source))
         else:
             # Fallback für ChangeMarker oder Strings
             code_lines.append(str(node))
@@ -141,87 +147,104 @@ def _get_func_names_set(nodes):
         node.name
         for node in nodes
         if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+        or fingerprint.is_lazy_function(node)
     }
 
 
-def is_function_referenced(func_name, nodes):
+def index_loaded_names(nodes):
     """
-    Checks if a function name is referenced (used) within a list of AST nodes.
+    Walks the nodes once and maps every loaded name to the top level nodes that reference it.
+    Lookups for many names (e.g. all deleted functions) then don't walk the nodes again.
     """
-    if not nodes:
-        return False
+    loaded_names = {}
 
-    for node in nodes:
+    for node in nodes or ():
         for child in ast.walk(node):
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load):
+                referencing_nodes = loaded_names.setdefault(child.id, [])
+                if not referencing_nodes or referencing_nodes[-1] is not node:
+                    referencing_nodes.append(node)
 
-            if isinstance(child, ast.Name):
+    return loaded_names
 
-                if child.id == func_name and isinstance(child.ctx, ast.Load):
-                    return True
 
-    return False
+def find_referencing_nodes(func_name, nodes, loaded_names=None):
+    """
+    Returns the top level nodes that reference (load) the function name, without rendering them.
+    loaded_names is an optional index of the nodes from index_loaded_names.
+    """
+    if loaded_names is None:
+        loaded_names = index_loaded_names(nodes)
+    return list(loaded_names.get(func_name, ()))
 
 
-def find_function_references(func_name, nodes):
+def remove_functions_by_name_in_mapping(func_names, mapping_changes):
     """
-    Searches for references to a function and returns their locations and context.
+    Removes the first function definition (def or async def) of every name from a mapping of change sets,
+    in a single pass over the change sets.
+    Returns the names that were removed.
     """
-    found_refs = []
+    pending = set(func_names)
+    removed = set()
 
-    if not nodes:
-        return found_refs
-
-    for node in nodes:
-        for child in ast.walk(node):
+    for change_id, nodes in mapping_changes.items():
+        if not pending:
+            break
 
-            if isinstance(child, ast.Name):
-                if child.id == func_name and isinstance(child.ctx, ast.Load):
+        kept_nodes = []
+        for node in nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name in pending:
+                pending.discard(node.name)
+                removed.add(node.name)
+                continue
+            kept_nodes.append(node)
 
-        
-                    lineno = getattr(node, 'lineno', '?')
+        nodes[:] = kept_nodes
 
-                    try:
-                        code_context = ast.unparse(node)
-                    except Exception:
-                        code_context = "<could not unparse node>"
+    return removed
 
-                    found_refs.append({
-                        'lineno': lineno,
-                        'code': code_context
-                    })
 
+def log_text_content(text):
+    """Logs a buffer that is already in memory line by line."""
+    for line in text.splitlines():
+        logger.merge(line.rstrip())
 
-                    break
 
-    return found_refs
+def _umask():
+    # the umask can only be read by setting it
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
 
 
-def remove_function_by_name_in_mapping(func_name, mapping_changes):
+def write_file_atomic(file_path, content):
     """
-    Removes a function definition (def or async def) from a mapping of change sets.
+    Writes str or bytes to a temp file in the same directory and moves it over file_path with os.replace,
+    so readers see either the old or the complete new file, never a half written one.
+    A symlink is followed and its target is replaced, the link stays.
     """
-    for change_id, nodes in mapping_changes.items():
-
-        node_to_remove = None
-
-        for node in nodes:
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                if node.name == func_name:
-                    node_to_remove = node
-                    break 
-
-        if node_to_remove:
-            nodes.remove(node_to_remove)
-            return True
-
-    return False
-
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    file_path = os.path.realpath(file_path)
+    directory = os.path.dirname(file_path)
 
-def log_file_content(file_path):
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=".ast_merge_", suffix=".tmp")
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                logger.merge(line.rstrip())
-    except Exception as e:
-        logger.error("Error reading file in log_file_content", e)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # keep the permissions of the file that is replaced, new files get the ones open() would give them
+        try:
+            mode = os.stat(file_path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o666 & ~_umask()
+        os.chmod(tmp_path, mode)
+
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
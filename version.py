@@ -0,0 +1,2 @@
+# Part of every merge cache key, bump it whenever a change can alter merge results
+TOOL_VERSION = "0.4.2"
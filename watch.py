@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import sys
+import time
+import tokenize
+
+from log_config import logger
+import log_config
+import conflict_report
+import incremental_parse
+from input_buffer import InputBuffer
+
+
+# Seconds between two checks of the local file
+WATCH_INTERVAL = float(os.environ.get("AST_MERGE_WATCH_INTERVAL", 0.2))
+
+
+def _read_source(file_path):
+    with InputBuffer.from_file(file_path) as buffer:
+        return buffer.source
+
+
+class WatchSession:
+    """
+    Keeps base and remote parsed and re-merges local whenever it changes.
+    Local is parsed incrementally against its previous version (see incremental_parse.IncrementalParser):
+    only the top-level chunks whose text changed are parsed and fingerprinted again,
+    all other statements keep their nodes and fingerprints.
+    The merge runs up to the merged tree, nothing is unparsed, formatted or written.
+    """
+
+    def __init__(self, base_path, local_path, remote_path):
+        self.local_path = local_path
+        self.parser = incremental_parse.IncrementalParser(
+            _read_source(base_path))
+        self.ast_base = self.parser.base_tree
+        self.ast_remote = self.parser.parse(_read_source(remote_path))
+        if self.ast_base is None or self.ast_remote is None:
+            raise SyntaxError("base or remote has syntax errors")
+
+    def check(self):
+        """Re-merges the current local file, returns the verdict as a dict."""
+        from merger import Merger
+
+        started = time.perf_counter()
+        reused, parsed = self.parser.reused, self.parser.parsed
+        report = conflict_report.ConflictReport()
+
+        try:
+            ast_local = self.parser.parse(
+                _read_source(self.local_path), keep=True)
+        except (OSError, SyntaxError, LookupError, UnicodeDecodeError, tokenize.TokenError):
+            ast_local = None
+
+        if ast_local is None:
+            report.add(conflict_report.Conflict(
+                conflict_report.INVALID_INPUT, self.local_path, "Syntax errors in the input"))
+            merged_tree = None
+        else:
+            try:
+                merger = Merger(self.ast_base, ast_local,
+                                self.ast_remote, report=report)
+                merged_sequence, mapping_changes_left, mapping_changes_right = merger.create_changesets()
+                merged_tree = merger.merging(
+                    merged_sequence, mapping_changes_left, mapping_changes_right)
+            except Exception:
+                # a bug in the merge must not end the watch, the next save is checked again
+                logger.error("Watch check failed unexpectedly: ", exc_info=True)
+                report.add(conflict_report.Conflict(
+                    conflict_report.INTERNAL_ERROR, self.local_path, "Merge failed unexpectedly"))
+                merged_tree = None
+
+        mergeable = bool(merged_tree)
+        log_config.end_merge(failed=not mergeable)
+        return {
+            "mergeable": mergeable,
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+            "parsed_chunks": self.parser.parsed - parsed,
+            "reused_chunks": self.parser.reused - reused,
+            "conflicts": [conflict.to_dict() for conflict in report.conflicts],
+        }
+
+
+def _file_state(file_path):
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        # editors that save by renaming remove the file for a moment
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def watch(session, interval=WATCH_INTERVAL, output=None):
+    """Prints one JSON verdict line for the current local file and for every change of it, until interrupted."""
+    output = output or sys.stdout
+    last_state = None
+    while True:
+        state = _file_state(session.local_path)
+        if state is not None and state != last_state:
+            last_state = state
+            output.write(json.dumps(session.check()) + "\n")
+            output.flush()
+        time.sleep(interval)
+
+
+def watch_main(base_path, local_path, remote_path):
+    """ast_merge_tool.py BASE LOCAL REMOTE --watch, returns the exit code."""
+    try:
+        session = WatchSession(base_path, local_path, remote_path)
+    except (OSError, SyntaxError, LookupError, UnicodeDecodeError, ValueError, tokenize.TokenError) as e:
+        logger.error(f"Watch mode can't start: {e}")
+        return 1
+
+    logger.info(f"Watching {local_path}, stop with Ctrl-C")
+    # the verdicts are the output, writing the merge log on every save would take longer than the merge
+    logger.setLevel(logging.WARNING)
+    try:
+        watch(session)
+    except KeyboardInterrupt:
+        pass
+    return 0